@@ -1,16 +1,14 @@
 import os
 import logging
 import re
-import subprocess
-import requests
 import json
-import random
 import threading
 import time
-import io
-from datetime import datetime, timedelta
-from PIL import Image, ImageDraw, ImageFont
-from flask import Flask, render_template, request, jsonify, redirect, url_for, send_file
+import gzip
+import itertools
+from typing import Optional
+from flask import (Flask, render_template, request, jsonify, redirect, url_for, send_file, Response, stream_with_context, g,
+                   before_render_template, template_rendered)
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -18,10 +16,92 @@ app.secret_key = os.environ.get("SESSION_SECRET", "dev_secret_key")
 
 # Import YouTube API functionality
 from youtube_api import (
-    search_videos, get_video_details, get_trending_videos, 
-    get_video_stream_url, get_channel_videos, get_video_info_from_yt_dlp,
-    get_channel_info, format_view_count
+    get_video_details, get_video_stream_url, get_channel_info, get_stream_manifest, get_stream_qualities
 )
+from cache import metadata_cache
+from pagination import listing_store, decode_cursor, STREAM_FETCHERS
+from stream_cache import stream_cache
+from singleflight import extraction_flights
+from channel_stats import format_channel_stats
+from subscriptions_feed import normalize_channel_ids, iter_channel_videos, build_feed
+from trending_prefetch import trending_prefetcher
+from scheduler import extraction_scheduler, reset_rejection_flag, was_rejected
+from card_renderer import card_renderer, card_fields
+from card_store import card_store, card_digest, card_filename, CARD_FORMATS, CARD_MAX_AGE
+from upstream import upstream
+from music_catalog import music_catalog, MUSIC_API_BASE, SORTS
+from media_cache import media_cache
+from thumbnail_cache import thumbnail_cache, THUMB_MAX_AGE
+from timings import search_stream_timings
+from metrics import registry as metrics_registry, http_request_seconds
+import tracing
+from hedge import hedger
+from channel_resolver import channel_resolver
+
+# Upper bound for max_results on paginated API endpoints
+MAX_PAGE_SIZE = 50
+
+# Results on the first page of a search
+SEARCH_FIRST_PAGE = 10
+
+# Upper bound for limit on /api/music pages, and how long clients may reuse a catalog response
+MAX_MUSIC_PAGE_SIZE = 100
+MUSIC_RESPONSE_MAX_AGE = 60
+
+# Song audio and covers don't change once uploaded
+MEDIA_MAX_AGE = 86400
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    g.trace = tracing.start_trace(f"{request.method} {request.path}",
+                                  route=request.url_rule.rule if request.url_rule is not None else None,
+                                  query=request.query_string.decode('utf-8', 'replace'))
+
+@app.after_request
+def record_request_metrics(response):
+    """Observe every response's latency; registered first so it runs after the other after_request hooks"""
+    start = g.get('request_start')
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        http_request_seconds.observe(time.perf_counter() - start, route, request.method, str(response.status_code))
+    trace = g.get('trace')
+    if trace is not None:
+        trace.root.set(status=response.status_code)
+        response.headers['X-Trace-Id'] = trace.id
+    return response
+
+@app.teardown_request
+def finish_request_trace(error):
+    # Runs once the response has been sent, so streamed bodies are included
+    tracing.finish_trace(g.pop('trace', None), error)
+
+def start_render_span(sender, template, context, **extra):
+    g.render_span = tracing.open_span('render', template=template.name)
+
+def finish_render_span(sender, template, context, **extra):
+    tracing.close_span(g.pop('render_span', None))
+
+if tracing.TRACE_REQUESTS:
+    before_render_template.connect(start_render_span, app)
+    template_rendered.connect(finish_render_span, app)
+
+@app.before_request
+def start_admission_tracking():
+    reset_rejection_flag()
+    # Covers servers started without one of our entry points (e.g. plain `gunicorn app:app`)
+    start_background_tasks()
+
+@app.after_request
+def reject_when_overloaded(response):
+    """Turn failures caused by a rejected extraction into 503 + Retry-After"""
+    if response.status_code >= 500 and was_rejected():
+        retry_after = extraction_scheduler.retry_after()
+        if request.path.startswith('/api/'):
+            response = jsonify({'error': 'Server is busy, please retry shortly', 'retry_after': retry_after})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(retry_after)
+    return response
 
 @app.route('/')
 def index():
@@ -29,7 +109,8 @@ def index():
     try:
         # Default to TR (Turkey) for trending videos
         country_code = request.args.get('country', 'TR')
-        trending_videos = get_trending_videos(country_code=country_code)
+        # Served from the background snapshot when the country is prefetched
+        trending_videos = trending_prefetcher.get_trending(country_code)
         return render_template('index.html', videos=trending_videos, country=country_code)
     except Exception as e:
         logging.error(f"Error loading trending videos: {e}")
@@ -58,10 +139,18 @@ def search():
     elif len(query.strip()) == 11 and re.match(r'^[a-zA-Z0-9_-]{11}$', query.strip()):
         return redirect(url_for('watch', v=query.strip()))
 
+    params = {'q': query, 'country': country_code}
+    if not listing_store.get_listing('search', params).has(SEARCH_FIRST_PAGE):
+        # Not extracted yet: send the page straight away and let it stream the results in
+        return render_template('search.html', videos=[], query=query, country=country_code, stream=True,
+                               page_size=SEARCH_FIRST_PAGE)
+
     try:
-        # Only load a small initial batch for immediate display with country-specific results
-        initial_results = search_videos(query, max_results=10, country_code=country_code)
-        return render_template('search.html', videos=initial_results, query=query, country=country_code)
+        # Only load a small initial batch for immediate display with country-specific results;
+        # the listing is kept server-side so "load more" continues from the returned cursor
+        initial_results, next_cursor, _ = listing_store.page('search', params, 0, SEARCH_FIRST_PAGE)
+        return render_template('search.html', videos=initial_results, query=query, country=country_code,
+                               next_cursor=next_cursor)
     except Exception as e:
         logging.error(f"Search error: {e}")
         return render_template('search.html', videos=[], query=query, error="Search failed", country=country_code)
@@ -85,6 +174,77 @@ def watch():
         logging.error(f"Error loading video {video_id}: {e}")
         return render_template('player.html', video=None, error="Failed to load video")
 
+def stream_payload(video_id: str, quality: str, mode: str) -> dict:
+    """Build the /api/stream response for a video"""
+    # One extraction yields every format; the player gets the whole manifest
+    # so it can switch qualities without coming back to the server
+    manifest = get_stream_manifest(video_id)
+    qualities = get_stream_qualities(manifest)
+
+    if mode == 'experimental' and quality == 'best':
+        video_url = qualities.get('bestvideo')
+        audio_url = qualities.get('bestaudio')
+
+        if not video_url or not audio_url:
+            logging.error(f"No separate best video/audio formats for {video_id}, falling back to normal mode")
+            stream_url = get_video_stream_url(video_id, "720")
+            return {'url': stream_url, 'mode': 'normal', 'qualities': qualities,
+                    'expires_at': manifest['expires_at']}
+
+        # Log the selected formats
+        logging.info(f"Selected best video and audio for {video_id}")
+
+        # Return separate URLs for video and audio, plus the combined fallback
+        return {
+            'video_url': video_url,
+            'audio_url': audio_url,
+            'url': qualities.get('720') or qualities.get('best'),
+            'mode': 'experimental',
+            'qualities': qualities,
+            'expires_at': manifest['expires_at']
+        }
+
+    # Normal mode - get combined stream
+    stream_url = get_video_stream_url(video_id, quality)
+    return {'url': stream_url, 'mode': 'normal', 'qualities': qualities,
+            'expires_at': manifest['expires_at']}
+
+def search_payload(query: str, cursor: str, max_results: int, skip: int, country_code: str) -> dict:
+    """Build the /api/search response; raises ValueError for a bad cursor"""
+    if cursor:
+        videos, next_cursor, listing = listing_store.page_from_cursor(cursor, max_results, 'search')
+    else:
+        # Plain skip/max_results requests are served from the same stored listing
+        videos, next_cursor, listing = listing_store.page('search', {'q': query, 'country': country_code},
+                                                          max(skip, 0), max_results)
+
+    return {
+        'videos': videos,
+        'next_cursor': next_cursor,
+        'total_available': len(listing.items),
+        'query': listing.params['q']
+    }
+
+def channel_videos_payload(channel_id: str, cursor: str, max_results: int, skip: int) -> dict:
+    """Build the /api/channel response; raises ValueError for a bad cursor"""
+    if cursor:
+        offset = decode_cursor(cursor)[2]
+        results, next_cursor, listing = listing_store.page_from_cursor(cursor, max_results, 'channel')
+    else:
+        offset = max(skip, 0)
+        results, next_cursor, listing = listing_store.page('channel', {'id': channel_id}, offset, max_results)
+
+    # Stats cover every video loaded so far and come from the listing's
+    # running aggregate, so they are returned with each page at no extra cost
+    channel_stats = format_channel_stats(listing.stats.summary(offset + len(results)))
+
+    return {
+        'videos': results,
+        'channel_id': listing.params['id'],
+        'next_cursor': next_cursor,
+        'channel_stats': channel_stats
+    }
+
 @app.route('/api/stream')
 def get_stream():
     """API endpoint to get video stream URL"""
@@ -96,76 +256,103 @@ def get_stream():
         return jsonify({'error': 'No video ID provided'}), 400
 
     try:
-        if mode == 'experimental' and quality == 'best':
-            # Use direct yt-dlp commands to get the best audio and video separately
-            # Get best video without audio
-            video_cmd = ["yt-dlp", "-f", "bestvideo", "-g", f"https://www.youtube.com/watch?v={video_id}"]
-            video_result = subprocess.run(video_cmd, capture_output=True, text=True)
-            
-            if video_result.returncode != 0:
-                logging.error(f"yt-dlp error fetching best video: {video_result.stderr}")
-                # Fallback to normal mode
-                stream_url = get_video_stream_url(video_id, "720")
-                return jsonify({'url': stream_url, 'mode': 'normal'})
-            
-            video_url = video_result.stdout.strip()
-            
-            # Get best audio
-            audio_cmd = ["yt-dlp", "-f", "bestaudio", "-g", f"https://www.youtube.com/watch?v={video_id}"]
-            audio_result = subprocess.run(audio_cmd, capture_output=True, text=True)
-            
-            if audio_result.returncode != 0:
-                logging.error(f"yt-dlp error fetching best audio: {audio_result.stderr}")
-                # Fallback to normal mode
-                stream_url = get_video_stream_url(video_id, "720")
-                return jsonify({'url': stream_url, 'mode': 'normal'})
-            
-            audio_url = audio_result.stdout.strip()
-            
-            # Log the selected formats
-            logging.info(f"Selected best video and audio for {video_id}")
-            
-            # Return separate URLs for video and audio
-            return jsonify({
-                'video_url': video_url, 
-                'audio_url': audio_url,
-                'mode': 'experimental'
-            })
-        else:
-            # Normal mode - get combined stream
-            stream_url = get_video_stream_url(video_id, quality)
-            return jsonify({'url': stream_url, 'mode': 'normal'})
+        return jsonify(stream_payload(video_id, quality, mode))
     except Exception as e:
         logging.error(f"Error getting stream URL for {video_id}: {e}")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/search')
 def api_search():
-    """API endpoint to search videos"""
+    """API endpoint to search videos, paginated with an opaque cursor"""
     query = request.args.get('q', '')
-    max_results = request.args.get('max_results', 10, type=int)
+    cursor = request.args.get('cursor')
+    max_results = min(request.args.get('max_results', 10, type=int), MAX_PAGE_SIZE)
     skip = request.args.get('skip', 0, type=int)
+    country_code = request.args.get('country', 'TR')
 
-    if not query:
+    if not query and not cursor:
         return jsonify({'error': 'No search query provided'}), 400
 
     try:
-        # Get a larger batch of results and paginate them here
-        total_results = max_results + skip
-        all_results = search_videos(query, total_results)
-        
-        # Apply pagination - only return the segment requested
-        paginated_results = all_results[skip:skip + max_results] if skip < len(all_results) else []
-        
-        return jsonify({
-            'videos': paginated_results,
-            'total_available': len(all_results),
-            'query': query
-        })
+        return jsonify(search_payload(query, cursor, max_results, skip, country_code))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logging.error(f"API search error: {e}")
         return jsonify({'error': str(e)}), 500
 
+def search_stream_messages(query: str, country_code: str, max_results: int):
+    """Yield the messages of a streamed search: one per result, then 'done' (or 'error')
+
+    Results already held by the search listing are sent straight away, the
+    rest as yt-dlp prints them. The final message carries the cursor for the
+    next page and how long the first result and the whole stream took.
+    """
+    start = time.monotonic()
+    first_result_ms = None
+    sent = 0
+    listing = listing_store.get_listing('search', {'q': query, 'country': country_code})
+    try:
+        for video in listing.stream(max_results, STREAM_FETCHERS['search']):
+            if first_result_ms is None:
+                first_result_ms = (time.monotonic() - start) * 1000
+            sent += 1
+            yield {'type': 'video', 'video': video}
+    except Exception as e:
+        logging.error(f"Streamed search error for '{query}': {e}")
+        message = {'type': 'error', 'error': str(e)}
+        if was_rejected():
+            message['retry_after'] = extraction_scheduler.retry_after()
+        yield message
+        return
+
+    total_ms = (time.monotonic() - start) * 1000
+    if first_result_ms is not None:
+        search_stream_timings.record(first_result=first_result_ms, total=total_ms)
+    logging.info(f"Streamed {sent} results for '{query}': first after {first_result_ms or 0:.0f} ms, "
+                 f"all after {total_ms:.0f} ms")
+    yield {
+        'type': 'done',
+        'count': sent,
+        'next_cursor': listing_store.next_cursor(listing, 0, sent),
+        'first_result_ms': round(first_result_ms, 1) if first_result_ms is not None else None,
+        'total_ms': round(total_ms, 1),
+    }
+
+@app.route('/api/search/stream')
+def api_search_stream():
+    """API endpoint streaming the first page of a search while it is extracted
+
+    Sends NDJSON by default, or Server-Sent Events with format=sse. Pages
+    after the first are fetched from /api/search with the returned cursor.
+    """
+    query = request.args.get('q', '')
+    max_results = min(request.args.get('max_results', SEARCH_FIRST_PAGE, type=int), MAX_PAGE_SIZE)
+    country_code = request.args.get('country', 'TR')
+    sse = request.args.get('format', 'ndjson') == 'sse'
+
+    if not query:
+        return jsonify({'error': 'No search query provided'}), 400
+
+    def generate():
+        for message in search_stream_messages(query, country_code, max(max_results, 1)):
+            if sse:
+                yield f"event: {message['type']}\ndata: {json.dumps(message)}\n\n"
+            else:
+                yield json.dumps(message) + '\n'
+
+    response = Response(stream_with_context(generate()),
+                        mimetype='text/event-stream' if sse else 'application/x-ndjson')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Keep reverse proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/search/stream/stats')
+def search_stream_stats():
+    """API endpoint exposing time-to-first-result and total time of recent streamed searches"""
+    return jsonify(search_stream_timings.summary())
+
 @app.route('/channel/<path:channel_id>')
 def channel_page(channel_id):
     """Channel page showing channel info and videos"""
@@ -177,72 +364,79 @@ def channel_page(channel_id):
         channel_info = get_channel_info(channel_id)
         
         # Only load a small initial batch of videos for the first page render
-        initial_videos = get_channel_videos(channel_id, max_results=10)
+        initial_videos, next_cursor, listing = listing_store.page('channel', {'id': channel_id}, 0, 10)
         
-        # Initial stats based on available videos
+        # Initial stats based on the displayed videos, read from the listing's running aggregate
         # Complete stats will be updated via JS as more videos load
-        total_views = sum(int(video.get('raw_view_count', 0)) for video in initial_videos)
-        video_count = len(initial_videos)
-        avg_views = round(total_views / video_count) if video_count > 0 else 0
-        
         channel = {
             'id': channel_id,
             'name': channel_info.get('name', 'Unknown Channel'),
-            'description': channel_info.get('description', ''),
-            'total_views': format_view_count(total_views),
-            'video_count': video_count,
-            'avg_views': format_view_count(avg_views)
+            'description': channel_info.get('description', '')
         }
+        channel.update(format_channel_stats(listing.stats.summary(len(initial_videos))))
         
-        return render_template('channel.html', channel=channel, videos=initial_videos)
+        return render_template('channel.html', channel=channel, videos=initial_videos, next_cursor=next_cursor)
     except Exception as e:
         logging.error(f"Error loading channel {channel_id}: {e}")
         return render_template('channel.html', channel=None, videos=[], error="Failed to load channel")
 
 @app.route('/api/channel')
 def channel_videos():
-    """API endpoint to get videos from a specific channel"""
+    """API endpoint to get videos from a specific channel, paginated with an opaque cursor"""
     channel_id = request.args.get('id', '')
-    max_results = request.args.get('max_results', 10, type=int)
+    cursor = request.args.get('cursor')
+    max_results = min(request.args.get('max_results', 10, type=int), MAX_PAGE_SIZE)
     skip = request.args.get('skip', 0, type=int)
 
-    if not channel_id:
+    if not channel_id and not cursor:
         return jsonify({'error': 'No channel ID provided'}), 400
 
     try:
-        # Get a batch of videos with pagination
-        results = get_channel_videos(channel_id, max_results, skip)
-        
-        # If we're loading more videos and need to update channel stats
-        if skip > 0 and request.args.get('update_stats', 'false').lower() == 'true':
-            # Get all videos loaded so far for accurate stats
-            all_loaded_videos = get_channel_videos(channel_id, skip + max_results)
-            
-            # Calculate updated stats
-            total_views = sum(int(video.get('raw_view_count', 0)) for video in all_loaded_videos)
-            video_count = len(all_loaded_videos)
-            avg_views = round(total_views / video_count) if video_count > 0 else 0
-            
-            channel_stats = {
-                'total_views': format_view_count(total_views),
-                'video_count': video_count,
-                'avg_views': format_view_count(avg_views)
-            }
-            
-            return jsonify({
-                'videos': results, 
-                'channel_id': channel_id,
-                'channel_stats': channel_stats
-            })
-            
-        return jsonify({
-            'videos': results, 
-            'channel_id': channel_id
-        })
+        return jsonify(channel_videos_payload(channel_id, cursor, max_results, skip))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logging.error(f"Error fetching channel videos for {channel_id}: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/subscriptions/feed', methods=['GET', 'POST'])
+def subscriptions_feed():
+    """API endpoint returning the latest videos of many channels in one response
+
+    Channels come from a JSON body ({"channels": [...]}) or ?ids=a,b,c. With
+    stream=true each channel is sent as an NDJSON line as soon as it completes.
+    """
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        payload = {}
+    channels = payload.get('channels')
+    if channels is None:
+        channels = [c for c in request.args.get('ids', '').split(',') if c]
+    if not isinstance(channels, list):
+        return jsonify({'error': 'channels must be a list'}), 400
+
+    channel_ids = normalize_channel_ids(channels)
+    per_channel = payload.get('per_channel') or request.args.get('per_channel', 3, type=int)
+    if not isinstance(per_channel, int):
+        return jsonify({'error': 'per_channel must be an integer'}), 400
+    per_channel = min(max(per_channel, 1), MAX_PAGE_SIZE)
+    stream = bool(payload.get('stream')) or request.args.get('stream', 'false').lower() == 'true'
+
+    if not channel_ids:
+        return jsonify({'error': 'No channel IDs provided'}), 400
+
+    try:
+        if stream:
+            def generate():
+                for result in iter_channel_videos(channel_ids, per_channel):
+                    yield json.dumps(result) + '\n'
+            return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+        return jsonify(build_feed(channel_ids, per_channel))
+    except Exception as e:
+        logging.error(f"Error building subscriptions feed: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/download')
 def download_video():
     """API endpoint to get download link for a video"""
@@ -275,6 +469,60 @@ def get_video_description():
         logging.error(f"Error getting description for {video_id}: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/trending/status')
+def trending_status():
+    """API endpoint exposing the age of each prefetched trending snapshot"""
+    return jsonify(trending_prefetcher.status())
+
+@app.route('/api/scheduler/stats')
+def scheduler_stats():
+    """API endpoint exposing extraction queue depth, wait times and rejection counts"""
+    return jsonify(extraction_scheduler.stats())
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint with route, yt-dlp, upstream and card render latencies
+
+    Covers every worker when METRICS_DIR is set (gunicorn.conf.py does), otherwise only this process.
+    """
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/debug/traces')
+def debug_traces():
+    """Recent request traces, newest first (only when TRACE_REQUESTS=1); min_ms filters out fast ones"""
+    if not tracing.TRACE_REQUESTS:
+        return jsonify({'error': 'Request tracing is disabled, set TRACE_REQUESTS=1'}), 404
+    return jsonify({'traces': tracing.recent_traces(request.args.get('min_ms', 0, type=float)),
+                    'slow_threshold_ms': tracing.TRACE_SLOW_MS})
+
+@app.route('/api/debug/traces/<trace_id>')
+def debug_trace(trace_id):
+    """The full span tree of one recent request"""
+    if not tracing.TRACE_REQUESTS:
+        return jsonify({'error': 'Request tracing is disabled, set TRACE_REQUESTS=1'}), 404
+    trace = tracing.get_trace(trace_id)
+    if trace is None:
+        return jsonify({'error': 'Trace not found'}), 404
+    return jsonify(trace)
+
+@app.route('/api/hedge/stats')
+def hedge_stats():
+    """API endpoint exposing how often fallbacks were hedged, which attempt won, and channel resolver counters"""
+    return jsonify(dict(hedger.stats(), channel_resolver=channel_resolver.stats()))
+
+@app.route('/api/upstream/stats')
+def upstream_stats():
+    """API endpoint exposing per-host latency, error and circuit breaker state for outbound HTTP calls"""
+    return jsonify(upstream.stats())
+
+@app.route('/api/cache/stats')
+def cache_stats():
+    """API endpoint exposing cache hit/miss/eviction counters and coalesced extraction counts"""
+    return jsonify(dict(metadata_cache.stats(), stream_urls=stream_cache.stats(),
+                        coalescing=extraction_flights.stats(), cards=card_store.stats(),
+                        music_catalog=music_catalog.stats(), media=media_cache.stats(),
+                        thumbnails=thumbnail_cache.stats()))
+
 @app.errorhandler(404)
 def page_not_found(e):
     return render_template('base.html', error="Page not found"), 404
@@ -296,15 +544,12 @@ def music():
 def music_detail(music_id):
     """Music detail page showing a specific song with its player"""
     try:
-        # Şarkı bilgisini API'den al
-        response = requests.get('https://anonmusic.glitch.me/api/s/all')
-        
-        if response.status_code != 200:
-            logging.error(f"Error fetching music data: {response.status_code}")
+        # Şarkı bilgisini önbellekteki katalogdan al
+        try:
+            music = music_catalog.get(music_id)
+        except Exception as e:
+            logging.error(f"Error fetching music data: {e}")
             return render_template('index.html', error="Müzik bilgisi alınamadı"), 500
-            
-        music_list = response.json()
-        music = next((m for m in music_list if m['id'] == music_id), None)
         
         if not music:
             return render_template('index.html', error="Şarkı bulunamadı"), 404
@@ -312,9 +557,9 @@ def music_detail(music_id):
         # Formatlı şarkı oynatma sayısı
         plays_formatted = format_number_for_display(music.get('plays', 0))
         
-        # Kapak resmi ve ses dosyası URL'lerini oluştur
-        cover_url = f"https://anonmusic.glitch.me{music['imagePath']}"
-        audio_url = f"https://anonmusic.glitch.me{music['audioPath']}"
+        # Kapak resmi ve ses dosyası önbellekli proxy üzerinden sunulur
+        cover_url = url_for('music_cover', music_id=music_id)
+        audio_url = url_for('music_audio', music_id=music_id)
         
         return render_template('music_detail.html', 
                               music=music, 
@@ -325,22 +570,133 @@ def music_detail(music_id):
         logging.error(f"Error loading music detail page: {e}")
         return render_template('index.html', error="Müzik detay sayfası yüklenirken hata oluştu"), 500
 
+def json_body_response(body: bytes, etag: Optional[str], gzip_body: Optional[bytes] = None):
+    """JSON response with ETag revalidation and gzip when the client accepts it"""
+    if etag and etag in request.if_none_match:
+        response = app.response_class(status=304)
+    else:
+        if request.accept_encodings['gzip'] and len(body) > 1024:
+            response = app.response_class(gzip_body or gzip.compress(body), mimetype='application/json')
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = app.response_class(body, mimetype='application/json')
+    response.headers['Vary'] = 'Accept-Encoding'
+    if etag:
+        response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = MUSIC_RESPONSE_MAX_AGE
+    else:
+        response.cache_control.no_store = True
+    return response
+
 @app.route('/api/music')
 def get_music_list():
-    """API endpoint to get music list from AnonMusic API"""
+    """API endpoint serving the AnonMusic catalog from the local cache
+
+    Without `limit` the whole list is returned as before. With it, a page
+    {songs, total, offset, next_offset} in `sort` order (default, plays,
+    newest, random; random pages stay consistent for the same `seed`).
+    """
+    sort = request.args.get('sort', 'default')
+    if sort not in SORTS:
+        return jsonify({"error": f"Unsupported sort, use one of: {', '.join(SORTS)}"}), 400
+    limit = request.args.get('limit', type=int)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    seed = request.args.get('seed', type=int)
+
     try:
-        # Sunucu tarafında API çağrısı yap
-        response = requests.get('https://anonmusic.glitch.me/api/s/all')
-        
-        if response.status_code == 200:
-            return jsonify(response.json())
-        else:
-            logging.error(f"Error fetching music data: {response.status_code}")
-            return jsonify({"error": f"API returned status code {response.status_code}"}), response.status_code
+        snapshot = music_catalog.snapshot()
+        if limit is None and sort == 'default':
+            return json_body_response(snapshot.body, snapshot.etag, snapshot.gzip_body)
+
+        limit = min(limit, MAX_MUSIC_PAGE_SIZE) if limit is not None else None
+        songs, total = snapshot.page(sort, offset, limit, seed)
+        next_offset = offset + len(songs)
+        body = json.dumps({
+            'songs': songs,
+            'total': total,
+            'offset': offset,
+            'next_offset': next_offset if next_offset < total else None
+        }).encode('utf-8')
+        # An unseeded random page is different every time, so it can't be revalidated
+        etag = None if sort == 'random' and seed is None else \
+            f"{snapshot.etag}-{sort}-{offset}-{limit}-{seed}"
+        return json_body_response(body, etag)
     except Exception as e:
         logging.error(f"Error getting music list: {e}")
         return jsonify({"error": str(e)}), 500
 
+def proxy_music_media(music_id: str, path_field: str):
+    """Serve a song's upstream file from the media cache, honouring a single Range header
+
+    Multi-range requests get the whole file. The first segment is read before
+    any header is sent; Content-Length is only promised when that covers the
+    whole body, since later segments are fetched while streaming.
+    """
+    try:
+        music = music_catalog.get(music_id)
+    except Exception as e:
+        logging.error(f"Error fetching music data: {e}")
+        return jsonify({'error': str(e)}), 500
+    if not music or not music.get(path_field):
+        return jsonify({'error': 'Song not found'}), 404
+
+    url = f"{MUSIC_API_BASE}{music[path_field]}"
+    try:
+        info = media_cache.info(url)
+    except Exception as e:
+        logging.error(f"Error fetching {path_field} for song {music_id}: {e}")
+        return jsonify({'error': str(e)}), 502
+
+    size = info['size']
+    etag = f"{media_cache.resource_key(url)}-{size}"
+    if not request.range and etag in request.if_none_match:
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+
+    status = 200
+    start, stop = 0, size
+    if request.range:
+        byte_range = request.range.range_for_length(size)
+        if byte_range is not None:
+            start, stop = byte_range
+            status = 206
+        elif len(request.range.ranges) == 1:
+            response = app.response_class(status=416)
+            response.headers['Content-Range'] = f"bytes */{size}"
+            return response
+        # Several ranges aren't supported; the whole file is a valid answer to them
+
+    chunks = media_cache.iter_range(url, start, stop)
+    try:
+        first_chunk = next(chunks, b'')
+    except Exception as e:
+        logging.error(f"Error reading {path_field} for song {music_id}: {e}")
+        return jsonify({'error': str(e)}), 502
+
+    response = Response(stream_with_context(itertools.chain((first_chunk,), chunks)),
+                        status=status, mimetype=info['content_type'])
+    response.headers['Accept-Ranges'] = 'bytes'
+    if len(first_chunk) == stop - start:
+        response.headers['Content-Length'] = str(stop - start)
+    if status == 206:
+        response.headers['Content-Range'] = f"bytes {start}-{stop - 1}/{size}"
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = MEDIA_MAX_AGE
+    return response
+
+@app.route('/api/music/<music_id>/audio')
+def music_audio(music_id):
+    """Song audio, proxied through the local segment cache with Range support"""
+    return proxy_music_media(music_id, 'audioPath')
+
+@app.route('/api/music/<music_id>/cover')
+def music_cover(music_id):
+    """Song cover image, proxied through the local segment cache"""
+    return proxy_music_media(music_id, 'imagePath')
+
 def format_number_for_display(num):
     """Format a number for display (e.g., 1000 -> 1K, 1000000 -> 1M)"""
     if num < 1000:
@@ -350,31 +706,44 @@ def format_number_for_display(num):
     else:
         return f"{num/1000000:.1f}M".replace('.0M', 'M')
 
-if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
-from datetime import datetime, timedelta
-
-# Create temp directory for cards
-TEMP_CARDS_DIR = 'static/temp_cards'
-os.makedirs(TEMP_CARDS_DIR, exist_ok=True)
-
-def cleanup_old_cards():
-    """Remove cards older than 5 minutes"""
-    while True:
-        now = datetime.now()
-        for filename in os.listdir(TEMP_CARDS_DIR):
-            filepath = os.path.join(TEMP_CARDS_DIR, filename)
-            file_time = datetime.fromtimestamp(os.path.getctime(filepath))
-            if now - file_time > timedelta(minutes=5):
-                try:
-                    os.remove(filepath)
-                except:
-                    pass
-        time.sleep(60)  # Check every minute
-
-# Start cleanup thread
-cleanup_thread = threading.Thread(target=cleanup_old_cards, daemon=True)
-cleanup_thread.start()
+_background_lock = threading.Lock()
+_background_pid = None
+
+def start_background_tasks():
+    """Start the trending prefetcher and metrics publisher once per process
+
+    Called by the server entry points after a worker starts (threads don't
+    survive a fork, so starting them at import time would leave preloaded
+    workers without them). Safe to call repeatedly.
+    """
+    global _background_pid
+    with _background_lock:
+        if _background_pid == os.getpid():
+            return
+        _background_pid = os.getpid()
+
+    # Start refreshing trending feeds in the background
+    trending_prefetcher.start()
+    # Let whichever worker answers /metrics include this one's series
+    metrics_registry.start_publishing()
+
+@app.route('/thumb/<video_id>')
+def thumbnail_image(video_id):
+    """Video thumbnail from the local cache; ?size=grid|sidebar|card|original"""
+    size = request.args.get('size', 'grid')
+    try:
+        path = thumbnail_cache.path(video_id, size)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        logging.error(f"Error loading thumbnail for {video_id}: {e}")
+        return jsonify({'error': str(e)}), 502
+
+    response = send_file(path, mimetype='image/jpeg', conditional=True, max_age=THUMB_MAX_AGE)
+    response.cache_control.public = True
+    return response
 
 @app.route('/api/videocard')
 def generate_video_card():
@@ -382,79 +751,36 @@ def generate_video_card():
     if not video_id:
         return jsonify({'error': 'No video ID provided'}), 400
 
-    try:
-        # Check if card already exists and is fresh
-        card_path = os.path.join(TEMP_CARDS_DIR, f'{video_id}.png')
-        if os.path.exists(card_path):
-            file_time = datetime.fromtimestamp(os.path.getctime(card_path))
-            if datetime.now() - file_time < timedelta(minutes=5):
-                return send_file(card_path, mimetype='image/png')
+    card_format = request.args.get('format', 'png').lower().replace('jpg', 'jpeg')
+    if card_format not in CARD_FORMATS:
+        return jsonify({'error': f"Unsupported card format, use one of: {', '.join(CARD_FORMATS)}"}), 400
+    image_format, mimetype, _ = CARD_FORMATS[card_format]
 
+    try:
         video_info = get_video_details(video_id)
-        
-        # Create image with dark background
-        width = 1280
-        height = 720
-        img = Image.new('RGB', (width, height), '#0d0d0d')
-        draw = ImageDraw.Draw(img)
-        
-        # Load and resize thumbnail
-        thumbnail_response = requests.get(video_info['thumbnail'])
-        thumbnail = Image.open(io.BytesIO(thumbnail_response.content))
-        thumbnail = thumbnail.resize((800, 450))
-        
-        # Add neon glow effect to thumbnail
-        from PIL import ImageFilter
-        glow = Image.new('RGB', (width, height), '#0d0d0d')
-        glow_draw = ImageDraw.Draw(glow)
-        glow_draw.rectangle([220, 50, 1060, 500], fill='#9d4edd', outline='#ff8500', width=3)
-        glow = glow.filter(ImageFilter.GaussianBlur(20))
-        img.paste(glow, (0, 0), None)
-        
-        # Calculate positions
-        thumb_x = (width - thumbnail.width) // 2
-        thumb_y = 50
-        
-        # Load fonts
-        try:
-            title_font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 42)
-            normal_font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 28)
-            stats_font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 24)
-        except:
-            title_font = ImageFont.load_default()
-            normal_font = ImageFont.load_default()
-            stats_font = ImageFont.load_default()
-            
-        # Draw thumbnail with border
-        draw.rectangle([thumb_x-3, thumb_y-3, thumb_x+thumbnail.width+3, thumb_y+thumbnail.height+3], 
-                      outline='#ff8500', width=3)
-        img.paste(thumbnail, (thumb_x, thumb_y))
-        
-        # Draw title with neon effect
-        y_offset = thumb_y + thumbnail.height + 30
-        draw.text((width//2, y_offset), video_info['title'], 
-                 font=title_font, fill='#ffffff', anchor="mm", stroke_width=1)
-        
-        # Draw channel name
-        y_offset += 50
-        draw.text((width//2, y_offset), f"by {video_info['channel']}", 
-                 font=normal_font, fill='#9d4edd', anchor="mm")
-        
-        # Draw stats with icons
-        y_offset += 50
-        stats_text = f"👁️ {video_info.get('view_count', '0')} views  •  📅 {video_info.get('published_at', '')}"
-        draw.text((width//2, y_offset), stats_text, 
-                 font=stats_font, fill='#ff8500', anchor="mm")
-        
-        # Draw "Watch on NeonTube" with glow
-        y_offset += 50
-        draw.text((width//2, y_offset), "Watch on NeonTube!", 
-                 font=title_font, fill='#ff8500', anchor="mm", stroke_width=2)
-        
-        # Save to file
-        img.save(card_path, 'PNG')
-        
-        return send_file(card_path, mimetype='image/png')
+
+        # Cards are addressed by their content, so the digest is a strong ETag
+        digest = card_digest(video_id, card_fields(video_info), video_info.get('thumbnail'), card_format)
+        if digest in request.if_none_match:
+            response = app.response_class(status=304)
+            response.set_etag(digest)
+        else:
+            filename = card_filename(video_id, digest, card_format)
+            card_path = card_store.get(filename)
+            if card_path is None:
+                # Rendered off the request thread; concurrent requests for one video share a render
+                card = card_renderer.render_video(video_id, video_info, image_format)
+                card_path = card_store.put(filename, card)
+            response = send_file(card_path, mimetype=mimetype, etag=digest, conditional=True,
+                                 last_modified=os.path.getmtime(card_path))
+
+        response.cache_control.public = True
+        response.cache_control.max_age = CARD_MAX_AGE
+        return response
     except Exception as e:
         logging.error(f"Error generating video card: {e}")
         return jsonify({'error': str(e)}), 500
+
+if __name__ == '__main__':
+    start_background_tasks()
+    app.run(host='0.0.0.0', port=5000, debug=os.environ.get('FLASK_DEBUG') == '1')
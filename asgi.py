@@ -0,0 +1,189 @@
+"""Async serving mode
+
+Run with `uvicorn asgi:application`. The extraction heavy API endpoints are
+served by coroutines that await yt-dlp work through async_api, so a single
+worker can keep thousands of requests waiting on extractions. Every other
+route is handed to the Flask app unchanged, on a pool of ASGI_WSGI_THREADS
+threads so page renders and open streams don't wait for each other.
+"""
+import os
+import json
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+from typing import Dict, Any, Callable, Awaitable, Tuple
+
+from app import (
+    app, MAX_PAGE_SIZE, start_background_tasks, stream_payload, search_payload, channel_videos_payload,
+    get_video_stream_url, get_video_details
+)
+from async_api import run_blocking, BlockingCallFailed, shutdown as shutdown_async_api
+from scheduler import extraction_scheduler
+from metrics import http_request_seconds
+import tracing
+
+try:
+    from asgiref.sync import sync_to_async
+    from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+except ImportError:  # Async endpoints still work, the rest of the site needs asgiref
+    WsgiToAsgi = None
+
+# Threads running the Flask routes; each open search stream or media proxy keeps one busy
+ASGI_WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS', 64))
+
+
+class BadRequest(Exception):
+    pass
+
+
+class QueryArgs:
+    """Small stand-in for Flask's request.args"""
+
+    def __init__(self, query_string: bytes):
+        self._values = parse_qs(query_string.decode('latin-1'))
+
+    def get(self, name: str, default: Any = None, type: Callable = None) -> Any:
+        values = self._values.get(name)
+        if not values:
+            return default
+        if type is None:
+            return values[0]
+        try:
+            return type(values[0])
+        except (TypeError, ValueError):
+            return default
+
+
+async def api_stream(args: QueryArgs) -> Dict[str, Any]:
+    video_id = args.get('v', '')
+    if not video_id:
+        raise BadRequest('No video ID provided')
+    return await run_blocking(stream_payload, video_id, args.get('quality', '720'), args.get('mode', 'normal'))
+
+
+async def api_search(args: QueryArgs) -> Dict[str, Any]:
+    query = args.get('q', '')
+    cursor = args.get('cursor')
+    if not query and not cursor:
+        raise BadRequest('No search query provided')
+    max_results = min(args.get('max_results', 10, type=int), MAX_PAGE_SIZE)
+    return await run_blocking(search_payload, query, cursor, max_results,
+                              args.get('skip', 0, type=int), args.get('country', 'TR'))
+
+
+async def api_channel(args: QueryArgs) -> Dict[str, Any]:
+    channel_id = args.get('id', '')
+    cursor = args.get('cursor')
+    if not channel_id and not cursor:
+        raise BadRequest('No channel ID provided')
+    max_results = min(args.get('max_results', 10, type=int), MAX_PAGE_SIZE)
+    return await run_blocking(channel_videos_payload, channel_id, cursor, max_results,
+                              args.get('skip', 0, type=int))
+
+
+async def api_download(args: QueryArgs) -> Dict[str, Any]:
+    video_id = args.get('v', '')
+    if not video_id:
+        raise BadRequest('No video ID provided')
+    return {'url': await run_blocking(get_video_stream_url, video_id, args.get('quality', '720'))}
+
+
+async def api_description(args: QueryArgs) -> Dict[str, Any]:
+    video_id = args.get('v', '')
+    if not video_id:
+        raise BadRequest('No video ID provided')
+    video_details = await run_blocking(get_video_details, video_id)
+    return {'description': video_details.get('description', '')}
+
+
+# GET endpoints served natively; the response bodies match the Flask routes
+ASYNC_ROUTES: Dict[str, Callable[[QueryArgs], Awaitable[Dict[str, Any]]]] = {
+    '/api/stream': api_stream,
+    '/api/search': api_search,
+    '/api/channel': api_channel,
+    '/api/download': api_download,
+    '/api/description': api_description,
+}
+
+
+async def send_json(send, status: int, payload: Dict[str, Any], headers: Tuple = ()) -> int:
+    body = json.dumps(payload).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'),
+                    (b'content-length', str(len(body)).encode())] + list(headers),
+    })
+    await send({'type': 'http.response.body', 'body': body})
+    return status
+
+
+async def handle_async_route(handler, scope, send) -> int:
+    """Serve a native async route, returning the response status"""
+    args = QueryArgs(scope.get('query_string', b''))
+    try:
+        payload = await handler(args)
+    except BadRequest as e:
+        return await send_json(send, 400, {'error': str(e)})
+    except BlockingCallFailed as e:
+        if isinstance(e.error, ValueError):
+            return await send_json(send, 400, {'error': str(e)})
+        if e.rejected:
+            retry_after = extraction_scheduler.retry_after()
+            return await send_json(send, 503,
+                                   {'error': 'Server is busy, please retry shortly', 'retry_after': retry_after},
+                                   ((b'retry-after', str(retry_after).encode()),))
+        logging.error(f"Error serving {scope['path']}: {e}")
+        return await send_json(send, 500, {'error': str(e)})
+    return await send_json(send, 200, payload)
+
+
+async def handle_lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            start_background_tasks()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            shutdown_async_api()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+_wsgi_application = None
+
+if WsgiToAsgi:
+    _wsgi_executor = ThreadPoolExecutor(max_workers=ASGI_WSGI_THREADS, thread_name_prefix='asgi-wsgi')
+    _run_wsgi_app = WsgiToAsgiInstance.__dict__['run_wsgi_app']
+
+    class PooledWsgiInstance(WsgiToAsgiInstance):
+        # asgiref runs WSGI apps thread-sensitively, i.e. one request at a time on a single thread
+        run_wsgi_app = sync_to_async(getattr(_run_wsgi_app, 'func', _run_wsgi_app), thread_sensitive=False,
+                                     executor=_wsgi_executor)
+
+    class PooledWsgiToAsgi(WsgiToAsgi):
+        async def __call__(self, scope, receive, send):
+            await PooledWsgiInstance(self.wsgi_application, self.duplicate_header_limit)(scope, receive, send)
+
+    _wsgi_application = PooledWsgiToAsgi(app)
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await handle_lifespan(receive, send)
+
+    handler = ASYNC_ROUTES.get(scope.get('path')) if scope['type'] == 'http' else None
+    if handler is not None and scope.get('method') == 'GET':
+        # Routes forwarded to Flask below are timed by its own request hooks
+        start = time.perf_counter()
+        trace = tracing.start_trace(f"GET {scope['path']}", route=scope['path'],
+                                    query=scope.get('query_string', b'').decode('utf-8', 'replace'))
+        status = await handle_async_route(handler, scope, send)
+        http_request_seconds.observe(time.perf_counter() - start, scope['path'], 'GET', str(status))
+        tracing.finish_trace(trace, status=status)
+        return
+
+    if _wsgi_application is None:
+        return await send_json(send, 501, {'error': 'asgiref is required to serve this route in async mode'})
+    await _wsgi_application(scope, receive, send)
@@ -0,0 +1,64 @@
+import os
+import asyncio
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from scheduler import extraction_scheduler, reset_rejection_flag, was_rejected, SchedulerBusy
+
+# Threads that run blocking extractions on behalf of the async server. By default there is one
+# for every extraction the scheduler can run or queue, so excess requests wait in (and are turned
+# away by) the scheduler's bounded queue. Calls beyond that are rejected instead of piling up in
+# the executor's unbounded queue with no deadline.
+ASYNC_EXTRACTION_THREADS = int(os.environ.get(
+    'ASYNC_EXTRACTION_THREADS', extraction_scheduler.max_concurrent + extraction_scheduler.max_queue))
+
+_executor = ThreadPoolExecutor(max_workers=ASYNC_EXTRACTION_THREADS, thread_name_prefix='async-extraction')
+_in_flight = 0  # blocking calls submitted and not finished, including ones whose caller went away
+_in_flight_lock = threading.Lock()
+
+
+def _call_finished(_):
+    global _in_flight
+    with _in_flight_lock:
+        _in_flight -= 1
+
+
+class BlockingCallFailed(Exception):
+    """Wraps an exception raised by a blocking call, remembering whether the scheduler rejected it"""
+
+    def __init__(self, error: BaseException, rejected: bool):
+        super().__init__(str(error))
+        self.error = error
+        self.rejected = rejected
+
+
+async def run_blocking(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Await a blocking function (yt-dlp extraction, cache lookup, ...) without holding the event loop
+
+    The call runs in a copy of the caller's context so extraction priorities
+    set by the caller apply. Failures are raised as BlockingCallFailed, with
+    `rejected` set when the extraction scheduler turned the call away or
+    every executor thread is already taken.
+    """
+    global _in_flight
+    with _in_flight_lock:
+        admitted = _in_flight < ASYNC_EXTRACTION_THREADS
+        if admitted:
+            _in_flight += 1
+    if not admitted:
+        error = SchedulerBusy("Too many requests waiting for an extraction", extraction_scheduler.retry_after())
+        raise BlockingCallFailed(error, True)
+    context = contextvars.copy_context()
+    context.run(reset_rejection_flag)
+    future = _executor.submit(context.run, fn, *args, **kwargs)
+    future.add_done_callback(_call_finished)
+    try:
+        return await asyncio.wrap_future(future)
+    except Exception as e:
+        raise BlockingCallFailed(e, context.run(was_rejected)) from e
+
+
+def shutdown():
+    _executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,111 @@
+"""Cards/second of the original inline card drawing vs the card renderer
+
+"before" reproduces the old request path: fonts loaded and the glow layer
+blurred for every card. "after" uses preloaded assets, in the calling thread
+and through the process pool with concurrent requests. Thumbnails are
+generated locally, so no network access happens.
+Usage: python benchmarks/bench_card_renderer.py [cards] [concurrency]
+"""
+import io
+import os
+import sys
+import time
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw, ImageFont, ImageFilter
+
+from card_renderer import CardRenderer, render_card, card_fields, load_assets, FONT_DIR
+
+VIDEO_INFO = {
+    'title': 'Stub video with a reasonably long title for the card',
+    'channel': 'Stub Channel',
+    'view_count': '1.2M',
+    'published_at': 'May 01, 2024',
+    'thumbnail': None,
+}
+
+
+def make_thumbnail() -> bytes:
+    output = io.BytesIO()
+    Image.new('RGB', (1280, 720), '#3a86ff').save(output, 'JPEG')
+    return output.getvalue()
+
+
+def render_before(video_info, thumbnail_bytes) -> bytes:
+    """The original generate_video_card drawing code, minus the file write"""
+    width, height = 1280, 720
+    img = Image.new('RGB', (width, height), '#0d0d0d')
+    draw = ImageDraw.Draw(img)
+    thumbnail = Image.open(io.BytesIO(thumbnail_bytes)).resize((800, 450))
+    glow = Image.new('RGB', (width, height), '#0d0d0d')
+    glow_draw = ImageDraw.Draw(glow)
+    glow_draw.rectangle([220, 50, 1060, 500], fill='#9d4edd', outline='#ff8500', width=3)
+    glow = glow.filter(ImageFilter.GaussianBlur(20))
+    img.paste(glow, (0, 0), None)
+    thumb_x = (width - thumbnail.width) // 2
+    thumb_y = 50
+    try:
+        title_font = ImageFont.truetype(os.path.join(FONT_DIR, 'DejaVuSans-Bold.ttf'), 42)
+        normal_font = ImageFont.truetype(os.path.join(FONT_DIR, 'DejaVuSans.ttf'), 28)
+        stats_font = ImageFont.truetype(os.path.join(FONT_DIR, 'DejaVuSans.ttf'), 24)
+    except OSError:
+        title_font = normal_font = stats_font = ImageFont.load_default()
+    draw.rectangle([thumb_x - 3, thumb_y - 3, thumb_x + thumbnail.width + 3, thumb_y + thumbnail.height + 3],
+                   outline='#ff8500', width=3)
+    img.paste(thumbnail, (thumb_x, thumb_y))
+    y_offset = thumb_y + thumbnail.height + 30
+    draw.text((width // 2, y_offset), video_info['title'], font=title_font, fill='#ffffff', anchor="mm", stroke_width=1)
+    y_offset += 50
+    draw.text((width // 2, y_offset), f"by {video_info['channel']}", font=normal_font, fill='#9d4edd', anchor="mm")
+    y_offset += 50
+    draw.text((width // 2, y_offset), f"👁️ {video_info['view_count']} views  •  📅 {video_info['published_at']}",
+              font=stats_font, fill='#ff8500', anchor="mm")
+    y_offset += 50
+    draw.text((width // 2, y_offset), "Watch on NeonTube!", font=title_font, fill='#ff8500', anchor="mm", stroke_width=2)
+    output = io.BytesIO()
+    img.save(output, 'PNG')
+    return output.getvalue()
+
+
+def cards_per_second(render, cards, concurrency=1):
+    start = time.perf_counter()
+    if concurrency == 1:
+        for _ in range(cards):
+            render()
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(lambda _: render(), range(cards)))
+    return cards / (time.perf_counter() - start)
+
+
+def main():
+    cards = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    thumbnail = make_thumbnail()
+    fields = card_fields(VIDEO_INFO)
+    load_assets()
+
+    renderer = CardRenderer(max_workers=concurrency)
+    renderer.fetch_thumbnail = lambda video_id: thumbnail
+    # Distinct video ids so the pool benchmark measures renders, not coalescing
+    ids = itertools.count()
+    renderer.render_video("warmup", VIDEO_INFO)
+
+    results = [
+        ('before (inline)', cards_per_second(lambda: render_before(VIDEO_INFO, thumbnail), cards)),
+        ('after (inline)', cards_per_second(lambda: render_card(fields, thumbnail), cards)),
+        (f"after (pool x{concurrency})",
+         cards_per_second(lambda: renderer.render_video(f"v{next(ids)}", VIDEO_INFO), cards, concurrency)),
+    ]
+    renderer.shutdown()
+
+    print(f"{'renderer':<20} {'cards/s':>10}")
+    for name, rate in results:
+        print(f"{name:<20} {rate:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Compare p50/p99 latency of the subprocess and in-process yt-dlp backends
+
+Both backends run against the local stub extractor, so the numbers isolate the
+per-call overhead (interpreter start-up, imports, instance creation) from the
+network. Usage: python benchmarks/bench_extractor.py [iterations]
+"""
+import os
+import sys
+import time
+import shlex
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extractor import SubprocessBackend, InProcessBackend, YDLEngine
+from stub_extractor import StubYoutubeDL, stub_parse_options
+
+STUB_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stub_extractor.py')
+
+COMMANDS = {
+    'search': ["yt-dlp", "--flat-playlist", "--dump-json", "ytsearch10:neon"],
+    'video': ["yt-dlp", "--dump-json", "--no-playlist", "https://www.youtube.com/watch?v=stub0000001"],
+    'stream': ["yt-dlp", "-f", "best[height<=720]", "-g", "https://www.youtube.com/watch?v=stub0000001"],
+}
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure(backend, command, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        backend.run(command, timeout=30)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    backends = [
+        SubprocessBackend(executable=f"{shlex.quote(sys.executable)} {shlex.quote(STUB_SCRIPT)}"),
+        InProcessBackend(engine=YDLEngine(ydl_class=StubYoutubeDL, parse_options=stub_parse_options)),
+    ]
+
+    print(f"{'backend':<12} {'command':<8} {'p50 ms':>10} {'p99 ms':>10} {'mean ms':>10}")
+    for backend in backends:
+        for kind, command in COMMANDS.items():
+            samples = measure(backend, command, iterations)
+            print(f"{backend.name:<12} {kind:<8} {statistics.median(samples):>10.2f} "
+                  f"{percentile(samples, 99):>10.2f} {statistics.mean(samples):>10.2f}")
+        backend.shutdown()
+
+
+if __name__ == '__main__':
+    main()
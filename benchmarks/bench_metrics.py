@@ -0,0 +1,72 @@
+"""Overhead of the metrics instrumentation on the hot paths
+
+Measures the cost of one histogram observation (single-threaded and with
+threads contending for the same series), of the timing wrapper around a
+yt-dlp call, and of rendering /metrics with a realistic number of series.
+Usage: python benchmarks/bench_metrics.py [--observations N] [--threads N]
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import MetricsRegistry
+
+
+def per_call_ns(fn, iterations):
+    start = time.perf_counter()
+    fn(iterations)
+    return (time.perf_counter() - start) / iterations * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--observations', type=int, default=500000)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    registry = MetricsRegistry()
+    histogram = registry.histogram('bench_seconds', 'benchmark', ('route', 'method', 'status'))
+
+    def baseline(n):
+        for _ in range(n):
+            time.perf_counter() - time.perf_counter()
+
+    def observe(n):
+        for _ in range(n):
+            start = time.perf_counter()
+            histogram.observe(time.perf_counter() - start, '/search', 'GET', '200')
+
+    base = per_call_ns(baseline, args.observations)
+    single = per_call_ns(observe, args.observations) - base
+
+    per_thread = args.observations // args.threads
+    threads = [threading.Thread(target=observe, args=(per_thread,)) for _ in range(args.threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    contended = (time.perf_counter() - start) / (per_thread * args.threads) * 1e9 - base
+
+    # About what a busy worker accumulates: every route times a few statuses, plus the other metrics
+    for route in range(40):
+        for status in ('200', '304', '404', '500', '503'):
+            histogram.observe(0.01, f"/route/{route}", 'GET', status)
+    start = time.perf_counter()
+    rounds = 50
+    for _ in range(rounds):
+        body = registry.render()
+    render_ms = (time.perf_counter() - start) / rounds * 1000
+
+    print(f"observe, single thread:   {single:8.0f} ns")
+    print(f"observe, {args.threads} threads:       {contended:8.0f} ns per observation (wall clock)")
+    print(f"render 200 series:        {render_ms:8.2f} ms ({len(body) // 1024} KB)")
+    print(f"share of a 1 ms request:  {single / 1e6 * 100:8.3f} % per observation")
+
+
+if __name__ == '__main__':
+    main()
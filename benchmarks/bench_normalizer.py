@@ -0,0 +1,127 @@
+"""Per-item cost of turning yt-dlp --flat-playlist output into listing items
+
+Compares the per-line loop the listing functions used to contain with the
+shared normalizer (batch and streaming). Runs against a recorded JSONL file
+when given, otherwise against synthetic entries shaped like yt-dlp's.
+Usage: python benchmarks/bench_normalizer.py [fixture.jsonl] [--items N] [--rounds N]
+"""
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from normalizer import normalize_listing, iter_records, format_records, format_duration, format_view_count
+
+
+def synthetic_entry(index: int) -> dict:
+    """A flat-playlist entry with the fields (and clutter) yt-dlp emits"""
+    video_id = f"{index:011d}"[-11:]
+    return {
+        '_type': 'url', 'ie_key': 'Youtube', 'id': video_id,
+        'url': f"https://www.youtube.com/watch?v={video_id}",
+        'title': f"Recorded video title number {index} with some length to it",
+        'description': None, 'duration': random.choice([None, 59, 212.0, 3725]),
+        'channel_id': 'UC' + 'x' * 22, 'channel': 'Some Channel', 'channel_url': None,
+        'uploader': 'Some Channel', 'uploader_id': '@somechannel', 'uploader_url': None,
+        'thumbnails': [{'url': f"https://i.ytimg.com/vi/{video_id}/hq720.jpg", 'height': 202, 'width': 360}],
+        'timestamp': None, 'release_timestamp': None, 'availability': None,
+        'view_count': random.choice([None, 87, 5400, 1250000]),
+        'live_status': None, 'channel_is_verified': None,
+        'upload_date': random.choice(['', '20240101', '20240315', '20231130']),
+        '__x_forwarded_for_ip': None, 'webpage_url': f"https://www.youtube.com/watch?v={video_id}",
+        'original_url': f"https://www.youtube.com/watch?v={video_id}", 'webpage_url_basename': 'watch',
+        'extractor': 'youtube', 'extractor_key': 'Youtube', 'playlist': 'neon', 'playlist_index': index + 1,
+    }
+
+
+def legacy_normalize(output: str, country_code: str) -> list:
+    """The loop search_videos/get_trending_videos used before the shared normalizer"""
+    videos = []
+    for line in output.splitlines():
+        if line.strip():
+            try:
+                video_info = json.loads(line)
+                duration = None
+                try:
+                    if video_info.get('duration'):
+                        duration = format_duration(int(video_info.get('duration')))
+                except Exception as e:
+                    logging.error(f"Error formatting duration: {e}")
+                view_count = None
+                try:
+                    if video_info.get('view_count'):
+                        view_count = format_view_count(int(video_info.get('view_count')))
+                except Exception as e:
+                    logging.error(f"Error formatting view count: {e}")
+                published_at = video_info.get('upload_date', '')
+                try:
+                    if published_at and isinstance(published_at, str) and len(published_at) == 8:
+                        from datetime import datetime
+                        date_obj = datetime.strptime(published_at, '%Y%m%d')
+                        published_at = date_obj.strftime('%B %d, %Y')
+                except Exception as e:
+                    logging.error(f"Error formatting date: {e}")
+                thumbnail = video_info.get('thumbnail', '')
+                if not thumbnail:
+                    thumbnail = f"https://i.ytimg.com/vi/{video_info.get('id', '')}/hqdefault.jpg"
+                videos.append({
+                    'id': video_info.get('id', ''),
+                    'title': video_info.get('title', 'Untitled Video'),
+                    'channel': video_info.get('uploader', 'Unknown Channel'),
+                    'channel_id': video_info.get('channel_id', ''),
+                    'thumbnail': thumbnail,
+                    'duration': duration,
+                    'view_count': view_count,
+                    'published_at': published_at,
+                    'country': country_code
+                })
+            except Exception as e:
+                logging.error(f"Error processing video info: {e}")
+                continue
+    return videos
+
+
+def per_item_us(fn, output: str, items: int, rounds: int) -> list:
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn(output)
+        samples.append((time.perf_counter() - start) / items * 1e6)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('fixture', nargs='?')
+    parser.add_argument('--items', type=int, default=5000)
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    if args.fixture:
+        with open(args.fixture) as f:
+            output = f.read()
+    else:
+        random.seed(0)
+        output = '\n'.join(json.dumps(synthetic_entry(i)) for i in range(args.items))
+    items = sum(1 for line in output.splitlines() if line.strip())
+
+    variants = [
+        ('legacy loop', lambda text: legacy_normalize(text, 'TR')),
+        ('normalizer (batch)', lambda text: normalize_listing(text, country='TR')),
+        ('normalizer (stream)', lambda text: format_records(iter_records(text.splitlines()), country='TR')),
+    ]
+    print(f"{items} items, {args.rounds} rounds")
+    print(f"{'variant':<22} {'median us/item':>15} {'min us/item':>12}")
+    for name, fn in variants:
+        samples = per_item_us(fn, output, items, args.rounds)
+        print(f"{name:<22} {statistics.median(samples):>15.2f} {min(samples):>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
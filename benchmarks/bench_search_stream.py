@@ -0,0 +1,65 @@
+"""Time-to-first-result versus total time for buffered and streamed searches
+
+Runs a search command through the subprocess backend against the local stub
+extractor, which prints one entry every STUB_ENTRY_DELAY seconds. The
+buffered path can only normalize results once the process exits; the
+streamed path hands each one on as soon as its line is printed.
+Usage: python benchmarks/bench_search_stream.py [--results N] [--delay S] [--rounds N]
+"""
+import os
+import sys
+import time
+import shlex
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extractor import SubprocessBackend
+from normalizer import normalize_listing, iter_records, format_records
+
+STUB_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stub_extractor.py')
+
+
+def buffered(backend, command):
+    start = time.perf_counter()
+    items = normalize_listing(backend.run(command, timeout=60), country='TR')
+    elapsed = (time.perf_counter() - start) * 1000
+    # Nothing reaches the client before the whole list is ready
+    return elapsed, elapsed, len(items)
+
+
+def streamed(backend, command):
+    start = time.perf_counter()
+    first = None
+    count = 0
+    for record in iter_records(backend.iter_lines(command, timeout=60)):
+        format_records((record,), country='TR')
+        if first is None:
+            first = (time.perf_counter() - start) * 1000
+        count += 1
+    return first, (time.perf_counter() - start) * 1000, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--results', type=int, default=10)
+    parser.add_argument('--delay', type=float, default=0.1, help='seconds between stub entries')
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ['STUB_ENTRY_DELAY'] = str(args.delay)
+    backend = SubprocessBackend(executable=f"{shlex.quote(sys.executable)} {shlex.quote(STUB_SCRIPT)}")
+    command = ["yt-dlp", "--flat-playlist", "--dump-json", f"ytsearch{args.results}:neon"]
+
+    print(f"{args.results} results, {args.delay * 1000:.0f} ms apart, {args.rounds} rounds")
+    print(f"{'mode':<10} {'first result ms':>16} {'total ms':>10} {'items':>6}")
+    for name, fn in (('buffered', buffered), ('streamed', streamed)):
+        samples = [fn(backend, command) for _ in range(args.rounds)]
+        first = statistics.median(sample[0] for sample in samples)
+        total = statistics.median(sample[1] for sample in samples)
+        print(f"{name:<10} {first:>16.1f} {total:>10.1f} {samples[0][2]:>6}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,366 @@
+"""Offline benchmark suite for the extraction and formatting layer
+
+Replays the fixtures in benchmarks/fixtures (see record_fixtures.py) in place
+of yt-dlp and measures each youtube_api function and each page/API route
+through Flask's test client. For every case it reports wall time, the part
+spent inside the extraction backend, the rest (parsing, normalizing, caching,
+serializing), template render time and peak memory allocated per call.
+Cold runs use a fresh video/query/channel every iteration so nothing is
+served from a cache; warm runs repeat one that has already been loaded.
+
+Results are written as JSON; --compare checks them against an earlier run
+and exits with status 1 when a case got slower than --threshold allows.
+Usage: python benchmarks/bench_suite.py [--iterations N] [--mode inprocess|subprocess]
+       [--cases SUBSTRING] [--output results.json] [--compare baseline.json] [--threshold 0.25]
+"""
+import os
+import sys
+import json
+import time
+import shlex
+import tempfile
+import argparse
+import platform
+import itertools
+import threading
+import tracemalloc
+import subprocess
+from collections import namedtuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPLAY_SCRIPT = os.path.join(ROOT, 'benchmarks', 'fixture_replay.py')
+sys.path.insert(0, ROOT)
+
+# Nothing may reach the network or persist between runs: no trending prefetch,
+# no channel resolver or metadata cache databases, scratch cache directories
+_scratch = tempfile.mkdtemp(prefix='neontube-bench-')
+os.environ['TRENDING_PREFETCH_COUNTRIES'] = ''
+os.environ['CHANNEL_RESOLVER_DB'] = ''
+os.environ.pop('CACHE_DB', None)
+for _name in ('MEDIA_CACHE_DIR', 'THUMB_CACHE_DIR', 'CARD_STORE_DIR'):
+    os.environ[_name] = os.path.join(_scratch, _name.lower())
+
+import extractor
+from extractor import SubprocessBackend
+from fixture_replay import FixtureBackend, FIXTURES_DIR, load_fixtures
+from youtube_api import (search_videos, stream_search_videos, get_trending_videos, get_video_details,
+                         get_stream_manifest, get_channel_overview, get_channel_videos)
+
+Case = namedtuple('Case', ['name', 'group', 'call', 'warm'])
+
+# Every cold call gets a number nobody has used, so it misses every cache
+_sequence = itertools.count(1)
+
+
+def video_id(n: int) -> str:
+    return f"bench{n:06d}"
+
+
+class TimedBackend:
+    """Wraps an extraction backend and adds up the time spent inside it"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.name = backend.name
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def _add(self, elapsed: float):
+        with self._lock:
+            self.seconds += elapsed
+
+    def run(self, command, timeout):
+        start = time.perf_counter()
+        try:
+            return self.backend.run(command, timeout)
+        finally:
+            self._add(time.perf_counter() - start)
+
+    def iter_lines(self, command, timeout):
+        # Only the time spent producing lines counts, not what the caller does with them
+        start = time.perf_counter()
+        lines = iter(self.backend.iter_lines(command, timeout))
+        self._add(time.perf_counter() - start)
+        while True:
+            start = time.perf_counter()
+            try:
+                line = next(lines)
+            except StopIteration:
+                return
+            finally:
+                self._add(time.perf_counter() - start)
+            yield line
+
+    def take(self) -> float:
+        """Seconds spent since the last call"""
+        with self._lock:
+            seconds, self.seconds = self.seconds, 0.0
+        return seconds
+
+    def shutdown(self):
+        self.backend.shutdown()
+
+
+class RenderTimer:
+    """Adds up template render time from Flask's template signals"""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self._local = threading.local()
+
+    def connect(self, app):
+        from flask import before_render_template, template_rendered
+        before_render_template.connect(self._start, app)
+        template_rendered.connect(self._finish, app)
+
+    def _start(self, sender, template, context, **extra):
+        self._local.start = time.perf_counter()
+
+    def _finish(self, sender, template, context, **extra):
+        start = getattr(self._local, 'start', None)
+        if start is not None:
+            self.seconds += time.perf_counter() - start
+            self._local.start = None
+
+    def take(self) -> float:
+        seconds, self.seconds = self.seconds, 0.0
+        return seconds
+
+
+def function_cases():
+    def consume(iterator):
+        return list(iterator)
+
+    return [
+        Case('search_videos', 'function', lambda n: search_videos(f"neon {n}", 20, 'TR'), True),
+        Case('stream_search_videos', 'function', lambda n: consume(stream_search_videos(f"neon {n}", 10, 'TR')), False),
+        Case('get_trending_videos', 'function', lambda n: get_trending_videos(20, f"C{n}"), True),
+        Case('get_video_details', 'function', lambda n: get_video_details(video_id(n)), True),
+        Case('get_stream_manifest', 'function', lambda n: get_stream_manifest(video_id(n)), True),
+        Case('get_channel_overview', 'function', lambda n: get_channel_overview(f"@neon{n}"), True),
+        Case('get_channel_videos', 'function', lambda n: get_channel_videos(f"@neon{n}", 10, 30), True),
+    ]
+
+
+def route_cases(render_timer: RenderTimer):
+    # Importing the app registers its routes and request hooks; function cases don't need it
+    from app import app
+    render_timer.connect(app)
+    client = app.test_client()
+
+    def get(path):
+        response = client.get(path)
+        response.get_data()
+        if response.status_code >= 400:
+            raise Exception(f"GET {path} returned {response.status_code}")
+        return response
+
+    def search_page(n):
+        # A warm search page is one whose listing an earlier request already loaded
+        get(f"/api/search?q=neon+{n}")
+        return get(f"/search?q=neon+{n}")
+
+    return [
+        Case('/', 'route', lambda n: get(f"/?country=C{n}"), True),
+        Case('/search', 'route', lambda n: get(f"/search?q=neon+{n}"), False),
+        Case('/search (listing loaded)', 'route', search_page, False),
+        Case('/api/search', 'route', lambda n: get(f"/api/search?q=neon+{n}"), True),
+        Case('/api/search/stream', 'route', lambda n: get(f"/api/search/stream?q=neon+{n}"), False),
+        Case('/watch', 'route', lambda n: get(f"/watch?v={video_id(n)}"), True),
+        Case('/api/stream', 'route', lambda n: get(f"/api/stream?v={video_id(n)}"), True),
+        Case('/api/description', 'route', lambda n: get(f"/api/description?v={video_id(n)}"), True),
+        Case('/channel/<id>', 'route', lambda n: get(f"/channel/@neon{n}"), True),
+        Case('/api/channel', 'route', lambda n: get(f"/api/channel?id=@neon{n}"), True),
+    ]
+
+
+def percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def summarize(samples):
+    if not samples:
+        return None
+    return {
+        'p50': round(percentile(samples, 0.5), 4),
+        'p95': round(percentile(samples, 0.95), 4),
+        'mean': round(sum(samples) / len(samples), 4),
+        'min': round(min(samples), 4),
+        'max': round(max(samples), 4),
+    }
+
+
+def measure(case: Case, numbers, iterations: int, memory_iterations: int, backend: TimedBackend,
+            render_timer: RenderTimer):
+    """Time `iterations` calls, then measure peak allocations over `memory_iterations` more"""
+    wall, backend_ms, processing, render, peaks = [], [], [], [], []
+    errors = []
+
+    for _ in range(iterations):
+        n = next(numbers)
+        backend.take()
+        render_timer.take()
+        start = time.perf_counter()
+        try:
+            case.call(n)
+        except Exception as e:
+            errors.append(str(e))
+            continue
+        elapsed = (time.perf_counter() - start) * 1000
+        in_backend = backend.take() * 1000
+        wall.append(elapsed)
+        backend_ms.append(in_backend)
+        processing.append(elapsed - in_backend)
+        render.append(render_timer.take() * 1000)
+
+    # Tracing allocations slows everything down, so memory gets its own pass
+    tracemalloc.start()
+    try:
+        for _ in range(memory_iterations):
+            n = next(numbers)
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            try:
+                case.call(n)
+            except Exception as e:
+                errors.append(str(e))
+                continue
+            peaks.append((tracemalloc.get_traced_memory()[1] - baseline) / 1024)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'iterations': len(wall),
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+        'wall_ms': summarize(wall),
+        'backend_ms': summarize(backend_ms),
+        'processing_ms': summarize(processing),
+        'render_ms': summarize(render) if case.group == 'route' else None,
+        'peak_kib': summarize(peaks),
+    }
+
+
+def run_cases(cases, iterations: int, memory_iterations: int, backend: TimedBackend, render_timer: RenderTimer):
+    results = {}
+    for case in cases:
+        results[f"{case.group}:{case.name}:cold"] = measure(case, _sequence, iterations, memory_iterations,
+                                                           backend, render_timer)
+        if case.warm:
+            n = next(_sequence)
+            case.call(n)
+            results[f"{case.group}:{case.name}:warm"] = measure(case, itertools.repeat(n), iterations,
+                                                               memory_iterations, backend, render_timer)
+        print(f"  {case.group} {case.name}", file=sys.stderr)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, metric: str, threshold: float, min_delta_ms: float):
+    """Cases whose median `metric` grew by more than threshold (and min_delta_ms) over the baseline"""
+    regressions = []
+    for key, result in results.items():
+        before = (baseline.get('results', {}).get(key) or {}).get(metric)
+        after = result.get(metric)
+        if not before or not after:
+            continue
+        if after['p50'] > before['p50'] * (1 + threshold) and after['p50'] - before['p50'] > min_delta_ms:
+            regressions.append({'case': key, 'metric': metric, 'baseline_p50': before['p50'],
+                                'current_p50': after['p50'],
+                                'change': round(after['p50'] / before['p50'] - 1, 3) if before['p50'] else None})
+    return regressions
+
+
+def print_table(results):
+    print(f"{'case':<48} {'wall p50':>9} {'p95':>9} {'backend':>9} {'process':>9} {'render':>8} {'peak KiB':>9}",
+          file=sys.stderr)
+    for key, result in results.items():
+        if not result['wall_ms']:
+            print(f"{key:<48} failed: {result['first_error']}", file=sys.stderr)
+            continue
+        render = result['render_ms']['p50'] if result['render_ms'] else 0.0
+        peak = result['peak_kib']['p50'] if result['peak_kib'] else 0.0
+        print(f"{key:<48} {result['wall_ms']['p50']:>9.3f} {result['wall_ms']['p95']:>9.3f} "
+              f"{result['backend_ms']['p50']:>9.3f} {result['processing_ms']['p50']:>9.3f} "
+              f"{render:>8.3f} {peak:>9.1f}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--memory-iterations', type=int, default=5)
+    parser.add_argument('--mode', choices=('inprocess', 'subprocess'), default='inprocess',
+                        help='replay in process, or through a fake yt-dlp executable (includes process start-up)')
+    parser.add_argument('--fixtures', default=FIXTURES_DIR)
+    parser.add_argument('--cases', help='only run cases whose name contains this')
+    parser.add_argument('--output', help='write the JSON results here instead of stdout')
+    parser.add_argument('--compare', help='JSON results of an earlier run to check for regressions')
+    parser.add_argument('--metric', default='processing_ms', help='metric compared against the baseline')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed relative slowdown of the median')
+    parser.add_argument('--min-delta-ms', type=float, default=0.1, help='ignore slowdowns smaller than this')
+    args = parser.parse_args()
+
+    if args.mode == 'subprocess':
+        os.environ['FIXTURES_DIR'] = args.fixtures
+        replay_backend = SubprocessBackend(executable=f"{shlex.quote(sys.executable)} {shlex.quote(REPLAY_SCRIPT)}")
+    else:
+        replay_backend = FixtureBackend(args.fixtures)
+    backend = TimedBackend(replay_backend)
+    extractor.set_backend(backend)
+
+    render_timer = RenderTimer()
+    cases = function_cases() + route_cases(render_timer)
+    if args.cases:
+        cases = [case for case in cases if args.cases in case.name]
+
+    print(f"{len(cases)} cases, {args.iterations} iterations, {args.mode} replay", file=sys.stderr)
+    results = run_cases(cases, args.iterations, args.memory_iterations, backend, render_timer)
+    print_table(results)
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'mode': args.mode,
+            'iterations': args.iterations,
+            'memory_iterations': args.memory_iterations,
+            'fixtures': load_fixtures(args.fixtures)['meta'],
+        },
+        'results': results,
+    }
+
+    status = 0
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.metric, args.threshold, args.min_delta_ms)
+        report['regressions'] = regressions
+        for regression in regressions:
+            print(f"REGRESSION {regression['case']}: {regression['metric']} p50 "
+                  f"{regression['baseline_p50']:.3f} -> {regression['current_p50']:.3f} ms", file=sys.stderr)
+        status = 1 if regressions else 0
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    backend.shutdown()
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
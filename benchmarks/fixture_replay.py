@@ -0,0 +1,122 @@
+"""Replays recorded yt-dlp output for the commands the app runs
+
+Fixtures live in benchmarks/fixtures (see record_fixtures.py): flat-playlist
+dumps of a search, the trending feed and a channel's /videos tab, and the
+--dump-json of one video. Commands are matched to a fixture by their URL and
+output flags, and -I / ytsearchN windows are applied to the recorded entries,
+so pagination behaves as it would against YouTube.
+
+Imported, FixtureBackend can be passed to extractor.set_backend. Run as a
+script it behaves like the yt-dlp CLI, for use with YTDLP_BIN and the
+subprocess backend:
+    YTDLP_BIN="python benchmarks/fixture_replay.py" ...
+"""
+import os
+import re
+import sys
+import json
+from typing import List, Dict, Any, Iterator, Optional
+
+FIXTURES_DIR = os.environ.get('FIXTURES_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures'))
+
+SEARCH_SPEC_PATTERN = re.compile(r'^ytsearch(date)?(\d*):')
+
+
+def load_fixtures(directory: str = FIXTURES_DIR) -> Dict[str, Any]:
+    """Read every fixture into memory, so replays don't measure disk reads"""
+    fixtures = {}
+    for name in ('search', 'trending'):
+        with open(os.path.join(directory, f"{name}.jsonl")) as f:
+            fixtures[name] = [json.loads(line) for line in f if line.strip()]
+    for name in ('channel', 'video'):
+        with open(os.path.join(directory, f"{name}.json")) as f:
+            fixtures[name] = json.load(f)
+    try:
+        with open(os.path.join(directory, 'meta.json')) as f:
+            fixtures['meta'] = json.load(f)
+    except OSError:
+        fixtures['meta'] = {}
+    return fixtures
+
+
+def playlist_window(entries: List[Dict[str, Any]], items: Optional[str]) -> List[Dict[str, Any]]:
+    """Apply a yt-dlp -I start:end range (1-based, inclusive)"""
+    if not items:
+        return entries
+    start, _, end = items.partition(':')
+    start = int(start or 1)
+    end = int(end) if end else len(entries)
+    return entries[start - 1:end]
+
+
+def parse_command(command: List[str]) -> Dict[str, Any]:
+    """The parts of a yt-dlp command line that decide what it prints"""
+    parsed = {'single_json': False, 'items': None, 'url': None}
+    args = iter(command[1:])
+    for arg in args:
+        if arg in ('--dump-single-json', '-J'):
+            parsed['single_json'] = True
+        elif arg in ('-I', '--playlist-items'):
+            parsed['items'] = next(args)
+        elif arg in ('--extractor-args', '-f', '--format'):
+            next(args)
+        elif not arg.startswith('-'):
+            parsed['url'] = arg
+    return parsed
+
+
+def replay(command: List[str], fixtures: Dict[str, Any]) -> str:
+    """What yt-dlp would have printed for a command, built from the fixtures"""
+    parsed = parse_command(command)
+    url = parsed['url'] or ''
+
+    search = SEARCH_SPEC_PATTERN.match(url)
+    if search:
+        # ytsearchdate is only used for the general trending fallback
+        entries = fixtures['trending' if search.group(1) else 'search']
+        entries = entries[:int(search.group(2) or 1)]
+    elif '/feed/trending' in url:
+        entries = fixtures['trending']
+    elif url.endswith('/videos'):
+        channel = fixtures['channel']
+        entries = channel.get('entries') or []
+        if parsed['single_json']:
+            return json.dumps(dict(channel, entries=playlist_window(entries, parsed['items'])))
+    elif 'watch?v=' in url:
+        return json.dumps(fixtures['video'])
+    else:
+        raise ValueError(f"No fixture for command: {' '.join(command)}")
+
+    return '\n'.join(json.dumps(entry) for entry in playlist_window(entries, parsed['items']))
+
+
+class FixtureBackend:
+    """Extraction backend answering every command from the fixtures, without running yt-dlp"""
+    name = 'fixture'
+
+    def __init__(self, fixtures_dir: str = FIXTURES_DIR):
+        self.fixtures = load_fixtures(fixtures_dir)
+
+    def run(self, command: List[str], timeout: int) -> str:
+        return replay(command, self.fixtures)
+
+    def iter_lines(self, command: List[str], timeout: int) -> Iterator[str]:
+        return iter(self.run(command, timeout).splitlines())
+
+    def shutdown(self):
+        pass
+
+
+def main(argv: List[str]) -> int:
+    try:
+        output = replay(['yt-dlp'] + argv, load_fixtures())
+    except (ValueError, OSError) as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 1
+    if output:
+        print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,108 @@
+"""Measure requests/sec of the production server at different worker counts
+
+Starts gunicorn with gunicorn.conf.py once per worker count, drives it with a
+fixed number of concurrent clients for a fixed duration and prints throughput
+and latency. yt-dlp is replaced by the local stub extractor and trending
+prefetching is disabled, so the numbers reflect the server, not the network.
+
+Usage: python benchmarks/load_test.py [--workers 1,2,4] [--threads 8]
+       [--clients 32] [--duration 10] [--path /subscriptions]
+"""
+import os
+import sys
+import time
+import shlex
+import socket
+import argparse
+import statistics
+import subprocess
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STUB_SCRIPT = os.path.join(ROOT, 'benchmarks', 'stub_extractor.py')
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers: int, threads: int, port: int) -> subprocess.Popen:
+    env = dict(os.environ,
+               PORT=str(port),
+               WEB_CONCURRENCY=str(workers),
+               GUNICORN_THREADS=str(threads),
+               GUNICORN_ACCESS_LOG='',
+               GUNICORN_LOG_LEVEL='warning',
+               TRENDING_PREFETCH_COUNTRIES='',
+               YTDLP_BACKEND='subprocess',
+               YTDLP_BIN=f"{shlex.quote(sys.executable)} {shlex.quote(STUB_SCRIPT)}")
+    return subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'], cwd=ROOT, env=env)
+
+
+def wait_until_ready(url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=2).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise Exception(f"Server at {url} did not come up within {timeout} seconds")
+
+
+def client(url: str, stop_at: float):
+    latencies = []
+    errors = 0
+    while time.monotonic() < stop_at:
+        start = time.perf_counter()
+        try:
+            urllib.request.urlopen(url, timeout=30).read()
+            latencies.append((time.perf_counter() - start) * 1000)
+        except OSError:
+            errors += 1
+    return latencies, errors
+
+
+def run_load(url: str, clients: int, duration: float):
+    stop_at = time.monotonic() + duration
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        results = list(pool.map(lambda _: client(url, stop_at), range(clients)))
+    latencies = [latency for result in results for latency in result[0]]
+    errors = sum(result[1] for result in results)
+    return latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', default='1,2,4')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--path', default='/subscriptions')
+    args = parser.parse_args()
+
+    print(f"{'workers':>7} {'threads':>7} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'errors':>7}")
+    for workers in [int(w) for w in args.workers.split(',')]:
+        port = free_port()
+        url = f"http://127.0.0.1:{port}{args.path}"
+        server = start_server(workers, args.threads, port)
+        try:
+            wait_until_ready(url)
+            latencies, errors = run_load(url, args.clients, args.duration)
+        finally:
+            server.terminate()
+            server.wait(timeout=60)
+        if not latencies:
+            print(f"{workers:>7} {args.threads:>7} {'-':>10} {'-':>10} {'-':>10} {errors:>7}")
+            continue
+        ordered = sorted(latencies)
+        p99 = ordered[min(len(ordered) - 1, int(round(0.99 * (len(ordered) - 1))))]
+        print(f"{workers:>7} {args.threads:>7} {len(latencies) / args.duration:>10.1f} "
+              f"{statistics.median(latencies):>10.2f} {p99:>10.2f} {errors:>7}")
+
+
+if __name__ == '__main__':
+    main()
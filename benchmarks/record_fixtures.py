@@ -0,0 +1,229 @@
+"""Record the yt-dlp output replayed by the benchmark suite
+
+By default runs the real yt-dlp CLI once for each command shape the app
+uses (needs network access) and stores the raw output in benchmarks/fixtures.
+With --synthetic it writes generated fixtures with the same structure
+instead, so the suite can run anywhere; meta.json notes which kind is there.
+Usage: python benchmarks/record_fixtures.py [--synthetic] [--query Q] [--channel @handle] [--video ID]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import subprocess
+
+from fixture_replay import FIXTURES_DIR
+
+LISTING_SIZE = 60
+CAPTION_LANGUAGES = ('af', 'ar', 'az', 'be', 'bg', 'bn', 'ca', 'cs', 'cy', 'da', 'de', 'el', 'en', 'eo', 'es',
+                     'et', 'eu', 'fa', 'fi', 'fr', 'ga', 'gl', 'gu', 'hi', 'hr', 'hu', 'hy', 'id', 'is', 'it',
+                     'ja', 'ka', 'kk', 'km', 'ko', 'lt', 'lv', 'mk', 'ml', 'mn', 'ms', 'nl', 'no', 'pl', 'pt',
+                     'ro', 'ru', 'sk', 'sl', 'sq', 'sr', 'sv', 'sw', 'ta', 'th', 'tr', 'uk', 'ur', 'vi', 'zh')
+CAPTION_FORMATS = ('json3', 'srv1', 'srv2', 'srv3', 'ttml', 'vtt')
+
+
+def record(command, timeout=120):
+    print(' '.join(command), file=sys.stderr)
+    return subprocess.run(command, capture_output=True, text=True, check=True, timeout=timeout).stdout
+
+
+def record_real(args):
+    """Capture the output of the commands youtube_api runs, with windows wide enough for a few pages"""
+    base = [args.ytdlp, '--flat-playlist']
+    outputs = {
+        'search.jsonl': record(base + ['--dump-json', f"ytsearch{LISTING_SIZE}:{args.query}"]),
+        'channel.json': record(base + ['--dump-single-json', '-I', f"1:{LISTING_SIZE}",
+                                       f"https://www.youtube.com/{args.channel}/videos"]),
+        'video.json': record([args.ytdlp, '--dump-json', '--no-playlist',
+                              f"https://www.youtube.com/watch?v={args.video}"]),
+    }
+    try:
+        outputs['trending.jsonl'] = record(base + ['--dump-json', '-I', f"1:{LISTING_SIZE}",
+                                                   f"https://www.youtube.com/feed/trending?gl={args.country}"])
+    except subprocess.CalledProcessError:
+        # The trending feed is not always extractable; the app falls back to this search too
+        outputs['trending.jsonl'] = record(base + ['--dump-json', f"ytsearchdate{LISTING_SIZE}:YouTube trending"])
+
+    version = subprocess.run([args.ytdlp, '--version'], capture_output=True, text=True).stdout.strip()
+    meta = {'source': f"yt-dlp {version}", 'query': args.query, 'channel': args.channel, 'video': args.video}
+    return outputs, meta
+
+
+def synthetic_entry(rng, index, playlist, channel=None):
+    video_id = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_')
+                       for _ in range(11))
+    channel_id = channel['channel_id'] if channel else 'UC' + ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz0123456789')
+                                                                      for _ in range(22))
+    uploader = channel['channel'] if channel else f"Neon Channel {rng.randint(1, 500)}"
+    duration = rng.randint(30, 5400)
+    return {
+        '_type': 'url',
+        'ie_key': 'Youtube',
+        'id': video_id,
+        'url': f"https://www.youtube.com/watch?v={video_id}",
+        'title': f"Synthetic video {index} - {' '.join(rng.choice(('neon', 'night', 'drive', 'city', 'live', 'mix')) for _ in range(4))}",
+        'description': None,
+        'duration': float(duration),
+        'channel_id': channel_id,
+        'channel': uploader,
+        'channel_url': f"https://www.youtube.com/channel/{channel_id}",
+        'uploader': uploader,
+        'uploader_id': f"@{uploader.replace(' ', '').lower()}",
+        'uploader_url': f"https://www.youtube.com/@{uploader.replace(' ', '').lower()}",
+        'thumbnails': [{'url': f"https://i.ytimg.com/vi/{video_id}/hq720.jpg?sqp=-oaymwEcCOgCEMoBSFXyq4qpAw4IARUAAIhCGAFwAcABBg==&rs=AOn4CLB",
+                        'height': height, 'width': width} for width, height in ((360, 202), (720, 404))],
+        'timestamp': None,
+        'release_timestamp': None,
+        'availability': None,
+        'view_count': rng.randint(100, 50_000_000),
+        'upload_date': f"2024{rng.randint(1, 12):02d}{rng.randint(1, 28):02d}",
+        'live_status': None,
+        'channel_is_verified': rng.random() < 0.3,
+        'webpage_url': f"https://www.youtube.com/watch?v={video_id}",
+        'original_url': f"https://www.youtube.com/watch?v={video_id}",
+        'webpage_url_basename': 'watch',
+        'webpage_url_domain': 'youtube.com',
+        'extractor': 'youtube',
+        'extractor_key': 'Youtube',
+        'playlist': playlist,
+        'playlist_id': playlist,
+        'playlist_title': playlist,
+        'n_entries': LISTING_SIZE,
+        'playlist_index': index,
+        'playlist_autonumber': index,
+        'duration_string': f"{duration // 60}:{duration % 60:02d}",
+        'epoch': 1700000000,
+    }
+
+
+def synthetic_format(rng, video_id, format_id, ext, vcodec, acodec, height=None):
+    return {
+        'format_id': format_id,
+        'format_note': f"{height}p" if height else 'medium',
+        'ext': ext,
+        'protocol': 'https',
+        'acodec': acodec,
+        'vcodec': vcodec,
+        'url': (f"https://rr{rng.randint(1, 5)}---sn-stub{rng.randint(10, 99)}.googlevideo.com/videoplayback?"
+                f"expire=4102444800&ei=synthetic&ip=203.0.113.7&id=o-{video_id}&itag={format_id}&source=youtube"
+                f"&requiressl=yes&mime={'video' if vcodec != 'none' else 'audio'}%2F{ext}&gir=yes"
+                f"&clen={rng.randint(10**6, 10**9)}&dur=212.360&lmt=1700000000000000&keepalive=yes"
+                f"&sig=AJfQdSswRQIh{''.join(rng.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789') for _ in range(80))}"),
+        'width': height * 16 // 9 if height else None,
+        'height': height,
+        'fps': 30 if height else None,
+        'tbr': round(rng.uniform(50, 5000), 3),
+        'filesize': rng.randint(10**6, 10**9),
+        'http_headers': {'User-Agent': 'Mozilla/5.0', 'Accept': 'text/html,application/xhtml+xml',
+                         'Accept-Language': 'en-us,en;q=0.5', 'Sec-Fetch-Mode': 'navigate'},
+        'resolution': f"{height * 16 // 9}x{height}" if height else 'audio only',
+        'video_ext': ext if vcodec != 'none' else 'none',
+        'audio_ext': ext if acodec != 'none' else 'none',
+    }
+
+
+def synthetic_video(rng, entry):
+    """A --dump-json result with a realistic mix of formats, thumbnails and caption tracks"""
+    video_id = entry['id']
+    formats = [synthetic_format(rng, video_id, str(140 + i), 'm4a', 'none', 'mp4a.40.2') for i in range(3)]
+    formats += [synthetic_format(rng, video_id, str(390 + i), 'mp4', 'avc1.4d401f', 'none', height)
+                for i, height in enumerate((144, 240, 360, 480, 720, 1080, 1440, 2160))]
+    formats += [synthetic_format(rng, video_id, str(600 + i), 'webm', 'vp9', 'none', height)
+                for i, height in enumerate((144, 240, 360, 480, 720, 1080, 1440, 2160))]
+    formats += [synthetic_format(rng, video_id, itag, 'mp4', 'avc1.42001E', 'mp4a.40.2', height)
+                for itag, height in (('18', 360), ('22', 720))]
+    captions = {language: [{'ext': ext, 'url': f"https://www.youtube.com/api/timedtext?v={video_id}&lang={language}"
+                                                f"&fmt={ext}&xorb=2&xobt=3&xovt=3&tlang={language}", 'name': language}
+                           for ext in CAPTION_FORMATS] for language in CAPTION_LANGUAGES}
+    video = dict(entry)
+    for key in ('_type', 'ie_key', 'url', 'playlist', 'playlist_id', 'playlist_title', 'n_entries',
+                'playlist_index', 'playlist_autonumber'):
+        video.pop(key, None)
+    video.update({
+        'title': entry['title'],
+        'formats': formats,
+        'thumbnails': [{'url': f"https://i.ytimg.com/vi/{video_id}/{name}.jpg", 'preference': -i, 'id': str(i)}
+                       for i, name in enumerate(('default', 'mqdefault', 'hqdefault', 'sddefault', 'maxresdefault'))],
+        'thumbnail': f"https://i.ytimg.com/vi/{video_id}/maxresdefault.jpg",
+        'description': '\n'.join(f"Line {i} of the synthetic description with a link https://example.com/{i}"
+                                 for i in range(40)),
+        'like_count': rng.randint(10, 1_000_000),
+        'comment_count': rng.randint(0, 50_000),
+        'categories': ['Music'],
+        'tags': [f"tag{i}" for i in range(30)],
+        'automatic_captions': captions,
+        'subtitles': {},
+        'age_limit': 0,
+        'is_live': False,
+        'was_live': False,
+        'format': '18 - 640x360 (360p)+140 - audio only (medium)',
+        'format_id': '18+140',
+    })
+    return video
+
+
+def record_synthetic(args):
+    rng = random.Random(args.seed)
+    search = [synthetic_entry(rng, i, f"{args.query}") for i in range(1, LISTING_SIZE + 1)]
+    trending = [synthetic_entry(rng, i, 'Trending') for i in range(1, LISTING_SIZE + 1)]
+    channel_id = 'UCsynthsynthsynthsynth00'
+    channel_entries = [synthetic_entry(rng, i, 'Neon Channel - Videos', {'channel_id': channel_id, 'channel': 'Neon Channel'})
+                       for i in range(1, LISTING_SIZE + 1)]
+    channel = {
+        'id': channel_id,
+        'channel': 'Neon Channel',
+        'channel_id': channel_id,
+        'title': 'Neon Channel - Videos',
+        'uploader': 'Neon Channel',
+        'uploader_id': '@neonchannel',
+        'uploader_url': 'https://www.youtube.com/@neonchannel',
+        'channel_url': f"https://www.youtube.com/channel/{channel_id}",
+        'channel_follower_count': 1_250_000,
+        'description': 'A synthetic channel used by the benchmark fixtures.',
+        'tags': ['neon', 'synthetic'],
+        'thumbnails': [{'url': f"https://yt3.googleusercontent.com/synthetic=s{size}", 'height': size, 'width': size}
+                       for size in (88, 176, 900)],
+        '_type': 'playlist',
+        'entries': channel_entries,
+        'webpage_url': 'https://www.youtube.com/@neonchannel/videos',
+        'extractor': 'youtube:tab',
+        'extractor_key': 'YoutubeTab',
+    }
+    outputs = {
+        'search.jsonl': '\n'.join(json.dumps(entry) for entry in search) + '\n',
+        'trending.jsonl': '\n'.join(json.dumps(entry) for entry in trending) + '\n',
+        'channel.json': json.dumps(channel) + '\n',
+        'video.json': json.dumps(synthetic_video(rng, search[0])) + '\n',
+    }
+    return outputs, {'source': 'synthetic', 'seed': args.seed, 'query': args.query}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', default=FIXTURES_DIR)
+    parser.add_argument('--synthetic', action='store_true', help='generate fixtures instead of running yt-dlp')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--ytdlp', default='yt-dlp')
+    parser.add_argument('--query', default='neon')
+    parser.add_argument('--country', default='US')
+    parser.add_argument('--channel', default='@YouTube')
+    parser.add_argument('--video', default='dQw4w9WgXcQ')
+    args = parser.parse_args()
+
+    outputs, meta = record_synthetic(args) if args.synthetic else record_real(args)
+    meta['recorded_at'] = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+
+    os.makedirs(args.output, exist_ok=True)
+    for name, output in outputs.items():
+        with open(os.path.join(args.output, name), 'w') as f:
+            f.write(output)
+    with open(os.path.join(args.output, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+        f.write('\n')
+    print(f"Wrote {', '.join(sorted(outputs))} to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Local stand-in for yt-dlp used by the benchmarks
+
+Run as a script it behaves like the yt-dlp CLI for --dump-json and -g commands;
+imported, it provides a YoutubeDL look-alike for the in-process backend. No
+network access happens in either mode.
+"""
+import os
+import sys
+import json
+import time
+from collections import namedtuple
+
+# Seconds the CLI waits before printing each entry, to model results resolving one after another
+ENTRY_DELAY = float(os.environ.get('STUB_ENTRY_DELAY', 0))
+
+ParsedOptions = namedtuple('ParsedOptions', ['parser', 'options', 'urls', 'ydl_opts'])
+
+
+def fake_entry(index: int) -> dict:
+    """A flat-playlist entry shaped like yt-dlp's search/channel output"""
+    video_id = f"stub{index:07d}"
+    return {
+        '_type': 'url',
+        'ie_key': 'Youtube',
+        'id': video_id,
+        'url': f"https://www.youtube.com/watch?v={video_id}",
+        'title': f"Stub video {index}",
+        'uploader': 'Stub Channel',
+        'channel_id': 'UCstubstubstubstubstub00',
+        'duration': 60 + index,
+        'view_count': 1000 * index,
+        'upload_date': '20240101',
+        'thumbnail': f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg",
+    }
+
+
+def stub_parse_options(argv):
+    """Minimal yt_dlp.parse_options replacement covering the flags the app uses"""
+    ydl_opts = {}
+    urls = []
+    args = iter(argv)
+    for arg in args:
+        if arg in ('--dump-json', '-j'):
+            ydl_opts['forcejson'] = True
+        elif arg in ('--dump-single-json', '-J'):
+            ydl_opts['dump_single_json'] = True
+        elif arg in ('--get-url', '-g'):
+            ydl_opts['forceurl'] = True
+        elif arg == '--flat-playlist':
+            ydl_opts['extract_flat'] = 'in_playlist'
+        elif arg in ('-f', '--format'):
+            ydl_opts['format'] = next(args)
+        elif arg in ('-I', '--playlist-items'):
+            ydl_opts['playlist_items'] = next(args)
+        elif arg == '--extractor-args':
+            ydl_opts['extractor_args'] = next(args)
+        elif arg.startswith('-'):
+            continue
+        else:
+            urls.append(arg)
+    return ParsedOptions(None, None, urls, ydl_opts)
+
+
+class StubYoutubeDL:
+    """Returns canned info dicts instead of talking to YouTube"""
+
+    def __init__(self, params=None):
+        self.params = params or {}
+
+    def extract_info(self, url, download=False):
+        if url.startswith('ytsearch') or '/videos' in url or 'trending' in url:
+            count = 10
+            prefix = url.split(':', 1)[0]
+            digits = ''.join(c for c in prefix if c.isdigit())
+            if digits:
+                count = int(digits)
+            return {'_type': 'playlist', 'id': 'stub', 'entries': [fake_entry(i) for i in range(1, count + 1)]}
+        entry = fake_entry(1)
+        entry.pop('_type')
+        entry['url'] = 'https://rr1---sn-stub.googlevideo.com/videoplayback?expire=4102444800&itag=22'
+        return entry
+
+    def sanitize_info(self, info):
+        return info
+
+    def close(self):
+        pass
+
+
+def main(argv):
+    # Model the real CLI's start-up cost: importing yt-dlp dominates it
+    try:
+        import yt_dlp  # noqa: F401
+    except ImportError:
+        pass
+
+    parsed = stub_parse_options(argv)
+    ydl = StubYoutubeDL(parsed.ydl_opts)
+    for url in parsed.urls:
+        info = ydl.extract_info(url)
+        entries = info.get('entries') or [info]
+        for entry in entries:
+            if ENTRY_DELAY:
+                time.sleep(ENTRY_DELAY)
+            if parsed.ydl_opts.get('forceurl'):
+                print(entry['url'], flush=True)
+            else:
+                print(json.dumps(entry), flush=True)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,302 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import inspect
+import functools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Callable, Tuple
+
+from singleflight import SingleFlight, extraction_flights
+from scheduler import extraction_priority, PRIORITY_BACKGROUND
+
+# Seconds a value is served as fresh, per kind of lookup
+DEFAULT_TTLS = {
+    'video': 600,
+    'search': 300,
+    'trending': 900,
+    'channel': 1800,
+}
+
+# Extra seconds an expired value may still be served while it is refreshed in the background
+DEFAULT_STALE_TTLS = {
+    'video': 3600,
+    'search': 600,
+    'trending': 3600,
+    'channel': 3600,
+}
+
+
+def _ttl_from_env(kind: str, defaults: Dict[str, int], suffix: str = '') -> int:
+    """Read CACHE_TTL_<KIND> / CACHE_STALE_TTL_<KIND> overrides"""
+    name = f"CACHE{suffix}_TTL_{kind.upper()}"
+    return int(os.environ.get(name, defaults.get(kind, 300)))
+
+
+# Seconds between purges of expired rows from a SQLiteStore, done by whichever write comes due
+CACHE_PURGE_INTERVAL = int(os.environ.get('CACHE_PURGE_INTERVAL', 600))
+
+
+class SQLiteStore:
+    """On-disk cache store that can be shared between worker processes
+
+    Rows past their stale_until are deleted every CACHE_PURGE_INTERVAL
+    seconds by the next write, so the file doesn't grow without bound.
+    """
+
+    def __init__(self, path: str, purge_interval: int = CACHE_PURGE_INTERVAL):
+        self.path = path
+        self.purge_interval = purge_interval
+        self._next_purge = time.time() + purge_interval
+        self._local = threading.local()
+        # The schema is created with a throwaway connection, so a gunicorn master
+        # that imports the app before forking holds no connection for workers to inherit
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                conn.execute("""CREATE TABLE IF NOT EXISTS cache (
+                                    key TEXT PRIMARY KEY,
+                                    value TEXT NOT NULL,
+                                    fresh_until REAL NOT NULL,
+                                    stale_until REAL NOT NULL)""")
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared across threads or forked processes,
+        # keep one per thread and open a new one in a forked child
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key: str) -> Optional[Tuple[Any, float, float]]:
+        row = self._connect().execute(
+            "SELECT value, fresh_until, stale_until FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1], row[2]
+
+    def set(self, key: str, value: Any, fresh_until: float, stale_until: float):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)",
+                         (key, json.dumps(value), fresh_until, stale_until))
+        if time.time() >= self._next_purge:
+            self._next_purge = time.time() + self.purge_interval
+            try:
+                self.purge_expired()
+            except sqlite3.Error as e:
+                logging.error(f"Could not purge expired rows from {self.path}: {e}")
+
+    def delete(self, key: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def purge_expired(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM cache WHERE stale_until < ?", (time.time(),))
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM cache")
+
+
+class MetadataCache:
+    """In-memory LRU with per-kind TTLs and stale-while-revalidate
+
+    Fresh entries are returned directly. Expired entries that are still inside
+    their stale window are returned immediately while a background refresh
+    replaces them; anything older is recomputed in the calling thread. An
+    optional store (e.g. SQLiteStore) backs the memory tier so several worker
+    processes share one cache. Misses and refreshes go through a SingleFlight,
+    so concurrent requests for the same key share one computation.
+    """
+
+    def __init__(self, max_entries: int = 2048, store=None,
+                 ttls: Optional[Dict[str, int]] = None,
+                 stale_ttls: Optional[Dict[str, int]] = None,
+                 refresh_workers: int = 2,
+                 flights: Optional[SingleFlight] = None):
+        self.max_entries = max_entries
+        self.store = store
+        self.flights = flights or extraction_flights
+        self.ttls = ttls or {kind: _ttl_from_env(kind, DEFAULT_TTLS) for kind in DEFAULT_TTLS}
+        self.stale_ttls = stale_ttls or {kind: _ttl_from_env(kind, DEFAULT_STALE_TTLS, '_STALE')
+                                         for kind in DEFAULT_STALE_TTLS}
+        self._entries = OrderedDict()  # key -> (value, fresh_until, stale_until)
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._refresher = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix='cache-refresh')
+        self._stats = {}
+        self._evictions = 0
+
+    def _count(self, kind: str, counter: str):
+        kind_stats = self._stats.setdefault(kind, {
+            'hits': 0, 'stale_hits': 0, 'misses': 0,
+            'refreshes': 0, 'refresh_errors': 0,
+        })
+        kind_stats[counter] += 1
+
+    def _lookup(self, key: str) -> Optional[Tuple[Any, float, float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+        if self.store is not None:
+            try:
+                entry = self.store.get(key)
+            except Exception as e:
+                logging.error(f"Cache store read failed for {key}: {e}")
+                return None
+            if entry is not None:
+                self._remember(key, entry)
+                return entry
+        return None
+
+    def _remember(self, key: str, entry: Tuple[Any, float, float]):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def set(self, kind: str, key: str, value: Any):
+        now = time.time()
+        fresh_until = now + self.ttls.get(kind, 300)
+        stale_until = fresh_until + self.stale_ttls.get(kind, 0)
+        self._remember(key, (value, fresh_until, stale_until))
+        if self.store is not None:
+            try:
+                self.store.set(key, value, fresh_until, stale_until)
+            except Exception as e:
+                logging.error(f"Cache store write failed for {key}: {e}")
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.store is not None:
+            self.store.delete(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.store is not None:
+            self.store.clear()
+
+    def get_or_compute(self, kind: str, key: str, compute: Callable[[], Any],
+                       cache_if: Optional[Callable[[Any], bool]] = None) -> Any:
+        """Return the cached value for key, computing (or refreshing) it when needed
+
+        Args:
+            cache_if: Optional predicate; values it rejects are returned but not stored
+        """
+        entry = self._lookup(key)
+        now = time.time()
+        if entry is not None:
+            value, fresh_until, stale_until = entry
+            if now < fresh_until:
+                with self._lock:
+                    self._count(kind, 'hits')
+                return value
+            if now < stale_until:
+                with self._lock:
+                    self._count(kind, 'stale_hits')
+                self._refresh_in_background(kind, key, compute, cache_if)
+                return value
+
+        with self._lock:
+            self._count(kind, 'misses')
+        return self.flights.do(key, lambda: self._compute_and_store(kind, key, compute, cache_if))
+
+    def _compute_and_store(self, kind: str, key: str, compute: Callable[[], Any],
+                           cache_if: Optional[Callable[[Any], bool]] = None) -> Any:
+        value = compute()
+        if cache_if is None or cache_if(value):
+            self.set(kind, key, value)
+        return value
+
+    def _refresh_in_background(self, kind: str, key: str, compute: Callable[[], Any],
+                               cache_if: Optional[Callable[[Any], bool]] = None):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                with extraction_priority(PRIORITY_BACKGROUND):
+                    self.flights.do(key, lambda: self._compute_and_store(kind, key, compute, cache_if))
+                with self._lock:
+                    self._count(kind, 'refreshes')
+            except Exception as e:
+                logging.error(f"Background refresh failed for {key}: {e}")
+                with self._lock:
+                    self._count(kind, 'refresh_errors')
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._refresher.submit(refresh)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters per kind plus current size"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'evictions': self._evictions,
+                'store': type(self.store).__name__ if self.store is not None else None,
+                'kinds': {kind: dict(counters) for kind, counters in self._stats.items()},
+            }
+
+
+def _create_default_cache() -> MetadataCache:
+    store = None
+    db_path = os.environ.get('CACHE_DB')
+    if db_path:
+        try:
+            store = SQLiteStore(db_path)
+        except Exception as e:
+            logging.error(f"Could not open cache database {db_path}, using memory only: {e}")
+    return MetadataCache(max_entries=int(os.environ.get('CACHE_MAX_ENTRIES', 2048)), store=store)
+
+
+metadata_cache = _create_default_cache()
+
+
+def make_key(func: Callable, signature: inspect.Signature, args: tuple, kwargs: dict) -> str:
+    """Build a cache key from the function name and its normalised arguments"""
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    return f"{func.__name__}:{json.dumps(bound.arguments, sort_keys=True, default=str)}"
+
+
+def cached(kind: str, cache: Optional[MetadataCache] = None,
+           cache_if: Optional[Callable[[Any], bool]] = None):
+    """Cache a function's result in the metadata cache under the given kind
+
+    Args:
+        kind: TTL class of the lookup ('video', 'search', 'trending', 'channel')
+        cache: Cache to use, defaults to the shared metadata_cache
+        cache_if: Predicate deciding whether a result is worth storing (e.g. skip empty lists)
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            target = cache or metadata_cache
+            key = make_key(func, signature, args, kwargs)
+            return target.get_or_compute(kind, key, lambda: func(*args, **kwargs), cache_if)
+
+        wrapper.uncached = func
+        return wrapper
+    return decorator
@@ -0,0 +1,182 @@
+import io
+import os
+import time
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Optional
+
+from PIL import Image, ImageDraw, ImageFont, ImageFilter
+
+from singleflight import SingleFlight
+from metrics import card_render_seconds
+from tracing import span
+
+CARD_WIDTH = 1280
+CARD_HEIGHT = 720
+THUMBNAIL_SIZE = (800, 450)
+THUMBNAIL_TOP = 50
+
+FONT_DIR = os.environ.get('CARD_FONT_DIR', '/usr/share/fonts/truetype/dejavu')
+
+# Encoder settings per output format
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 85, 'optimize': True},
+    'WEBP': {'quality': 80, 'method': 4},
+}
+
+# Render processes; 0 renders in the calling thread
+CARD_RENDER_WORKERS = int(os.environ.get('CARD_RENDER_WORKERS', 2))
+
+# Fonts and the blurred glow layer never change, so each process builds them once
+_assets = None
+_assets_lock = threading.Lock()
+
+
+def _load_fonts() -> Dict[str, Any]:
+    try:
+        return {
+            'title': ImageFont.truetype(os.path.join(FONT_DIR, 'DejaVuSans-Bold.ttf'), 42),
+            'normal': ImageFont.truetype(os.path.join(FONT_DIR, 'DejaVuSans.ttf'), 28),
+            'stats': ImageFont.truetype(os.path.join(FONT_DIR, 'DejaVuSans.ttf'), 24),
+        }
+    except OSError:
+        default = ImageFont.load_default()
+        return {'title': default, 'normal': default, 'stats': default}
+
+
+def _build_background() -> Image.Image:
+    """Dark background with the neon glow behind the thumbnail and its border"""
+    glow = Image.new('RGB', (CARD_WIDTH, CARD_HEIGHT), '#0d0d0d')
+    glow_draw = ImageDraw.Draw(glow)
+    glow_draw.rectangle([220, 50, 1060, 500], fill='#9d4edd', outline='#ff8500', width=3)
+    background = glow.filter(ImageFilter.GaussianBlur(20))
+
+    thumb_x = (CARD_WIDTH - THUMBNAIL_SIZE[0]) // 2
+    ImageDraw.Draw(background).rectangle(
+        [thumb_x - 3, THUMBNAIL_TOP - 3, thumb_x + THUMBNAIL_SIZE[0] + 3, THUMBNAIL_TOP + THUMBNAIL_SIZE[1] + 3],
+        outline='#ff8500', width=3)
+    return background
+
+
+def load_assets() -> Dict[str, Any]:
+    global _assets
+    with _assets_lock:
+        if _assets is None:
+            _assets = {'fonts': _load_fonts(), 'background': _build_background()}
+        return _assets
+
+
+def card_fields(video_info: Dict[str, Any]) -> Dict[str, str]:
+    """The parts of a video's details that appear on its card"""
+    return {
+        'title': video_info.get('title', ''),
+        'channel': video_info.get('channel', ''),
+        'view_count': str(video_info.get('view_count', '0')),
+        'published_at': video_info.get('published_at', ''),
+    }
+
+
+def render_card(fields: Dict[str, str], thumbnail_bytes: Optional[bytes], image_format: str = 'PNG') -> bytes:
+    """Draw a share card and return the encoded image"""
+    assets = load_assets()
+    fonts = assets['fonts']
+    img = assets['background'].copy()
+    draw = ImageDraw.Draw(img)
+
+    if thumbnail_bytes:
+        thumbnail = Image.open(io.BytesIO(thumbnail_bytes)).convert('RGB')
+        thumbnail = thumbnail.resize(THUMBNAIL_SIZE)
+        img.paste(thumbnail, ((CARD_WIDTH - THUMBNAIL_SIZE[0]) // 2, THUMBNAIL_TOP))
+
+    center = CARD_WIDTH // 2
+
+    # Draw title with neon effect
+    y_offset = THUMBNAIL_TOP + THUMBNAIL_SIZE[1] + 30
+    draw.text((center, y_offset), fields['title'], font=fonts['title'], fill='#ffffff', anchor="mm", stroke_width=1)
+
+    # Draw channel name
+    y_offset += 50
+    draw.text((center, y_offset), f"by {fields['channel']}", font=fonts['normal'], fill='#9d4edd', anchor="mm")
+
+    # Draw stats with icons
+    y_offset += 50
+    stats_text = f"👁️ {fields['view_count']} views  •  📅 {fields['published_at']}"
+    draw.text((center, y_offset), stats_text, font=fonts['stats'], fill='#ff8500', anchor="mm")
+
+    # Draw "Watch on NeonTube" with glow
+    y_offset += 50
+    draw.text((center, y_offset), "Watch on NeonTube!", font=fonts['title'], fill='#ff8500', anchor="mm",
+              stroke_width=2)
+
+    output = io.BytesIO()
+    img.save(output, image_format, **SAVE_OPTIONS.get(image_format, {}))
+    return output.getvalue()
+
+
+class CardRenderer:
+    """Renders video cards in a process pool, one render per video at a time
+
+    Pillow holds the GIL while drawing and encoding, so rendering in worker
+    processes keeps request threads responsive. Concurrent requests for the
+    same card share a single render.
+    """
+
+    def __init__(self, max_workers: int = CARD_RENDER_WORKERS):
+        self.max_workers = max_workers
+        self.flights = SingleFlight()
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> Optional[ProcessPoolExecutor]:
+        if self.max_workers <= 0:
+            return None
+        with self._lock:
+            # A pool inherited through fork is unusable, each server worker gets its own
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context('spawn'),
+                                                 initializer=load_assets)
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def fetch_thumbnail(self, video_id: str) -> Optional[bytes]:
+        """The card-sized thumbnail from the shared thumbnail cache"""
+        # Imported here: render processes import this module too and must not open the cache
+        from thumbnail_cache import thumbnail_cache
+        try:
+            return thumbnail_cache.read(video_id, 'card')
+        except Exception as e:
+            logging.warning(f"Could not load card thumbnail for {video_id}: {e}")
+            return None
+
+    def _render(self, video_id: str, video_info: Dict[str, Any], image_format: str) -> bytes:
+        start = time.perf_counter()
+        outcome = 'error'
+        try:
+            with span('card_render', video_id=video_id, format=image_format):
+                thumbnail_bytes = self.fetch_thumbnail(video_id)
+                pool = self._get_pool()
+                if pool is None:
+                    card = render_card(card_fields(video_info), thumbnail_bytes, image_format)
+                else:
+                    card = pool.submit(render_card, card_fields(video_info), thumbnail_bytes, image_format).result()
+            outcome = 'ok'
+            return card
+        finally:
+            card_render_seconds.observe(time.perf_counter() - start, image_format, outcome)
+
+    def render_video(self, video_id: str, video_info: Dict[str, Any], image_format: str = 'PNG') -> bytes:
+        return self.flights.do(f"card:{video_id}:{image_format}",
+                               lambda: self._render(video_id, video_info, image_format))
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None and self._pool_pid == os.getpid():
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+card_renderer = CardRenderer()
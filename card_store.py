@@ -0,0 +1,39 @@
+import os
+import json
+import hashlib
+from typing import Dict, Any, Optional
+
+from disk_store import DiskStore
+
+CARD_STORE_DIR = os.environ.get('CARD_STORE_DIR', 'static/temp_cards')
+
+# Total size of stored cards before the least recently served ones are evicted
+CARD_STORE_MAX_BYTES = int(os.environ.get('CARD_STORE_MAX_MB', 256)) * 1024 * 1024
+
+# Seconds browsers and proxies may reuse a card before revalidating
+CARD_MAX_AGE = int(os.environ.get('CARD_MAX_AGE', 3600))
+
+# Bump when the card layout changes so stored cards are re-rendered
+CARD_LAYOUT_VERSION = 1
+
+# format name -> (Pillow format, mimetype, file extension)
+CARD_FORMATS = {
+    'png': ('PNG', 'image/png', 'png'),
+    'webp': ('WEBP', 'image/webp', 'webp'),
+    'jpeg': ('JPEG', 'image/jpeg', 'jpg'),
+}
+
+
+def card_digest(video_id: str, fields: Dict[str, Any], thumbnail: Optional[str], card_format: str) -> str:
+    """Hash of everything that ends up in a card, so a changed title or view count gives a new card"""
+    payload = json.dumps({'v': CARD_LAYOUT_VERSION, 'id': video_id, 'fields': fields,
+                          'thumbnail': thumbnail, 'format': card_format}, sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:20]
+
+
+def card_filename(video_id: str, digest: str, card_format: str) -> str:
+    return f"{video_id}-{digest}.{CARD_FORMATS[card_format][2]}"
+
+
+# Card files never change once written, so the digest in their name doubles as the HTTP ETag
+card_store = DiskStore(CARD_STORE_DIR, CARD_STORE_MAX_BYTES)
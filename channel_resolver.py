@@ -0,0 +1,149 @@
+import os
+import re
+import time
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Tuple
+
+from cache import SQLiteStore
+
+CHANNEL_RESOLVER_DB = os.environ.get('CHANNEL_RESOLVER_DB', 'channel_resolver.db')
+
+# Seconds a learnt mapping is trusted; channel ids never change and handles rarely do
+CHANNEL_RESOLVER_TTL = int(os.environ.get('CHANNEL_RESOLVER_TTL', 30 * 86400))
+
+CHANNEL_ID_PATTERN = re.compile(r'^UC[A-Za-z0-9_-]{22}$')
+
+# Ways a channel can be addressed before we know its id; yt-dlp only resolves the right one
+GUESSED_URL_FORMS = {
+    'handle': 'https://www.youtube.com/@{name}',
+    'channel': 'https://www.youtube.com/channel/{name}',
+    'user': 'https://www.youtube.com/user/{name}',
+}
+
+
+@dataclass(slots=True)
+class ChannelIdentity:
+    """Canonical identity of a channel"""
+    channel_id: str
+    handle: Optional[str] = None
+
+    @property
+    def url(self) -> str:
+        # The /channel/ form always resolves once the id is known
+        return f"https://www.youtube.com/channel/{self.channel_id}"
+
+
+def reference_key(reference: str) -> str:
+    """Normalise a channel reference: ids are case-sensitive, handles and legacy names aren't"""
+    reference = reference.strip().lstrip('@')
+    return reference if CHANNEL_ID_PATTERN.match(reference) else reference.lower()
+
+
+class ChannelResolver:
+    """Maps any handle, legacy name or UC id to the channel's canonical id
+
+    Mappings are learnt from successful extractions and kept in SQLite with a
+    long TTL, so every worker process and restart shares them, with an
+    in-memory LRU in front. Until a reference is known, the URL forms most
+    likely to work for it are guessed.
+    """
+
+    def __init__(self, store: Optional[SQLiteStore] = None, ttl: int = CHANNEL_RESOLVER_TTL,
+                 max_memory_entries: int = 4096):
+        self.store = store
+        self.ttl = ttl
+        self.max_memory_entries = max_memory_entries
+        self._memory = OrderedDict()  # reference key -> (ChannelIdentity, expires_at)
+        self._stats = {'hits': 0, 'store_hits': 0, 'misses': 0, 'learnt': 0}
+        self._lock = threading.Lock()
+
+    def _remember(self, key: str, identity: ChannelIdentity, expires_at: float):
+        with self._lock:
+            self._memory[key] = (identity, expires_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+
+    def lookup(self, reference: str) -> Optional[ChannelIdentity]:
+        key = reference_key(reference)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[1] > now:
+                self._memory.move_to_end(key)
+                self._stats['hits'] += 1
+                return entry[0]
+
+        stored = None
+        if self.store is not None:
+            try:
+                stored = self.store.get(key)
+            except Exception as e:
+                logging.error(f"Channel resolver lookup failed for {reference}: {e}")
+        if stored is not None and stored[1] > now:
+            identity = ChannelIdentity(**stored[0])
+            self._remember(key, identity, stored[1])
+            with self._lock:
+                self._stats['store_hits'] += 1
+            return identity
+
+        with self._lock:
+            self._stats['misses'] += 1
+        return None
+
+    def learn(self, reference: str, identity: ChannelIdentity):
+        """Record the identity under the reference used, the channel id and the handle"""
+        expires_at = time.time() + self.ttl
+        keys = {reference_key(reference), identity.channel_id}
+        if identity.handle:
+            keys.add(reference_key(identity.handle))
+        for key in keys:
+            self._remember(key, identity, expires_at)
+            if self.store is not None:
+                try:
+                    self.store.set(key, {'channel_id': identity.channel_id, 'handle': identity.handle},
+                                   expires_at, expires_at)
+                except Exception as e:
+                    logging.error(f"Could not store channel mapping for {reference}: {e}")
+        with self._lock:
+            self._stats['learnt'] += 1
+
+    def candidate_urls(self, reference: str, suffix: str = '') -> List[Tuple[str, str]]:
+        """(form, url) pairs to try for a channel, most likely to work first
+
+        A known channel has exactly one, its canonical URL.
+        """
+        identity = self.lookup(reference)
+        if identity is not None:
+            return [('resolved', identity.url + suffix)]
+
+        name = reference.strip().lstrip('@')
+        if reference.strip().startswith('@'):
+            # An explicit handle can't be anything else
+            forms = ['handle']
+        elif CHANNEL_ID_PATTERN.match(name):
+            forms = ['channel', 'handle']
+        else:
+            forms = ['handle', 'user']
+        return [(form, GUESSED_URL_FORMS[form].format(name=name) + suffix) for form in forms]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats, memory_entries=len(self._memory),
+                        store=type(self.store).__name__ if self.store is not None else None)
+
+
+def _create_default_resolver() -> ChannelResolver:
+    store = None
+    if CHANNEL_RESOLVER_DB:
+        try:
+            store = SQLiteStore(CHANNEL_RESOLVER_DB)
+        except Exception as e:
+            logging.error(f"Could not open channel resolver database {CHANNEL_RESOLVER_DB}, using memory only: {e}")
+    return ChannelResolver(store=store)
+
+
+channel_resolver = _create_default_resolver()
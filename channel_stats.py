@@ -0,0 +1,88 @@
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+from youtube_api import format_view_count
+
+# Number of most recent dated uploads used to estimate upload cadence
+CADENCE_WINDOW = 10
+
+
+class ChannelStats:
+    """Running aggregate over a channel's videos, in listing (newest first) order
+
+    Prefix sums/minima/maxima are appended as pages arrive, so the stats for
+    any number of loaded videos are an O(1) lookup and adding a page only costs
+    the size of that page.
+    """
+
+    def __init__(self):
+        self._view_sums = [0]
+        self._view_mins = [None]
+        self._view_maxs = [None]
+        self._recent_uploads = []  # upload datetimes of the first CADENCE_WINDOW dated videos
+
+    def __len__(self) -> int:
+        return len(self._view_sums) - 1
+
+    def add(self, videos: List[Dict[str, Any]]):
+        for video in videos:
+            try:
+                views = int(video.get('raw_view_count') or 0)
+            except (TypeError, ValueError):
+                views = 0
+
+            previous_min = self._view_mins[-1]
+            previous_max = self._view_maxs[-1]
+            self._view_sums.append(self._view_sums[-1] + views)
+            self._view_mins.append(views if previous_min is None else min(previous_min, views))
+            self._view_maxs.append(views if previous_max is None else max(previous_max, views))
+
+            if len(self._recent_uploads) < CADENCE_WINDOW:
+                uploaded = parse_published_at(video.get('published_at'))
+                if uploaded:
+                    self._recent_uploads.append(uploaded)
+
+    def summary(self, count: Optional[int] = None) -> Dict[str, Any]:
+        """Raw stats over the first `count` videos (all loaded videos by default)"""
+        n = len(self) if count is None else max(0, min(count, len(self)))
+        total_views = self._view_sums[n]
+        return {
+            'video_count': n,
+            'total_views': total_views,
+            'avg_views': round(total_views / n) if n > 0 else 0,
+            'min_views': self._view_mins[n] or 0,
+            'max_views': self._view_maxs[n] or 0,
+            'upload_interval_days': self.upload_interval_days()
+        }
+
+    def upload_interval_days(self) -> Optional[float]:
+        """Average number of days between the most recent uploads, if dates are known"""
+        if len(self._recent_uploads) < 2:
+            return None
+        newest = max(self._recent_uploads)
+        oldest = min(self._recent_uploads)
+        return round((newest - oldest).days / (len(self._recent_uploads) - 1), 1)
+
+
+def parse_published_at(published_at: Optional[str]) -> Optional[datetime]:
+    """Parse the display date produced by youtube_api ('May 01, 2024') or a raw YYYYMMDD"""
+    if not published_at or not isinstance(published_at, str):
+        return None
+    for date_format in ('%B %d, %Y', '%Y%m%d'):
+        try:
+            return datetime.strptime(published_at, date_format)
+        except ValueError:
+            continue
+    return None
+
+
+def format_channel_stats(summary: Dict[str, Any]) -> Dict[str, Any]:
+    """Format a ChannelStats summary for the channel page and API"""
+    return {
+        'total_views': format_view_count(summary['total_views']),
+        'video_count': summary['video_count'],
+        'avg_views': format_view_count(summary['avg_views']),
+        'min_views': format_view_count(summary['min_views']),
+        'max_views': format_view_count(summary['max_views']),
+        'upload_interval_days': summary['upload_interval_days']
+    }
@@ -0,0 +1,153 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+# Seconds after which a temp file is treated as abandoned even if its writer's pid is alive
+# (the pid may have been reused, or the writer may run on another host sharing the directory)
+TEMP_FILE_MAX_AGE = int(os.environ.get('TEMP_FILE_MAX_AGE', 3600))
+
+
+def is_stale_temp_file(path: str) -> bool:
+    """Whether a `<name>.<pid>.<thread>.tmp` file was left behind by a writer that is gone"""
+    try:
+        age = time.time() - os.stat(path).st_mtime
+    except OSError:
+        return False
+    if age > TEMP_FILE_MAX_AGE:
+        return True
+    try:
+        pid = int(os.path.basename(path).split('.')[-3])
+    except (IndexError, ValueError):
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except OSError:  # Alive, owned by another user
+        pass
+    return False
+
+
+class DiskStore:
+    """Directory of immutable files bounded by total size
+
+    The least recently served files are removed when a new one pushes the
+    directory over `max_bytes`. Several server processes can share a
+    directory; each keeps its own LRU index and picks up files the others
+    wrote. Writes re-read the directory at most every `rescan_interval`
+    seconds, so the cap applies to the shared directory, overshooting at
+    most by what the processes write in between.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, rescan_interval: float = 30.0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.rescan_interval = rescan_interval
+        self._files = OrderedDict()  # filename -> size, least recently used first
+        self._total_bytes = 0
+        self._evictions = 0
+        self._last_scan = 0.0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        """Index files left by earlier runs, oldest access first"""
+        for filename in os.listdir(self.directory):
+            path = os.path.join(self.directory, filename)
+            # Other processes sharing the directory may be writing theirs right now
+            if filename.endswith('.tmp') and is_stale_temp_file(path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        with self._lock:
+            self._rescan()
+            self._evict()
+
+    def _rescan(self):
+        """Rebuild the index from the directory, counting files other processes wrote or removed
+
+        Files this process hasn't served come first, oldest access first,
+        followed by its own LRU order.
+        """
+        entries = []
+        for filename in os.listdir(self.directory):
+            if filename.endswith('.tmp'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, filename))
+            except OSError:
+                continue
+            entries.append((stat.st_atime, filename, stat.st_size))
+        sizes = {filename: size for _, filename, size in entries}
+        files = OrderedDict((filename, size) for _, filename, size in sorted(entries) if filename not in self._files)
+        for filename in self._files:
+            if filename in sizes:
+                files[filename] = sizes[filename]
+        self._files = files
+        self._total_bytes = sum(files.values())
+        self._last_scan = time.monotonic()
+
+    def get(self, filename: str) -> Optional[str]:
+        """Path of a stored file, or None"""
+        path = os.path.join(self.directory, filename)
+        # Other server workers share the directory: they may have written this
+        # file, or evicted it, since this process last looked
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            with self._lock:
+                self._forget(filename)
+            return None
+        with self._lock:
+            if filename in self._files:
+                self._files.move_to_end(filename)
+            else:
+                self._files[filename] = size
+                self._total_bytes += size
+        return path
+
+    def put(self, filename: str, data: bytes) -> str:
+        path = os.path.join(self.directory, filename)
+        # Write atomically so concurrent requests never serve a half-written file
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+        with self._lock:
+            self._forget(filename)
+            self._files[filename] = len(data)
+            self._total_bytes += len(data)
+            if time.monotonic() - self._last_scan >= self.rescan_interval:
+                self._rescan()
+            self._evict()
+        return path
+
+    def _forget(self, filename: str):
+        size = self._files.pop(filename, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and len(self._files) > 1:
+            filename, size = self._files.popitem(last=False)
+            self._total_bytes -= size
+            self._evictions += 1
+            try:
+                os.remove(os.path.join(self.directory, filename))
+            except OSError as e:
+                logging.debug(f"Could not remove evicted file {filename}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'files': len(self._files),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'evictions': self._evictions
+            }
@@ -0,0 +1,409 @@
+import os
+import json
+import shlex
+import logging
+import tempfile
+import subprocess
+import threading
+import contextlib
+import contextvars
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import List, Dict, Any, Optional, Callable, Iterator
+
+from scheduler import extraction_scheduler
+
+try:
+    import yt_dlp
+except ImportError:  # Only the subprocess backend is available without the library
+    yt_dlp = None
+
+# Output options we render ourselves instead of letting YoutubeDL print to stdout
+OUTPUT_OPTIONS = ('forcejson', 'dump_single_json', 'forceurl')
+
+
+class ExtractionCancelled(Exception):
+    """Raised by an extraction whose cancel scope was cancelled while it ran"""
+
+
+class CancelScope:
+    """Lets a caller abandon the extractions started inside it
+
+    Backends register a callback that stops their work (killing the process,
+    or cancelling a queued future); cancel() runs them, including for work
+    registered after the fact.
+    """
+
+    def __init__(self):
+        self.cancelled = False
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def on_cancel(self, callback: Callable[[], Any]):
+        with self._lock:
+            if not self.cancelled:
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove(self, callback: Callable[[], Any]):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logging.debug(f"Error cancelling extraction: {e}")
+
+
+_cancel_scope = contextvars.ContextVar('extraction_cancel_scope', default=None)
+
+
+def current_cancel_scope() -> Optional[CancelScope]:
+    """The scope extractions started here would be cancelled with, if any"""
+    return _cancel_scope.get()
+
+
+@contextlib.contextmanager
+def cancel_scope(scope: CancelScope):
+    """Make extractions started inside this block stop when scope is cancelled"""
+    token = _cancel_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _cancel_scope.reset(token)
+
+
+@contextlib.contextmanager
+def _stop_on_cancel(command: List[str], stop: Callable[[], Any]):
+    """Run `stop` if the current cancel scope is cancelled, and report the cancellation"""
+    scope = _cancel_scope.get()
+    if scope is None:
+        yield
+        return
+    scope.on_cancel(stop)
+    try:
+        yield
+    except Exception:
+        if scope.cancelled:
+            raise ExtractionCancelled(f"Extraction cancelled: {' '.join(command)}")
+        raise
+    finally:
+        scope.remove(stop)
+    if scope.cancelled:
+        raise ExtractionCancelled(f"Extraction cancelled: {' '.join(command)}")
+
+
+class SubprocessBackend:
+    """Run every command as a separate yt-dlp process (the original behaviour)"""
+    name = 'subprocess'
+
+    def __init__(self, executable: Optional[str] = None):
+        # Allows pointing at a different yt-dlp binary (or "python script.py"), e.g. a stub for benchmarks
+        self.executable = shlex.split(executable) if executable else None
+
+    def run(self, command: List[str], timeout: int) -> str:
+        if self.executable:
+            command = self.executable + list(command[1:])
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        with _stop_on_cancel(command, process.kill):
+            try:
+                stdout, stderr = process.communicate(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.communicate()
+                raise
+        if process.returncode:
+            raise subprocess.CalledProcessError(process.returncode, command, output=stdout, stderr=stderr)
+        return stdout.strip()
+
+    def iter_lines(self, command: List[str], timeout: int) -> Iterator[str]:
+        """Yield stdout lines as yt-dlp prints them, raising like run() once it exits
+
+        The process is killed when the timeout passes or the caller stops iterating.
+        """
+        if self.executable:
+            command = self.executable + list(command[1:])
+        timed_out = threading.Event()
+        # stderr goes to a file so a chatty process can't block on a full pipe while we read stdout
+        with tempfile.TemporaryFile(mode='w+') as stderr:
+            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr, text=True, bufsize=1)
+            timer = threading.Timer(timeout, lambda: (timed_out.set(), process.kill()))
+            timer.daemon = True
+            timer.start()
+            try:
+                with _stop_on_cancel(command, process.kill):
+                    for line in process.stdout:
+                        line = line.rstrip('\n')
+                        if line:
+                            yield line
+                    returncode = process.wait()
+            finally:
+                timer.cancel()
+                if process.poll() is None:
+                    process.kill()
+                    process.wait()
+                process.stdout.close()
+
+            if timed_out.is_set():
+                raise subprocess.TimeoutExpired(command, timeout)
+            if returncode:
+                stderr.seek(0)
+                raise subprocess.CalledProcessError(returncode, command, output='', stderr=stderr.read())
+
+    def shutdown(self):
+        pass
+
+
+class YDLEngine:
+    """Executes yt-dlp argv lists against warm, reusable YoutubeDL instances
+
+    Instances are pooled by their option set (the argv without the URLs), so
+    repeated searches or stream lookups reuse the same extractor objects and
+    their player/signature caches instead of rebuilding them on every call.
+    """
+
+    def __init__(self, ydl_class: Optional[type] = None,
+                 parse_options: Optional[Callable] = None,
+                 max_option_sets: int = 32, max_idle_per_set: int = 4):
+        if ydl_class is None or parse_options is None:
+            if yt_dlp is None:
+                raise Exception("yt_dlp is not installed, in-process extraction is unavailable")
+        self.ydl_class = ydl_class or yt_dlp.YoutubeDL
+        self.parse_options = parse_options or yt_dlp.parse_options
+        self.max_option_sets = max_option_sets
+        self.max_idle_per_set = max_idle_per_set
+        self._idle = OrderedDict()  # option key -> list of idle YoutubeDL instances
+        self._lock = threading.Lock()
+
+    def _acquire(self, key: tuple, opts: Dict[str, Any]):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self._idle.move_to_end(key)
+                return idle.pop()
+        return self.ydl_class(opts)
+
+    def _release(self, key: tuple, ydl):
+        evicted = []
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            self._idle.move_to_end(key)
+            if len(idle) < self.max_idle_per_set:
+                idle.append(ydl)
+            else:
+                evicted.append(ydl)
+            while len(self._idle) > self.max_option_sets:
+                _, instances = self._idle.popitem(last=False)
+                evicted.extend(instances)
+        for instance in evicted:
+            close = getattr(instance, 'close', None)
+            if close:
+                try:
+                    close()
+                except Exception:
+                    pass
+
+    def extract(self, command: List[str]) -> str:
+        """Run a yt-dlp argv (including the leading 'yt-dlp') and return what it would print"""
+        parsed = self.parse_options(list(command[1:]))
+        urls = list(parsed.urls)
+        ydl_opts = dict(parsed.ydl_opts)
+
+        output_mode = {option: bool(ydl_opts.get(option)) for option in OUTPUT_OPTIONS}
+        ydl_opts.update({
+            'quiet': True,
+            'no_warnings': True,
+            'noprogress': True,
+            'simulate': True,
+            'forcejson': False,
+            'dump_single_json': False,
+            'forceurl': False,
+        })
+
+        key = tuple(arg for arg in command[1:] if arg not in urls)
+        ydl = self._acquire(key, ydl_opts)
+        try:
+            lines = []
+            for url in urls:
+                info = ydl.extract_info(url, download=False)
+                if info:
+                    lines.extend(self._render(ydl, info, output_mode))
+            return '\n'.join(lines).strip()
+        finally:
+            self._release(key, ydl)
+
+    @staticmethod
+    def _render(ydl, info: Dict[str, Any], output_mode: Dict[str, bool]) -> List[str]:
+        """Reproduce yt-dlp's --dump-single-json / --dump-json / -g output"""
+        if output_mode['dump_single_json']:
+            return [json.dumps(ydl.sanitize_info(info))]
+
+        if info.get('_type') == 'playlist' or 'entries' in info:
+            entries = [entry for entry in (info.get('entries') or []) if entry]
+        else:
+            entries = [info]
+
+        lines = []
+        for entry in entries:
+            if output_mode['forcejson']:
+                lines.append(json.dumps(ydl.sanitize_info(entry)))
+            elif output_mode['forceurl']:
+                formats = entry.get('requested_formats') or [entry]
+                lines.extend(f['url'] for f in formats if f.get('url'))
+        return lines
+
+    def shutdown(self):
+        with self._lock:
+            idle, self._idle = self._idle, OrderedDict()
+        for instances in idle.values():
+            for instance in instances:
+                close = getattr(instance, 'close', None)
+                if close:
+                    close()
+
+
+def _run_engine(engine: YDLEngine, command: List[str]) -> str:
+    """Translate library errors into the same exceptions the subprocess path raises"""
+    try:
+        return engine.extract(command)
+    except Exception as e:
+        raise subprocess.CalledProcessError(1, command, output='', stderr=str(e))
+
+
+class InProcessBackend:
+    """Run extractions on a thread pool sharing one warm YDLEngine
+
+    A YoutubeDL call can't be interrupted: on timeout the caller stops
+    waiting and releases its scheduler slot, but the extraction keeps its
+    pool thread until it finishes. The pool is therefore the hard cap on
+    running extractions and is sized to the scheduler's max_concurrent by
+    default, so timed-out extractions make new ones queue instead of
+    running beyond the cap.
+    """
+    name = 'inprocess'
+
+    def __init__(self, max_workers: int = 8, engine: Optional[YDLEngine] = None):
+        self.engine = engine or YDLEngine()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='yt-dlp')
+
+    def run(self, command: List[str], timeout: int) -> str:
+        future = self._executor.submit(_run_engine, self.engine, command)
+        try:
+            # Only a queued extraction can be cancelled, a running one is left to finish
+            with _stop_on_cancel(command, future.cancel):
+                return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # The extraction can't be interrupted, but the caller stops waiting for it
+            future.cancel()
+            raise subprocess.TimeoutExpired(command, timeout)
+
+    def iter_lines(self, command: List[str], timeout: int) -> Iterator[str]:
+        # YoutubeDL renders an extraction only once it is complete
+        yield from self.run(command, timeout).splitlines()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.engine.shutdown()
+
+
+# Per-process engine used by ProcessPoolBackend workers
+_worker_engine = None
+
+
+def _run_in_worker(command: List[str]) -> str:
+    global _worker_engine
+    if _worker_engine is None:
+        _worker_engine = YDLEngine()
+    return _run_engine(_worker_engine, command)
+
+
+class ProcessPoolBackend:
+    """Run extractions in a small pool of long-lived worker processes
+
+    Each worker imports yt-dlp once and keeps its own warm YDLEngine, which keeps
+    the extraction work off the GIL of the request threads.
+    """
+    name = 'process'
+
+    def __init__(self, max_workers: int = 4):
+        if yt_dlp is None:
+            raise Exception("yt_dlp is not installed, process pool extraction is unavailable")
+        self._executor = ProcessPoolExecutor(max_workers=max_workers)
+
+    def run(self, command: List[str], timeout: int) -> str:
+        future = self._executor.submit(_run_in_worker, list(command))
+        try:
+            with _stop_on_cancel(command, future.cancel):
+                return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise subprocess.TimeoutExpired(command, timeout)
+
+    def iter_lines(self, command: List[str], timeout: int) -> Iterator[str]:
+        yield from self.run(command, timeout).splitlines()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+BACKENDS = {
+    'subprocess': SubprocessBackend,
+    'inprocess': InProcessBackend,
+    'process': ProcessPoolBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def create_backend(name: Optional[str] = None):
+    """Create a backend by name, defaulting to YTDLP_BACKEND or the best available one
+
+    Args:
+        name: 'inprocess', 'process' or 'subprocess'
+    """
+    name = name or os.environ.get('YTDLP_BACKEND') or ('inprocess' if yt_dlp is not None else 'subprocess')
+    if name not in BACKENDS:
+        raise Exception(f"Unknown yt-dlp backend '{name}'")
+
+    if name == 'subprocess':
+        return SubprocessBackend(executable=os.environ.get('YTDLP_BIN'))
+
+    # More workers than scheduler slots would let timed-out extractions run beyond the cap
+    workers = int(os.environ.get('YTDLP_WORKERS', extraction_scheduler.max_concurrent if name == 'inprocess' else 4))
+    try:
+        return BACKENDS[name](max_workers=workers)
+    except Exception as e:
+        logging.error(f"Could not start {name} yt-dlp backend, using subprocess: {e}")
+        return SubprocessBackend(executable=os.environ.get('YTDLP_BIN'))
+
+
+def get_backend():
+    """Return the active extraction backend, creating it on first use"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_backend()
+                logging.info(f"Using {_backend.name} yt-dlp backend")
+    return _backend
+
+
+def set_backend(backend):
+    """Replace the active backend (accepts a backend instance or a backend name)"""
+    global _backend
+    if isinstance(backend, str):
+        backend = create_backend(backend)
+    with _backend_lock:
+        previous, _backend = _backend, backend
+    if previous is not None and previous is not backend:
+        previous.shutdown()
+    return backend
@@ -0,0 +1,74 @@
+"""Production server settings, used by the Procfile: gunicorn -c gunicorn.conf.py
+
+Every setting can be overridden from the environment. SERVER_MODE=async runs
+the ASGI app (asgi.py) under uvicorn workers instead of threaded WSGI workers.
+"""
+import os
+import multiprocessing
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# Worker processes
+workers = int(os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 8)))
+
+if os.environ.get('SERVER_MODE', 'sync') == 'async':
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    wsgi_app = 'asgi:application'
+else:
+    worker_class = 'gthread'
+    wsgi_app = 'main:app'
+
+# The extraction scheduler lives in each worker, so the machine-wide limits are split between
+# them (EXTRACTION_MAX_CONCURRENT / EXTRACTION_MAX_QUEUE, if set, are taken as per-worker values)
+_extraction_total = int(os.environ.get('EXTRACTION_MAX_CONCURRENT_TOTAL', 8))
+_queue_total = int(os.environ.get('EXTRACTION_MAX_QUEUE_TOTAL', 64))
+_worker_concurrent = int(os.environ.get('EXTRACTION_MAX_CONCURRENT', max(1, _extraction_total // workers)))
+_worker_queue = int(os.environ.get('EXTRACTION_MAX_QUEUE', max(1, _queue_total // workers)))
+
+# Threads per worker: by default one per extraction slot and queue entry, so requests can fill
+# the queue and get 503 + Retry-After instead of waiting unseen in the listen backlog
+threads = int(os.environ.get('GUNICORN_THREADS', _worker_concurrent + _worker_queue))
+if worker_class == 'gthread':
+    _worker_queue = max(1, min(_worker_queue, threads - _worker_concurrent))
+os.environ['EXTRACTION_MAX_CONCURRENT'] = str(_worker_concurrent)
+os.environ['EXTRACTION_MAX_QUEUE'] = str(_worker_queue)
+
+# Seconds to hold idle keep-alive connections open
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Extractions can take up to 30 seconds, give workers headroom before they are killed
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+
+# Seconds in-flight requests get to finish on restart (SIGHUP) or shutdown (SIGTERM)
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+# Recycle workers periodically to bound memory growth, staggered so they don't restart together
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+# Import the app once in the master so workers fork with it already loaded
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+# Workers publish their metrics here, so /metrics reports the whole server whichever worker answers
+os.environ.setdefault('METRICS_DIR', 'metrics_data')
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def post_worker_init(worker):
+    # Background threads are per process: start them in each worker, never in the master
+    from app import start_background_tasks
+    start_background_tasks()
+
+
+def on_starting(server):
+    # Metrics published by an earlier run would otherwise be added to this one's
+    from metrics import registry
+    registry.reset()
+
+
+def child_exit(server, worker):
+    # Keep an exited worker's counts in the totals, without its file lingering
+    from metrics import registry
+    registry.process_exited(worker.pid)
@@ -0,0 +1,213 @@
+import os
+import time
+import queue
+import logging
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from extractor import CancelScope, cancel_scope
+from scheduler import reset_rejection_flag, was_rejected, mark_rejected
+from tracing import span
+
+# Threads running hedged attempts; callers wait on them instead of running attempts themselves
+HEDGE_WORKERS = int(os.environ.get('HEDGE_WORKERS', 32))
+
+# Seconds the primary attempt gets before the next one is started alongside it, per kind of lookup,
+# until enough primaries have completed to use their measured latency instead. Most searches and
+# feeds finish well inside their 10s timeout; a channel's /videos tab (15s timeout) takes longer
+HEDGE_DELAYS = {
+    kind: float(os.environ.get(f"HEDGE_DELAY_{kind.upper()}", default))
+    for kind, default in {
+        'search': 6.0,
+        'trending': 6.0,
+        'channel': 10.0,
+    }.items()
+}
+
+# Once HEDGE_MIN_SAMPLES primaries have been timed, the delay is this percentile of the last
+# HEDGE_LATENCY_WINDOW of them (never below HEDGE_MIN_DELAY), so only the slowest primaries are hedged
+HEDGE_PERCENTILE = float(os.environ.get('HEDGE_PERCENTILE', 0.9))
+HEDGE_MIN_SAMPLES = int(os.environ.get('HEDGE_MIN_SAMPLES', 20))
+HEDGE_LATENCY_WINDOW = int(os.environ.get('HEDGE_LATENCY_WINDOW', 200))
+HEDGE_MIN_DELAY = float(os.environ.get('HEDGE_MIN_DELAY', 1.0))
+
+# After this many primary failures in a row the fallback is started with the primary, not after
+# it, for the given number of seconds
+HEDGE_IMMEDIATE_AFTER = int(os.environ.get('HEDGE_IMMEDIATE_AFTER', 3))
+HEDGE_IMMEDIATE_SECONDS = float(os.environ.get('HEDGE_IMMEDIATE_SECONDS', 300))
+
+
+class Hedger:
+    """Runs fallback attempts alongside a slow primary instead of after it
+
+    Attempts are tried in order of preference. The next one starts when the
+    current ones have been running for the kind's hedge delay, or straight
+    away when one fails or returns an unusable result. The first usable
+    result wins and the attempts still running are cancelled, except for
+    extractions other callers are waiting on through extraction_flights. The delay
+    follows the measured latency of recent primary attempts.
+    """
+
+    def __init__(self, max_workers: int = HEDGE_WORKERS, delays: Optional[Dict[str, float]] = None):
+        self.delays = delays if delays is not None else HEDGE_DELAYS
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='hedge')
+        self._primary_failures = {}  # kind -> consecutive primary failures
+        self._immediate_until = {}  # kind -> monotonic time until which fallbacks start right away
+        self._primary_latencies = {}  # kind -> deque of recent primary durations in seconds
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _kind_stats(self, kind: str) -> Dict[str, Any]:
+        if kind not in self._stats:
+            self._stats[kind] = {'calls': 0, 'hedged': 0, 'cancelled': 0, 'failed': 0, 'wins': {}}
+        return self._stats[kind]
+
+    def _delay(self, kind: str) -> float:
+        with self._lock:
+            if time.monotonic() < self._immediate_until.get(kind, 0):
+                return 0.0
+            latencies = sorted(self._primary_latencies.get(kind, ()))
+        if len(latencies) < HEDGE_MIN_SAMPLES:
+            return self.delays.get(kind, 6.0)
+        index = min(int(len(latencies) * HEDGE_PERCENTILE), len(latencies) - 1)
+        return max(latencies[index], HEDGE_MIN_DELAY)
+
+    def _record_latency(self, kind: str, seconds: float):
+        with self._lock:
+            if kind not in self._primary_latencies:
+                self._primary_latencies[kind] = deque(maxlen=HEDGE_LATENCY_WINDOW)
+            self._primary_latencies[kind].append(seconds)
+
+    def run(self, kind: str, attempts: List[Tuple[str, Callable[[], Any]]],
+            accept: Callable[[Any], bool] = bool) -> Tuple[str, Any]:
+        """Run the attempts (label, fn) hedged, returning the winner's label and result
+
+        If no result is accepted, the most preferred attempt that returned at
+        all wins; if every attempt raised, the primary's exception is raised.
+        """
+        with span('hedge', kind=kind) as hedge_span:
+            label, result = self._run(kind, attempts, accept)
+            if hedge_span is not None:
+                hedge_span.set(winner=label)
+            return label, result
+
+    def _run(self, kind: str, attempts: List[Tuple[str, Callable[[], Any]]],
+             accept: Callable[[Any], bool]) -> Tuple[str, Any]:
+        delay = self._delay(kind)
+        finished = queue.Queue()
+        launched = []  # (label, future, scope, context) in launch order
+        outcomes = {}  # launch index -> (result, error)
+
+        def launch():
+            label, fn = attempts[len(launched)]
+            scope = CancelScope()
+            # Each attempt sees the caller's extraction priority but tracks its own rejection
+            context = contextvars.copy_context()
+            context.run(reset_rejection_flag)
+            index = len(launched)
+            future = self._executor.submit(context.run, self._attempt, label, scope, fn)
+            future.add_done_callback(lambda _: finished.put(index))
+            launched.append((label, future, scope, context))
+            if index:
+                with self._lock:
+                    self._kind_stats(kind)['hedged'] += 1
+
+        with self._lock:
+            self._kind_stats(kind)['calls'] += 1
+        started = time.monotonic()
+        launch()
+        next_launch = time.monotonic() + delay
+        winner = None
+        while len(outcomes) < len(launched):
+            timeout = None
+            if len(launched) < len(attempts):
+                timeout = max(next_launch - time.monotonic(), 0)
+            try:
+                index = finished.get(timeout=timeout)
+            except queue.Empty:
+                # The running attempts are taking too long, hedge with the next one
+                launch()
+                next_launch = time.monotonic() + delay
+                continue
+
+            future = launched[index][1]
+            error = future.exception()
+            outcomes[index] = (None if error else future.result(), error)
+            if error is None and accept(outcomes[index][0]):
+                winner = index
+                break
+            if len(launched) < len(attempts):
+                launch()
+                next_launch = time.monotonic() + delay
+
+        if 0 in outcomes:
+            self._record_primary(kind, outcomes[0][1] is None and accept(outcomes[0][0]))
+            if outcomes[0][1] is None:
+                self._record_latency(kind, time.monotonic() - started)
+        elif winner is not None:
+            # The primary lost and is cancelled below: it took at least this long
+            self._record_latency(kind, time.monotonic() - started)
+        for index, (_, future, scope, _) in enumerate(launched):
+            if index not in outcomes and not future.done():
+                future.cancel()
+                scope.cancel()
+                with self._lock:
+                    self._kind_stats(kind)['cancelled'] += 1
+
+        if winner is None:
+            # Nothing usable: prefer an empty answer over an error, and the primary over fallbacks
+            returned = [index for index in sorted(outcomes) if outcomes[index][1] is None]
+            if returned:
+                winner = returned[0]
+            else:
+                with self._lock:
+                    self._kind_stats(kind)['failed'] += 1
+                if any(context.run(was_rejected) for _, _, _, context in launched):
+                    mark_rejected()
+                raise outcomes[0][1]
+
+        label = launched[winner][0]
+        with self._lock:
+            wins = self._kind_stats(kind)['wins']
+            wins[label] = wins.get(label, 0) + 1
+        return label, outcomes[winner][0]
+
+    @staticmethod
+    def _attempt(label: str, scope: CancelScope, fn: Callable[[], Any]) -> Any:
+        with span('attempt', label=label), cancel_scope(scope):
+            return fn()
+
+    def _record_primary(self, kind: str, succeeded: bool):
+        with self._lock:
+            if succeeded:
+                self._primary_failures[kind] = 0
+                self._immediate_until.pop(kind, None)
+                return
+            failures = self._primary_failures.get(kind, 0) + 1
+            self._primary_failures[kind] = failures
+            if failures >= HEDGE_IMMEDIATE_AFTER:
+                self._primary_failures[kind] = 0
+                self._immediate_until[kind] = time.monotonic() + HEDGE_IMMEDIATE_SECONDS
+                logging.warning(f"Primary {kind} lookups keep failing, starting fallbacks immediately "
+                                f"for {HEDGE_IMMEDIATE_SECONDS:.0f} seconds")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            kinds = {
+                kind: dict(stats, wins=dict(stats['wins']),
+                           primary_samples=len(self._primary_latencies.get(kind, ())),
+                           immediate=time.monotonic() < self._immediate_until.get(kind, 0))
+                for kind, stats in self._stats.items()
+            }
+        for kind, stats in kinds.items():
+            stats['delay'] = round(self._delay(kind), 3)
+        return kinds
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+hedger = Hedger()
@@ -1,10 +1,12 @@
 import logging
 import os
-from app import app
+from app import app, start_background_tasks
 
-# Set up logging for easier debugging
-logging.basicConfig(level=logging.DEBUG)
+# gunicorn imports this module too, so default to INFO; LOG_LEVEL=DEBUG for easier debugging
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper())
 
+# Development server only; production runs under gunicorn (see gunicorn.conf.py)
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))  # ← bunu ekledik
-    app.run(host="0.0.0.0", port=port, debug=True)
+    start_background_tasks()
+    app.run(host="0.0.0.0", port=port, debug=os.environ.get("FLASK_DEBUG") == "1")
@@ -0,0 +1,216 @@
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Iterator, Tuple
+
+from upstream import upstream
+from singleflight import SingleFlight
+from disk_store import is_stale_temp_file
+
+MEDIA_CACHE_DIR = os.environ.get('MEDIA_CACHE_DIR', 'media_cache')
+
+# Total size of cached segments before the least recently read ones are evicted
+MEDIA_CACHE_MAX_BYTES = int(os.environ.get('MEDIA_CACHE_MAX_MB', 1024)) * 1024 * 1024
+
+# Upstream resources are fetched and cached in segments of this size
+MEDIA_SEGMENT_SIZE = int(os.environ.get('MEDIA_SEGMENT_KB', 512)) * 1024
+
+CONTENT_RANGE_PATTERN = re.compile(r'bytes (\d+)-(\d+)/(\d+)')
+
+
+class MediaCache:
+    """Disk cache for upstream media, stored as fixed-size byte segments
+
+    Any byte range of a resource is assembled from its segments; missing
+    segments are fetched from the upstream with a Range request, once even
+    when several requests need them at the same time. Seeks and repeat plays
+    only touch the segments they need. Total size is bounded with LRU
+    eviction of segments.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, segment_size: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.segment_size = segment_size
+        self.flights = SingleFlight()
+        self._segments = OrderedDict()  # relative segment path -> size, least recently used first
+        self._total_bytes = 0
+        self._info = {}  # resource key -> {'size', 'content_type'}
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'upstream_bytes': 0}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        """Index segments left by earlier runs, oldest access first"""
+        entries = []
+        for key in os.listdir(self.directory):
+            resource_dir = os.path.join(self.directory, key)
+            if not os.path.isdir(resource_dir):
+                continue
+            for filename in os.listdir(resource_dir):
+                path = os.path.join(resource_dir, filename)
+                if filename.endswith('.tmp'):
+                    # Other processes sharing the directory may be writing theirs right now
+                    if is_stale_temp_file(path):
+                        try:
+                            os.remove(path)
+                        except OSError:
+                            pass
+                    continue
+                if not filename.isdigit():
+                    continue
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_atime, f"{key}/{filename}", stat.st_size))
+        for _, segment, size in sorted(entries):
+            self._segments[segment] = size
+            self._total_bytes += size
+        with self._lock:
+            self._evict()
+
+    @staticmethod
+    def resource_key(url: str) -> str:
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()[:24]
+
+    def _write(self, path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+    def _store_segment(self, key: str, index: int, data: bytes):
+        segment = f"{key}/{index}"
+        self._write(os.path.join(self.directory, segment), data)
+        with self._lock:
+            self._forget(segment)
+            self._segments[segment] = len(data)
+            self._total_bytes += len(data)
+            self._evict()
+
+    def _store_body(self, key: str, body: bytes):
+        """Cache a whole resource returned by an upstream that ignored the Range header"""
+        for index in range(0, max(len(body), 1), self.segment_size):
+            self._store_segment(key, index // self.segment_size, body[index:index + self.segment_size])
+
+    def _forget(self, segment: str):
+        size = self._segments.pop(segment, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and len(self._segments) > 1:
+            segment, size = self._segments.popitem(last=False)
+            self._total_bytes -= size
+            self._stats['evictions'] += 1
+            try:
+                os.remove(os.path.join(self.directory, segment))
+            except OSError as e:
+                logging.debug(f"Could not remove evicted media segment {segment}: {e}")
+
+    def _fetch(self, url: str, key: str, start: int, end: int) -> Tuple[Dict[str, Any], bytes]:
+        """Fetch the segment starting at `start` from the upstream, caching whatever comes back
+
+        Returns the resource info and the segment's bytes.
+        """
+        response = upstream.get(url, headers={'Range': f"bytes={start}-{end}"})
+        if response.status_code not in (200, 206):
+            raise Exception(f"Media upstream returned status code {response.status_code} for {url}")
+        with self._lock:
+            self._stats['upstream_bytes'] += len(response.content)
+
+        content_type = response.headers.get('Content-Type', 'application/octet-stream')
+        if response.status_code == 200:
+            self._store_body(key, response.content)
+            info = {'size': len(response.content), 'content_type': content_type}
+            return info, response.content[start:start + self.segment_size]
+
+        match = CONTENT_RANGE_PATTERN.match(response.headers.get('Content-Range', ''))
+        if not match or int(match.group(1)) != start:
+            raise Exception(f"Media upstream sent an unusable Content-Range for {url}")
+        self._store_segment(key, start // self.segment_size, response.content)
+        return {'size': int(match.group(3)), 'content_type': content_type}, response.content
+
+    def _save_info(self, key: str, info: Dict[str, Any]):
+        self._write(os.path.join(self.directory, key, 'info.json'), json.dumps(info).encode('utf-8'))
+        with self._lock:
+            self._info[key] = info
+
+    def info(self, url: str) -> Dict[str, Any]:
+        """Size and content type of a resource; the first lookup also caches its first segment"""
+        key = self.resource_key(url)
+        with self._lock:
+            info = self._info.get(key)
+        if info is not None:
+            return info
+        info_path = os.path.join(self.directory, key, 'info.json')
+        try:
+            with open(info_path) as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            info = None
+        if info is None:
+            info = self.flights.do(f"{key}/0", lambda: self._fetch(url, key, 0, self.segment_size - 1))[0]
+            self._save_info(key, info)
+        with self._lock:
+            self._info[key] = info
+        return info
+
+    def _segment(self, url: str, key: str, index: int, size: int) -> bytes:
+        segment = f"{key}/{index}"
+        path = os.path.join(self.directory, segment)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            with self._lock:
+                self._stats['hits'] += 1
+                if segment in self._segments:
+                    self._segments.move_to_end(segment)
+                else:
+                    # Written by another server worker
+                    self._segments[segment] = len(data)
+                    self._total_bytes += len(data)
+            return data
+        except FileNotFoundError:
+            pass
+
+        with self._lock:
+            self._stats['misses'] += 1
+            self._forget(segment)
+        start = index * self.segment_size
+        end = min(start + self.segment_size, size) - 1
+        return self.flights.do(segment, lambda: self._fetch(url, key, start, end))[1]
+
+    def iter_range(self, url: str, start: int, stop: int) -> Iterator[bytes]:
+        """Yield bytes [start, stop) of a resource, segment by segment"""
+        key = self.resource_key(url)
+        size = self.info(url)['size']
+        position = start
+        while position < stop:
+            index = position // self.segment_size
+            data = self._segment(url, key, index, size)
+            offset = position - index * self.segment_size
+            chunk = data[offset:offset + (stop - position)]
+            if not chunk:
+                raise Exception(f"Cached media segment {key}/{index} is shorter than expected")
+            yield chunk
+            position += len(chunk)
+
+    def read(self, url: str) -> bytes:
+        """The whole resource, for small files such as cover images"""
+        return b''.join(self.iter_range(url, 0, self.info(url)['size']))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats, segments=len(self._segments), bytes=self._total_bytes,
+                        max_bytes=self.max_bytes, segment_size=self.segment_size)
+
+
+media_cache = MediaCache(MEDIA_CACHE_DIR, MEDIA_CACHE_MAX_BYTES, MEDIA_SEGMENT_SIZE)
@@ -0,0 +1,300 @@
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Sequence
+
+from scheduler import extraction_scheduler
+
+# Upper bounds (seconds) of the latency histogram buckets; yt-dlp calls run into the tens of seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Directory where every server process publishes its metrics, so a scrape of any worker reports
+# the whole server (gunicorn.conf.py sets it); empty keeps /metrics to the process that answers
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+
+# Seconds between two publications of a process's metrics; other workers' series lag by up to this
+METRICS_PUBLISH_INTERVAL = float(os.environ.get('METRICS_PUBLISH_INTERVAL', 5))
+
+# Counters and histograms of workers that exited, folded in so totals don't go backwards
+EXITED_FILENAME = 'exited.json'
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Histogram:
+    """Latency histogram per label set, rendered in the Prometheus text format
+
+    An observation is a bisect and three additions under a lock, so it can sit
+    on every hot path.
+    """
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [per-bucket counts (last is +Inf), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def state(self) -> Dict[tuple, Any]:
+        with self._lock:
+            return {labels: [list(counts), total, count] for labels, (counts, total, count) in self._series.items()}
+
+    @staticmethod
+    def merge(a: Any, b: Any) -> Any:
+        return [[x + y for x, y in zip(a[0], b[0])], a[1] + b[1], a[2] + b[2]]
+
+    def samples(self, state: Dict[tuple, Any]) -> List[str]:
+        lines = []
+        for label_values, (counts, total, count) in sorted(state.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else _format_value(bound)
+                labels = _format_labels(self.labels, label_values, 'le="%s"' % le)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, label_values)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, label_values)} {count}")
+        return lines
+
+
+class Counter:
+    """Monotonic count per label set"""
+    type = 'counter'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def state(self) -> Dict[tuple, Any]:
+        with self._lock:
+            return dict(self._values)
+
+    @staticmethod
+    def merge(a: Any, b: Any) -> Any:
+        return a + b
+
+    def samples(self, state: Dict[tuple, Any]) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}"
+                for labels, value in sorted(state.items())]
+
+
+class Gauge:
+    """Value read from a callback when metrics are scraped, summed over the live processes"""
+    type = 'gauge'
+
+    def __init__(self, name: str, documentation: str, read: Callable[[], float]):
+        self.name = name
+        self.documentation = documentation
+        self.read = read
+
+    def state(self) -> Dict[tuple, Any]:
+        return {(): self.read()}
+
+    @staticmethod
+    def merge(a: Any, b: Any) -> Any:
+        return a + b
+
+    def samples(self, state: Dict[tuple, Any]) -> List[str]:
+        return [f"{self.name} {_format_value(value)}" for value in state.values()]
+
+
+class MetricsRegistry:
+    """The metrics of this process, rendered together for /metrics
+
+    With a `directory`, each process writes its own state there every
+    `publish_interval` seconds (see start_publishing) and render() adds up
+    the states of all of them, so it doesn't matter which worker behind the
+    shared port answers a scrape.
+    """
+
+    def __init__(self, directory: str = '', publish_interval: float = METRICS_PUBLISH_INTERVAL):
+        self.directory = directory
+        self.publish_interval = publish_interval
+        self._metrics = []
+        self._publisher_pid = None
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, read: Callable[[], float]) -> Gauge:
+        return self.register(Gauge(name, documentation, read))
+
+    def _state(self) -> Dict[str, Dict[tuple, Any]]:
+        return {metric.name: metric.state() for metric in self._metrics}
+
+    @staticmethod
+    def _encode(state: Dict[str, Dict[tuple, Any]]) -> Dict[str, list]:
+        return {name: [[list(labels), value] for labels, value in series.items()] for name, series in state.items()}
+
+    def _read(self, filename: str) -> Dict[str, Dict[tuple, Any]]:
+        try:
+            with open(os.path.join(self.directory, filename)) as f:
+                encoded = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return {name: {tuple(labels): value for labels, value in series} for name, series in encoded.items()}
+
+    def _write(self, filename: str, state: Dict[str, Dict[tuple, Any]]):
+        path = os.path.join(self.directory, filename)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(self._encode(state), f)
+        os.replace(temp_path, path)
+
+    def _merge_into(self, total: Dict[str, Dict[tuple, Any]], state: Dict[str, Dict[tuple, Any]],
+                    types: Sequence[str] = ('counter', 'histogram', 'gauge')):
+        for metric in self._metrics:
+            if metric.type not in types:
+                continue
+            series = total.setdefault(metric.name, {})
+            for labels, value in state.get(metric.name, {}).items():
+                series[labels] = metric.merge(series[labels], value) if labels in series else value
+
+    def publish(self):
+        """Write this process's current state for the other workers' scrapes"""
+        try:
+            self._write(f"{os.getpid()}.json", self._state())
+        except OSError as e:
+            logging.error(f"Could not publish metrics to {self.directory}: {e}")
+
+    def start_publishing(self):
+        """Publish this process's metrics on an interval; once per process, a no-op without a directory"""
+        if not self.directory:
+            return
+        with self._lock:
+            if self._publisher_pid == os.getpid():
+                return
+            self._publisher_pid = os.getpid()
+
+        def run():
+            while True:
+                self.publish()
+                time.sleep(self.publish_interval)
+
+        threading.Thread(target=run, name='metrics-publisher', daemon=True).start()
+
+    def process_exited(self, pid: int):
+        """Fold an exited worker's counters and histograms into the totals and drop its file
+
+        Called from the gunicorn master, one worker at a time.
+        """
+        if not self.directory:
+            return
+        state = self._read(f"{pid}.json")
+        if state:
+            exited = self._read(EXITED_FILENAME)
+            self._merge_into(exited, state, types=('counter', 'histogram'))
+            self._write(EXITED_FILENAME, exited)
+        try:
+            os.remove(os.path.join(self.directory, f"{pid}.json"))
+        except OSError:
+            pass
+
+    def reset(self):
+        """Forget what an earlier server run published; called by the gunicorn master on start"""
+        if not self.directory:
+            return
+        for filename in os.listdir(self.directory):
+            try:
+                os.remove(os.path.join(self.directory, filename))
+            except OSError:
+                pass
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text exposition format (version 0.0.4)"""
+        total = self._state()
+        if self.directory:
+            own = f"{os.getpid()}.json"
+            for filename in os.listdir(self.directory):
+                if filename.endswith('.json') and filename != own:
+                    self._merge_into(total, self._read(filename))
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples(total.get(metric.name, {})))
+        return '\n'.join(lines) + '\n'
+
+
+def status_class(status_code: int) -> str:
+    return f"{status_code // 100}xx"
+
+
+registry = MetricsRegistry(METRICS_DIR)
+
+http_request_seconds = registry.histogram(
+    'neontube_http_request_duration_seconds',
+    'Time to produce each response (up to the first byte for streamed ones), by route template',
+    ('route', 'method', 'status'))
+
+ytdlp_command_seconds = registry.histogram(
+    'neontube_ytdlp_command_duration_seconds',
+    'yt-dlp invocations including time queued for an extraction slot, by kind of lookup and outcome',
+    ('kind', 'outcome'))
+
+upstream_request_seconds = registry.histogram(
+    'neontube_upstream_request_duration_seconds',
+    'Outbound HTTP attempts, by host, method and status class (error for connection failures)',
+    ('host', 'method', 'status'))
+
+upstream_short_circuited = registry.counter(
+    'neontube_upstream_short_circuited_total',
+    'Outbound HTTP requests refused without contacting the host because its circuit was open',
+    ('host',))
+
+card_render_seconds = registry.histogram(
+    'neontube_card_render_duration_seconds',
+    'Video card renders including the thumbnail fetch, by image format and outcome',
+    ('format', 'outcome'))
+
+registry.gauge('neontube_extractions_active', 'yt-dlp extractions currently running',
+               lambda: extraction_scheduler.stats()['active'])
+registry.gauge('neontube_extraction_queue_depth', 'yt-dlp extractions waiting for a slot',
+               lambda: extraction_scheduler.stats()['queue_depth'])
@@ -0,0 +1,149 @@
+import os
+import json
+import gzip
+import time
+import random
+import hashlib
+import logging
+import threading
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
+
+from upstream import upstream
+
+MUSIC_API_BASE = 'https://anonmusic.glitch.me'
+CATALOG_URL = f"{MUSIC_API_BASE}/api/s/all"
+
+# Seconds before the catalog is revalidated against the upstream
+MUSIC_CATALOG_TTL = int(os.environ.get('MUSIC_CATALOG_TTL', 300))
+
+# Fields that may carry an upload date, checked in order, for sort=newest
+NEWEST_FIELDS = ('createdAt', 'created_at', 'uploadedAt', 'date')
+
+SORTS = ('default', 'plays', 'newest', 'random')
+
+
+class CatalogSnapshot:
+    """One immutable version of the catalog with its indexes and encoded bodies"""
+
+    def __init__(self, songs: List[Dict[str, Any]]):
+        self.songs = songs
+        self.by_id = {song.get('id'): song for song in songs}
+        self.body = json.dumps(songs).encode('utf-8')
+        self.gzip_body = gzip.compress(self.body)
+        self.etag = hashlib.sha1(self.body).hexdigest()[:20]
+        self.orders = {
+            'default': songs,
+            'plays': sorted(songs, key=lambda song: song.get('plays') or 0, reverse=True),
+            'newest': self._newest_first(songs),
+        }
+
+    @staticmethod
+    def _newest_first(songs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        for field in NEWEST_FIELDS:
+            if any(song.get(field) for song in songs):
+                return sorted(songs, key=lambda song: str(song.get(field) or ''), reverse=True)
+        # No date field: the upstream appends new songs to the end of the list
+        return list(reversed(songs))
+
+    def page(self, sort: str = 'default', offset: int = 0, limit: Optional[int] = None,
+             seed: Optional[int] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """A slice of the catalog in the requested order, plus the catalog size"""
+        if sort == 'random':
+            songs = _shuffled(self, seed if seed is not None else random.getrandbits(32))
+        else:
+            songs = self.orders.get(sort, self.songs)
+        offset = max(offset, 0)
+        end = len(songs) if limit is None else offset + max(limit, 0)
+        return songs[offset:end], len(songs)
+
+
+@lru_cache(maxsize=64)
+def _shuffled(snapshot: CatalogSnapshot, seed: int) -> List[Dict[str, Any]]:
+    # The same seed gives the same order, so a shuffled list can be paged through
+    songs = list(snapshot.songs)
+    random.Random(seed).shuffle(songs)
+    return songs
+
+
+class MusicCatalog:
+    """In-memory copy of the AnonMusic catalog, revalidated on a TTL
+
+    Refreshes use conditional requests (ETag/Last-Modified) when the upstream
+    supports them. Once loaded, a stale catalog keeps being served while one
+    background refresh runs; only the very first load blocks.
+    """
+
+    def __init__(self, url: str, ttl: int):
+        self.url = url
+        self.ttl = ttl
+        self._snapshot = None
+        self._fetched_at = 0.0
+        self._validators = {}  # conditional request headers from the last 200
+        self._refresh_lock = threading.Lock()
+        self._stats = {'refreshes': 0, 'not_modified': 0, 'refresh_errors': 0}
+
+    def _refresh(self):
+        headers = {}
+        if self._snapshot is not None:
+            headers = dict(self._validators)
+        self._stats['refreshes'] += 1
+        response = upstream.get(self.url, headers=headers)
+
+        if response.status_code == 304 and self._snapshot is not None:
+            self._stats['not_modified'] += 1
+            self._fetched_at = time.time()
+            return
+        if response.status_code != 200:
+            raise Exception(f"Music API returned status code {response.status_code}")
+
+        songs = response.json()
+        if not isinstance(songs, list):
+            raise Exception("Music API returned an unexpected payload")
+        self._snapshot = CatalogSnapshot(songs)
+        self._fetched_at = time.time()
+        self._validators = {}
+        if response.headers.get('ETag'):
+            self._validators['If-None-Match'] = response.headers['ETag']
+        if response.headers.get('Last-Modified'):
+            self._validators['If-Modified-Since'] = response.headers['Last-Modified']
+
+    def _refresh_in_background(self):
+        # Runs holding _refresh_lock, acquired by snapshot()
+        try:
+            self._refresh()
+        except Exception as e:
+            self._stats['refresh_errors'] += 1
+            logging.error(f"Music catalog refresh failed, serving the previous copy: {e}")
+        finally:
+            self._refresh_lock.release()
+
+    def snapshot(self) -> CatalogSnapshot:
+        """Current catalog, loading it on first use; raises if it has never loaded"""
+        if self._snapshot is None:
+            with self._refresh_lock:
+                if self._snapshot is None:
+                    try:
+                        self._refresh()
+                    except Exception:
+                        self._stats['refresh_errors'] += 1
+                        raise
+        elif time.time() - self._fetched_at > self.ttl and self._refresh_lock.acquire(blocking=False):
+            threading.Thread(target=self._refresh_in_background, name='music-catalog-refresh', daemon=True).start()
+        return self._snapshot
+
+    def get(self, music_id: str) -> Optional[Dict[str, Any]]:
+        return self.snapshot().by_id.get(music_id)
+
+    def page(self, sort: str = 'default', offset: int = 0, limit: Optional[int] = None,
+             seed: Optional[int] = None) -> Tuple[List[Dict[str, Any]], int]:
+        return self.snapshot().page(sort, offset, limit, seed)
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return dict(self._stats,
+                    songs=len(snapshot.songs) if snapshot else 0,
+                    age_seconds=round(time.time() - self._fetched_at, 1) if snapshot else None)
+
+
+music_catalog = MusicCatalog(CATALOG_URL, MUSIC_CATALOG_TTL)
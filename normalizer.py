@@ -0,0 +1,154 @@
+import json
+import logging
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Dict, Any, Iterable, Iterator, Optional
+
+MONTH_NAMES = ('January', 'February', 'March', 'April', 'May', 'June', 'July',
+               'August', 'September', 'October', 'November', 'December')
+
+
+@dataclass(slots=True)
+class VideoRecord:
+    """The fields of a yt-dlp --flat-playlist entry that listings use"""
+    id: str
+    title: str
+    channel: str
+    channel_id: str
+    thumbnail: str
+    duration: Optional[int]
+    view_count: Optional[int]
+    upload_date: str
+
+    @classmethod
+    def from_entry(cls, entry: Dict[str, Any]) -> 'VideoRecord':
+        video_id = entry.get('id') or ''
+        return cls(
+            id=video_id,
+            title=entry.get('title') or 'Untitled Video',
+            channel=entry.get('uploader') or 'Unknown Channel',
+            channel_id=entry.get('channel_id') or '',
+            thumbnail=entry.get('thumbnail') or f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg",
+            duration=_to_int(entry.get('duration')),
+            view_count=_to_int(entry.get('view_count')),
+            upload_date=str(entry.get('upload_date') or ''),
+        )
+
+
+def _to_int(value: Any) -> Optional[int]:
+    if not value:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def format_duration(seconds: int) -> str:
+    """Format duration in seconds to MM:SS or HH:MM:SS format"""
+    if not seconds:
+        return "00:00"
+
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+
+    if hours:
+        return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+    else:
+        return f"{minutes:02d}:{seconds:02d}"
+
+
+def format_view_count(count: int) -> str:
+    """Format large numbers to human-readable form (e.g., 1.5M, 4.3K)"""
+    if not count:
+        return "0"
+
+    try:
+        if count >= 1000000:
+            return f"{count/1000000:.1f}M"
+        elif count >= 1000:
+            return f"{count/1000:.1f}K"
+        else:
+            return str(count)
+    except Exception as e:
+        logging.error(f"Error formatting view count {count}: {e}")
+        return str(count)
+
+
+@lru_cache(maxsize=8192)
+def format_upload_date(upload_date: str) -> str:
+    """YYYYMMDD to 'May 01, 2024'; anything else is returned unchanged
+
+    Listings repeat the same few dates, so results are memoized, and the
+    string is assembled directly instead of going through strptime/strftime.
+    """
+    if len(upload_date) != 8 or not upload_date.isdigit():
+        return upload_date
+    month = int(upload_date[4:6])
+    day = int(upload_date[6:8])
+    if not 1 <= month <= 12 or not 1 <= day <= 31:
+        return upload_date
+    return f"{MONTH_NAMES[month - 1]} {upload_date[6:8]}, {upload_date[:4]}"
+
+
+def iter_records(lines: Iterable[str]) -> Iterator[VideoRecord]:
+    """Parse yt-dlp --dump-json lines one at a time, skipping lines that aren't valid entries"""
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            entry = json.loads(line)
+        except ValueError as e:
+            logging.error(f"Error processing video info: {e}")
+            continue
+        if isinstance(entry, dict):
+            yield VideoRecord.from_entry(entry)
+
+
+def parse_records(output: str) -> List[VideoRecord]:
+    """Parse a complete yt-dlp --dump-json output
+
+    All lines are decoded with a single json.loads call over a JSON array;
+    if any line is malformed the output is parsed line by line instead.
+    """
+    lines = [line for line in output.splitlines() if line.strip()]
+    if not lines:
+        return []
+    try:
+        entries = json.loads(f"[{','.join(lines)}]")
+    except ValueError:
+        return list(iter_records(lines))
+    return [VideoRecord.from_entry(entry) for entry in entries if isinstance(entry, dict)]
+
+
+def format_records(records: Iterable[VideoRecord], **extra: Any) -> List[Dict[str, Any]]:
+    """Listing items as returned by the API, with `extra` fields (e.g. country) added to each"""
+    items = []
+    append = items.append
+    for record in records:
+        view_count = record.view_count
+        item = {
+            'id': record.id,
+            'title': record.title,
+            'channel': record.channel,
+            'channel_id': record.channel_id,
+            'thumbnail': record.thumbnail,
+            'duration': format_duration(record.duration) if record.duration else None,
+            'view_count': format_view_count(view_count) if view_count else None,
+            'raw_view_count': str(view_count) if view_count else "0",
+            'published_at': format_upload_date(record.upload_date),
+        }
+        if extra:
+            item.update(extra)
+        append(item)
+    return items
+
+
+def normalize_entries(entries: Iterable[Any], **extra: Any) -> List[Dict[str, Any]]:
+    """The 'entries' of a yt-dlp --flat-playlist --dump-single-json result to listing items"""
+    return format_records((VideoRecord.from_entry(entry) for entry in entries if isinstance(entry, dict)), **extra)
+
+
+def normalize_listing(output: str, **extra: Any) -> List[Dict[str, Any]]:
+    """yt-dlp --flat-playlist --dump-json output to listing items"""
+    return format_records(parse_records(output), **extra)
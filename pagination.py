@@ -0,0 +1,256 @@
+import os
+import json
+import time
+import queue
+import base64
+import hashlib
+import logging
+import threading
+import contextvars
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Callable, Tuple, Iterator
+
+from youtube_api import search_videos, search_window, stream_search_videos, get_channel_videos
+from channel_stats import ChannelStats
+
+# How many extra items to pull from yt-dlp whenever a listing has to grow
+PREFETCH_ITEMS = int(os.environ.get('PAGINATION_PREFETCH', 20))
+
+# Seconds a stored listing is reused before it is extracted again from scratch
+LISTING_TTLS = {
+    'search': int(os.environ.get('PAGINATION_TTL_SEARCH', 600)),
+    'channel': int(os.environ.get('PAGINATION_TTL_CHANNEL', 1800)),
+}
+
+
+def _fetch_search(params: Dict[str, Any], skip: int, count: int) -> List[Dict[str, Any]]:
+    source = params.get('source')
+    if source is None:
+        return search_videos(params['q'], count, country_code=params.get('country', 'TR'), skip=skip)
+    # Later windows come from whichever search produced the first one
+    return search_window(params['q'], count, None if source == 'GLOBAL' else source, skip)
+
+
+def _fetch_channel(params: Dict[str, Any], skip: int, count: int) -> List[Dict[str, Any]]:
+    return get_channel_videos(params['id'], count, skip)
+
+
+# kind -> function(params, skip, count) returning the next window of items
+FETCHERS = {
+    'search': _fetch_search,
+    'channel': _fetch_channel,
+}
+
+def _stream_search(params: Dict[str, Any], skip: int, count: int) -> Iterator[Dict[str, Any]]:
+    source = params.get('source')
+    if source is None:
+        return stream_search_videos(params['q'], count, country_code=params.get('country', 'TR'), skip=skip)
+    return stream_search_videos(params['q'], count, None if source == 'GLOBAL' else source, skip, fallback=False)
+
+
+# kind -> function(params, skip, count) yielding the next window of items one at a time
+STREAM_FETCHERS = {
+    'search': _stream_search,
+}
+
+# kind -> factory for the running aggregate kept next to the listing's items
+AGGREGATORS = {
+    'channel': ChannelStats,
+}
+
+# Listings whose source can shift under us (a new upload pushes every video down one slot)
+TRACK_CHANGES = {'channel'}
+
+# kind -> item field naming the source the item was extracted from. Once a listing has items,
+# fetchers get that source as params['source'] and must continue from it, so a listing never
+# mixes e.g. country-specific and global search results
+SOURCE_FIELDS = {
+    'search': 'country',
+}
+
+# Parameter each kind of listing can't be fetched without
+REQUIRED_PARAMS = {
+    'search': 'q',
+    'channel': 'id',
+}
+
+
+class Listing:
+    """An extracted result list that only ever grows by fetching the items it doesn't have yet"""
+
+    def __init__(self, kind: str, params: Dict[str, Any]):
+        self.kind = kind
+        self.params = params
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Drop everything fetched so far (and the aggregate built from it)"""
+        self.items = []
+        self.exhausted = False
+        self.created_at = time.time()
+        self._seen_ids = set()
+        aggregator = AGGREGATORS.get(self.kind)
+        self.stats = aggregator() if aggregator else None
+
+    def _append(self, batch: List[Dict[str, Any]]):
+        self.items.extend(batch)
+        self._seen_ids.update(item.get('id') for item in batch)
+        if self.stats is not None:
+            self.stats.add(batch)
+
+    def fetch_params(self) -> Dict[str, Any]:
+        """Parameters for fetching the next window: the listing's own, plus the source of its items"""
+        field = SOURCE_FIELDS.get(self.kind)
+        if field and self.items:
+            return dict(self.params, source=self.items[0].get(field))
+        return self.params
+
+    def has(self, needed: int) -> bool:
+        """Whether the first `needed` items can be served without extracting anything"""
+        return self.exhausted or len(self.items) >= needed
+
+    def ensure(self, needed: int, fetch: Callable[[Dict[str, Any], int, int], List[Dict[str, Any]]]):
+        """Make sure at least `needed` items are loaded (unless the source runs out)"""
+        with self.lock:
+            if self.has(needed):
+                return
+            # Fetch the gap plus a little extra so the next page is usually already here
+            count = max(needed - len(self.items), 1) + PREFETCH_ITEMS
+            batch = fetch(self.fetch_params(), len(self.items), count)
+
+            # A batch repeating videos we already hold means the upload list changed
+            # since the listing was started, so the offsets no longer line up
+            if self.kind in TRACK_CHANGES and any(item.get('id') in self._seen_ids for item in batch):
+                logging.info(f"{self.kind} listing {self.params} changed upstream, rebuilding it")
+                self.reset()
+                count = needed + PREFETCH_ITEMS
+                batch = fetch(self.params, 0, count)
+
+            if len(batch) < count:
+                self.exhausted = True
+            self._append(batch)
+
+    def stream(self, needed: int, stream_fetch: Callable[[Dict[str, Any], int, int], Iterator[Dict[str, Any]]]) -> Iterator[Dict[str, Any]]:
+        """Yield the first `needed` items, passing new ones on as soon as they are extracted
+
+        Items already loaded come first; the rest are appended one at a time.
+        Nothing is prefetched past `needed`, so the stream ends with its last
+        item. The extraction runs on its own thread holding the listing's lock
+        and hands items over through a queue, so a slow reader never holds up
+        other requests for the listing; it finishes even if the reader leaves.
+        """
+        with self.lock:
+            loaded = self.items[:needed]
+            complete = self.has(needed)
+        yield from loaded
+        if complete:
+            return
+
+        received = queue.Queue()
+        # The thread keeps the caller's extraction priority and trace
+        context = contextvars.copy_context()
+        threading.Thread(target=context.run, args=(self._stream_into, len(loaded), needed, stream_fetch, received),
+                         name='listing-stream', daemon=True).start()
+        while True:
+            item, error = received.get()
+            if error is not None:
+                raise error
+            if item is None:
+                return
+            yield item
+
+    def _stream_into(self, start: int, needed: int, stream_fetch: Callable, received: queue.Queue):
+        """Put items `start` to `needed` on the queue, extracting the missing ones, then (None, None)"""
+        try:
+            with self.lock:
+                # Another request may have loaded more since the caller looked
+                for item in self.items[start:needed]:
+                    received.put((item, None))
+                if not self.has(needed):
+                    count = needed - len(self.items)
+                    returned = 0
+                    for item in stream_fetch(self.fetch_params(), len(self.items), count):
+                        self._append([item])
+                        returned += 1
+                        received.put((item, None))
+                    if returned < count:
+                        self.exhausted = True
+            received.put((None, None))
+        except Exception as e:
+            received.put((None, e))
+
+
+class ListingStore:
+    """Server-side store of result listings addressed by opaque cursor tokens
+
+    A cursor encodes the listing's kind, parameters and an offset. Listings are
+    shared between all clients asking for the same thing; if one has expired or
+    been evicted, the cursor still carries enough to rebuild it.
+    """
+
+    def __init__(self, max_listings: int = 512, fetchers: Optional[Dict[str, Callable]] = None):
+        self.max_listings = max_listings
+        self.fetchers = fetchers or FETCHERS
+        self._listings = OrderedDict()  # listing id -> Listing
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def listing_id(kind: str, params: Dict[str, Any]) -> str:
+        raw = json.dumps([kind, params], sort_keys=True)
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+    def get_listing(self, kind: str, params: Dict[str, Any]) -> Listing:
+        """Return the live listing for kind/params, creating a fresh one if needed"""
+        listing_id = self.listing_id(kind, params)
+        ttl = LISTING_TTLS.get(kind, 600)
+        with self._lock:
+            listing = self._listings.get(listing_id)
+            if listing is None or time.time() - listing.created_at > ttl:
+                listing = Listing(kind, params)
+                self._listings[listing_id] = listing
+            self._listings.move_to_end(listing_id)
+            while len(self._listings) > self.max_listings:
+                self._listings.popitem(last=False)
+        return listing
+
+    def page(self, kind: str, params: Dict[str, Any], offset: int, count: int) -> Tuple[List[Dict[str, Any]], Optional[str], Listing]:
+        """Return (items, next_cursor, listing) for a window of a listing"""
+        listing = self.get_listing(kind, params)
+        listing.ensure(offset + count, self.fetchers[kind])
+        items = listing.items[offset:offset + count]
+        return items, self.next_cursor(listing, offset, len(items)), listing
+
+    @staticmethod
+    def next_cursor(listing: Listing, offset: int, returned: int) -> Optional[str]:
+        """Cursor for the page after `returned` items read from offset, or None when nothing is left"""
+        next_offset = offset + returned
+        has_more = next_offset < len(listing.items) or not listing.exhausted
+        return encode_cursor(listing.kind, listing.params, next_offset) if returned and has_more else None
+
+    def page_from_cursor(self, cursor: str, count: int, expected_kind: str) -> Tuple[List[Dict[str, Any]], Optional[str], Listing]:
+        kind, params, offset = decode_cursor(cursor)
+        if kind != expected_kind:
+            raise ValueError("Invalid pagination cursor")
+        return self.page(kind, params, offset, count)
+
+
+def encode_cursor(kind: str, params: Dict[str, Any], offset: int) -> str:
+    raw = json.dumps({'k': kind, 'p': params, 'o': offset}, sort_keys=True, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, Dict[str, Any], int]:
+    """Decode a cursor token, raising ValueError if it is malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        kind, params, offset = data['k'], data['p'], int(data['o'])
+    except Exception:
+        raise ValueError("Invalid pagination cursor")
+    if kind not in FETCHERS or not isinstance(params, dict) or not params.get(REQUIRED_PARAMS[kind]) or offset < 0:
+        raise ValueError("Invalid pagination cursor")
+    return kind, params, offset
+
+
+listing_store = ListingStore(max_listings=int(os.environ.get('PAGINATION_MAX_LISTINGS', 512)))
@@ -0,0 +1,185 @@
+import os
+import math
+import time
+import heapq
+import itertools
+import threading
+import contextlib
+import contextvars
+from typing import Any, Callable, Dict, Iterator, Optional
+
+# Priority classes, lower runs first
+PRIORITY_PLAYBACK = 0     # stream URLs for a player that is waiting to start
+PRIORITY_INTERACTIVE = 1  # searches, watch pages, channels
+PRIORITY_BACKGROUND = 2   # prefetching and cache refreshes
+
+PRIORITY_NAMES = {
+    PRIORITY_PLAYBACK: 'playback',
+    PRIORITY_INTERACTIVE: 'interactive',
+    PRIORITY_BACKGROUND: 'background',
+}
+
+_current_priority = contextvars.ContextVar('extraction_priority', default=PRIORITY_INTERACTIVE)
+_rejected_in_context = contextvars.ContextVar('extraction_rejected', default=False)
+
+
+class SchedulerBusy(Exception):
+    """Raised when an extraction is rejected because the scheduler is saturated"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@contextlib.contextmanager
+def extraction_priority(priority: int):
+    """Run the extractions started inside this block at the given priority"""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_priority() -> int:
+    return _current_priority.get()
+
+
+def reset_rejection_flag():
+    _rejected_in_context.set(False)
+
+
+def mark_rejected():
+    """Flag the current context as turned away, for extractions rejected on another thread"""
+    _rejected_in_context.set(True)
+
+
+def was_rejected() -> bool:
+    """Whether an extraction started from the current context was turned away"""
+    return _rejected_in_context.get()
+
+
+class ExtractionScheduler:
+    """Admission control for yt-dlp extractions
+
+    At most `max_concurrent` extractions run at once. Others wait in a bounded
+    priority queue (playback before interactive before background work) and are
+    rejected with SchedulerBusy when the queue is full or they wait longer than
+    their own timeout.
+    """
+
+    def __init__(self, max_concurrent: int = 8, max_queue: int = 64):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self._cond = threading.Condition()
+        self._active = 0
+        self._queue = []  # heap of [priority, sequence, granted]
+        self._sequence = itertools.count()
+        self._avg_run_time = 1.0
+        self._max_queue_seen = 0
+        self._stats = {
+            name: {'submitted': 0, 'completed': 0, 'rejected': 0, 'timed_out': 0,
+                   'total_wait': 0.0, 'max_wait': 0.0}
+            for name in PRIORITY_NAMES.values()
+        }
+
+    def retry_after(self) -> int:
+        """Rough number of seconds until a queued slot frees up"""
+        backlog = (len(self._queue) + 1) / max(self.max_concurrent, 1)
+        return max(1, min(30, math.ceil(backlog * self._avg_run_time)))
+
+    def is_saturated(self) -> bool:
+        with self._cond:
+            return len(self._queue) >= self.max_queue
+
+    def _reject(self, name: str, counter: str, message: str):
+        self._stats[name][counter] += 1
+        _rejected_in_context.set(True)
+        raise SchedulerBusy(message, self.retry_after())
+
+    def _acquire(self, priority: int, max_wait: Optional[float]) -> float:
+        name = PRIORITY_NAMES.get(priority, 'interactive')
+        with self._cond:
+            self._stats[name]['submitted'] += 1
+            if self._active < self.max_concurrent and not self._queue:
+                self._active += 1
+                return 0.0
+            if len(self._queue) >= self.max_queue:
+                self._reject(name, 'rejected', "Extraction queue is full")
+
+            ticket = [priority, next(self._sequence), False]
+            heapq.heappush(self._queue, ticket)
+            self._max_queue_seen = max(self._max_queue_seen, len(self._queue))
+            start = time.monotonic()
+            deadline = start + max_wait if max_wait else None
+            while not ticket[2]:
+                remaining = deadline - time.monotonic() if deadline else None
+                if remaining is not None and remaining <= 0:
+                    self._queue.remove(ticket)
+                    heapq.heapify(self._queue)
+                    self._reject(name, 'timed_out', f"Waited {max_wait} seconds for an extraction slot")
+                self._cond.wait(remaining)
+
+            waited = time.monotonic() - start
+            self._stats[name]['total_wait'] += waited
+            self._stats[name]['max_wait'] = max(self._stats[name]['max_wait'], waited)
+            return waited
+
+    def _release(self, priority: int, run_time: float):
+        name = PRIORITY_NAMES.get(priority, 'interactive')
+        with self._cond:
+            self._stats[name]['completed'] += 1
+            self._avg_run_time = 0.9 * self._avg_run_time + 0.1 * run_time
+            if self._queue:
+                # Hand the slot straight to the highest priority waiter
+                ticket = heapq.heappop(self._queue)
+                ticket[2] = True
+                self._cond.notify_all()
+            else:
+                self._active -= 1
+
+    @contextlib.contextmanager
+    def slot(self, priority: Optional[int] = None, max_wait: Optional[float] = None) -> Iterator[None]:
+        """Hold an extraction slot for the duration of the block, raising SchedulerBusy if there is none
+
+        For work that can't be wrapped in a single call, such as reading a
+        command's output while it runs.
+        """
+        if priority is None:
+            priority = current_priority()
+        self._acquire(priority, max_wait)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(priority, time.monotonic() - start)
+
+    def run(self, fn: Callable[[], Any], priority: Optional[int] = None, max_wait: Optional[float] = None) -> Any:
+        """Run fn once a slot is free, raising SchedulerBusy if it can't get one"""
+        with self.slot(priority, max_wait):
+            return fn()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+                'active': self._active,
+                'queue_depth': len(self._queue),
+                'max_queue_depth_seen': self._max_queue_seen,
+                'avg_run_time': round(self._avg_run_time, 3),
+                'priorities': {
+                    name: dict(counters,
+                               total_wait=round(counters['total_wait'], 3),
+                               max_wait=round(counters['max_wait'], 3),
+                               avg_wait=round(counters['total_wait'] / counters['completed'], 3)
+                               if counters['completed'] else 0.0)
+                    for name, counters in self._stats.items()
+                }
+            }
+
+
+extraction_scheduler = ExtractionScheduler(
+    max_concurrent=int(os.environ.get('EXTRACTION_MAX_CONCURRENT', 8)),
+    max_queue=int(os.environ.get('EXTRACTION_MAX_QUEUE', 64)),
+)
@@ -0,0 +1,130 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict
+
+from extractor import CancelScope, cancel_scope, current_cancel_scope
+from scheduler import SchedulerBusy, mark_rejected
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+        self.attached = 0  # waiters that haven't been cancelled
+        self.scope = CancelScope()  # the execution's own cancel scope, see SingleFlight.do
+        self.cancel_requested = False
+        self.abandoned = False  # cancelled with nobody left waiting on it
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key into one execution
+
+    The first caller for a key runs the function; callers arriving while it is
+    in flight wait for it and receive the same result, or the same exception.
+
+    The execution runs in its own cancel scope: cancelling the first caller
+    only stops it once no other caller is waiting on it.
+    """
+
+    def __init__(self, max_tracked_keys: int = 512):
+        self.max_tracked_keys = max_tracked_keys
+        self._calls = {}  # key -> _Call currently in flight
+        self._lock = threading.Lock()
+        self._key_stats = OrderedDict()  # key -> {'executions', 'coalesced'}
+        self._totals = {'executions': 0, 'coalesced': 0, 'errors': 0}
+
+    def _record(self, key: str, counter: str):
+        stats = self._key_stats.get(key)
+        if stats is None:
+            stats = self._key_stats[key] = {'executions': 0, 'coalesced': 0}
+            while len(self._key_stats) > self.max_tracked_keys:
+                self._key_stats.popitem(last=False)
+        self._key_stats.move_to_end(key)
+        stats[counter] += 1
+        self._totals[counter] += 1
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            # An abandoned execution is about to fail, start a fresh one instead
+            if call is not None and not call.abandoned:
+                call.waiters += 1
+                call.attached += 1
+                self._record(key, 'coalesced')
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self._record(key, 'executions')
+                leader = True
+
+        if not leader:
+            return self._wait(call)
+
+        outer = current_cancel_scope()
+
+        def cancel_leader():
+            with self._lock:
+                call.cancel_requested = True
+                if call.attached:
+                    return
+                call.abandoned = True
+            call.scope.cancel()
+
+        if outer is not None:
+            outer.on_cancel(cancel_leader)
+        try:
+            with cancel_scope(call.scope):
+                call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self._totals['errors'] += 1
+            raise
+        finally:
+            if outer is not None:
+                outer.remove(cancel_leader)
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.done.set()
+
+    def _wait(self, call: _Call) -> Any:
+        scope = current_cancel_scope()
+
+        def detach():
+            # A cancelled waiter no longer keeps the execution alive for itself
+            with self._lock:
+                call.attached -= 1
+                if call.cancel_requested and not call.attached and not call.done.is_set():
+                    call.abandoned = True
+            if call.abandoned:
+                call.scope.cancel()
+
+        if scope is not None:
+            scope.on_cancel(detach)
+        try:
+            call.done.wait()
+        finally:
+            if scope is not None:
+                scope.remove(detach)
+        if call.error is not None:
+            if isinstance(call.error, SchedulerBusy):
+                # The leader's extraction was turned away, so this request was too
+                mark_rejected()
+            raise call.error
+        return call.result
+
+    def stats(self, top: int = 20) -> Dict[str, Any]:
+        """Totals plus the keys that saved the most executions"""
+        with self._lock:
+            busiest = sorted(self._key_stats.items(), key=lambda item: item[1]['coalesced'], reverse=True)
+            return dict(self._totals,
+                        in_flight=len(self._calls),
+                        keys={key: dict(stats) for key, stats in busiest[:top] if stats['coalesced']})
+
+
+# Shared by every yt-dlp backed lookup
+extraction_flights = SingleFlight()
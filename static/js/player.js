@@ -104,15 +104,24 @@ class VideoPlayer {
     });
   }
   
-  loadVideo(videoId, quality) {
-    // Always show buffering indicator regardless of quality
-    this.showBuffering();
+  getStreamData(videoId, quality) {
+    // Reuse the format manifest from the last /api/stream response while its URLs are still valid
+    const manifest = this.streamManifest;
+    if (manifest && manifest.videoId === videoId && Date.now() / 1000 < manifest.expiresAt - 60) {
+      const qualities = manifest.qualities;
+      if (quality === 'best' && qualities.bestvideo && qualities.bestaudio) {
+        return Promise.resolve({ mode: 'experimental', video_url: qualities.bestvideo, audio_url: qualities.bestaudio });
+      }
+      if (quality !== 'best' && qualities[quality]) {
+        return Promise.resolve({ mode: 'normal', url: qualities[quality] });
+      }
+    }
     
     // Set mode based on quality
     const mode = quality === 'best' ? 'experimental' : 'normal';
     
     // Get stream URL from API
-    fetch(`/api/stream?v=${videoId}&quality=${quality}&mode=${mode}`)
+    return fetch(`/api/stream?v=${videoId}&quality=${quality}&mode=${mode}`)
       .then(response => {
         if (!response.ok) {
           throw new Error('Failed to get video stream');
@@ -124,6 +133,24 @@ class VideoPlayer {
           throw new Error(data.error);
         }
         
+        // Remember every quality from this extraction for later switches
+        if (data.qualities) {
+          this.streamManifest = {
+            videoId: videoId,
+            qualities: data.qualities,
+            expiresAt: data.expires_at || 0
+          };
+        }
+        return data;
+      });
+  }
+  
+  loadVideo(videoId, quality) {
+    // Always show buffering indicator regardless of quality
+    this.showBuffering();
+    
+    this.getStreamData(videoId, quality)
+      .then(data => {
         if (data.mode === 'experimental') {
             console.log('Using experimental mode (highest quality)');
             
@@ -0,0 +1,90 @@
+import os
+import re
+import time
+import threading
+import urllib.parse
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional
+
+# googlevideo URLs carry the signature expiry either as ?expire= or as /expire/<ts>/
+EXPIRE_PATH_RE = re.compile(r'/expire/(\d+)')
+
+
+def url_expiry(url: str) -> Optional[float]:
+    """Return the unix time a signed stream URL stops working, if it says so"""
+    if not url:
+        return None
+    try:
+        query = urllib.parse.parse_qs(urllib.parse.urlparse(url).query)
+        if 'expire' in query:
+            return float(query['expire'][0])
+        match = EXPIRE_PATH_RE.search(url)
+        if match:
+            return float(match.group(1))
+    except (ValueError, IndexError):
+        pass
+    return None
+
+
+def earliest_expiry(urls: Iterable[str], default_ttl: int) -> float:
+    """Earliest expiry across a set of URLs, or now + default_ttl when none is advertised"""
+    expiries = [expiry for expiry in (url_expiry(url) for url in urls) if expiry]
+    return min(expiries) if expiries else time.time() + default_ttl
+
+
+class StreamURLCache:
+    """Expiry-aware cache for signed stream URLs
+
+    Entries are keyed by (video_id, quality, mode) and dropped `margin` seconds
+    before the URL's own expiry so a client never receives a link that dies
+    mid-playback.
+    """
+
+    def __init__(self, margin: int = 300, default_ttl: int = 3600, max_entries: int = 4096):
+        self.margin = margin
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0}
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            value, expires_at = entry
+            if time.time() >= expires_at - self.margin:
+                del self._entries[key]
+                self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, expires_at: Optional[float] = None):
+        if expires_at is None:
+            expires_at = time.time() + self.default_ttl
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def invalidate_video(self, video_id: str):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == video_id]:
+                del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries), margin=self.margin)
+
+
+stream_cache = StreamURLCache(
+    margin=int(os.environ.get('STREAM_URL_MARGIN', 300)),
+    default_ttl=int(os.environ.get('STREAM_URL_TTL', 3600)),
+)
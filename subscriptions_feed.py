@@ -0,0 +1,70 @@
+import os
+import logging
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Iterator
+
+from pagination import listing_store
+from channel_stats import parse_published_at
+
+# Shared pool so concurrent feed requests together never run more than this many channel fetches
+FEED_WORKERS = int(os.environ.get('SUBSCRIPTIONS_FEED_WORKERS', 8))
+
+# Upper bound on channels per feed request
+MAX_FEED_CHANNELS = int(os.environ.get('SUBSCRIPTIONS_FEED_MAX_CHANNELS', 200))
+
+_feed_executor = ThreadPoolExecutor(max_workers=FEED_WORKERS, thread_name_prefix='subscriptions-feed')
+
+
+def normalize_channel_ids(channel_ids: List[Any]) -> List[str]:
+    """Accept ids or {'id': ...} objects (as stored in the subscriptions cookie), dedupe and strip '@'"""
+    normalized = []
+    for channel in channel_ids:
+        channel_id = channel.get('id') if isinstance(channel, dict) else channel
+        if not channel_id or not isinstance(channel_id, str):
+            continue
+        channel_id = channel_id[1:] if channel_id.startswith('@') else channel_id
+        if channel_id not in normalized:
+            normalized.append(channel_id)
+    return normalized[:MAX_FEED_CHANNELS]
+
+
+def iter_channel_videos(channel_ids: List[str], per_channel: int = 3) -> Iterator[Dict[str, Any]]:
+    """Fetch the latest videos of many channels concurrently, yielding each channel as it completes
+
+    Goes through the shared channel listings, so channels already opened by
+    someone else (or by an earlier feed request) cost no extraction at all.
+    """
+    futures = {
+        _feed_executor.submit(listing_store.page, 'channel', {'id': channel_id}, 0, per_channel): channel_id
+        for channel_id in channel_ids
+    }
+    for future in as_completed(futures):
+        channel_id = futures[future]
+        try:
+            videos = future.result()[0]
+            yield {'channel_id': channel_id, 'videos': videos}
+        except Exception as e:
+            logging.error(f"Error loading subscription videos for channel {channel_id}: {e}")
+            yield {'channel_id': channel_id, 'videos': [], 'error': str(e)}
+
+
+def sort_by_publish_date(videos: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Newest first; videos without a known date go last in their original order"""
+    return sorted(videos, key=lambda video: parse_published_at(video.get('published_at')) or datetime.min,
+                  reverse=True)
+
+
+def build_feed(channel_ids: List[str], per_channel: int = 3) -> Dict[str, Any]:
+    """Merge the latest videos of every channel into one feed sorted by publish date"""
+    videos = []
+    failed = []
+    for result in iter_channel_videos(channel_ids, per_channel):
+        videos.extend(result['videos'])
+        if 'error' in result:
+            failed.append(result['channel_id'])
+    return {
+        'videos': sort_by_publish_date(videos),
+        'channels': len(channel_ids),
+        'failed_channels': failed
+    }
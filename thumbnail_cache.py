@@ -0,0 +1,130 @@
+import io
+import os
+import re
+import logging
+from typing import Dict, Any, Optional, Tuple
+
+from PIL import Image
+
+from disk_store import DiskStore
+from singleflight import SingleFlight
+from upstream import upstream
+
+THUMB_CACHE_DIR = os.environ.get('THUMB_CACHE_DIR', 'thumb_cache')
+THUMB_CACHE_MAX_BYTES = int(os.environ.get('THUMB_CACHE_MAX_MB', 256)) * 1024 * 1024
+
+# Seconds browsers may reuse a thumbnail without revalidating
+THUMB_MAX_AGE = int(os.environ.get('THUMB_MAX_AGE', 86400))
+
+# variant -> (width, height); 'original' is the upstream image as fetched
+THUMBNAIL_VARIANTS: Dict[str, Optional[Tuple[int, int]]] = {
+    'grid': (320, 180),
+    'sidebar': (168, 94),
+    'card': (800, 450),
+    'original': None,
+}
+
+VIDEO_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{11}$')
+
+# hqdefault exists for every video; mqdefault is the fallback for the rare one without it
+SOURCE_URLS = (
+    'https://i.ytimg.com/vi/{video_id}/hqdefault.jpg',
+    'https://i.ytimg.com/vi/{video_id}/mqdefault.jpg',
+)
+
+# Variants bigger than hqdefault (480x360) are rendered from the best of these that exists,
+# falling back to the original; older and low resolution uploads have neither
+HIGH_RES_SOURCE_URLS = (
+    'https://i.ytimg.com/vi/{video_id}/maxresdefault.jpg',
+    'https://i.ytimg.com/vi/{video_id}/sddefault.jpg',
+)
+HIGH_RES_VARIANTS = ('card',)
+
+
+def crop_to_widescreen(image: Image.Image) -> Image.Image:
+    """Cut the letterbox bars off 4:3 thumbnails of 16:9 videos"""
+    width, height = image.size
+    target_height = width * 9 // 16
+    if target_height >= height:
+        return image
+    top = (height - target_height) // 2
+    return image.crop((0, top, width, top + target_height))
+
+
+class ThumbnailCache:
+    """Video thumbnails fetched once from YouTube and kept on disk with resized variants
+
+    The original is fetched the first time any variant is asked for; variants
+    are rendered from it on demand. Concurrent requests for the same file
+    share one fetch or resize.
+    """
+
+    def __init__(self, store: DiskStore):
+        self.store = store
+        self.flights = SingleFlight()
+
+    @staticmethod
+    def filename(video_id: str, variant: str) -> str:
+        return f"{video_id}-{variant}.jpg"
+
+    def _fetch_original(self, video_id: str) -> str:
+        for source in SOURCE_URLS:
+            response = upstream.get(source.format(video_id=video_id))
+            if response.status_code == 200:
+                return self.store.put(self.filename(video_id, 'original'), response.content)
+            if response.status_code != 404:
+                raise Exception(f"Thumbnail upstream returned status code {response.status_code}")
+        raise LookupError(f"No thumbnail found for video {video_id}")
+
+    def _fetch_high_res(self, video_id: str) -> Optional[bytes]:
+        """The largest upstream thumbnail, or None to render from the original"""
+        for source in HIGH_RES_SOURCE_URLS:
+            try:
+                response = upstream.get(source.format(video_id=video_id))
+            except Exception as e:
+                logging.warning(f"Could not fetch high resolution thumbnail for {video_id}: {e}")
+                return None
+            if response.status_code == 200:
+                return response.content
+        return None
+
+    def _render_variant(self, video_id: str, variant: str) -> str:
+        source = self._fetch_high_res(video_id) if variant in HIGH_RES_VARIANTS else None
+        if source is not None:
+            image = Image.open(io.BytesIO(source)).convert('RGB')
+        else:
+            with open(self.path(video_id, 'original'), 'rb') as f:
+                image = Image.open(f).convert('RGB')
+        image = crop_to_widescreen(image).resize(THUMBNAIL_VARIANTS[variant], Image.LANCZOS)
+        output = io.BytesIO()
+        image.save(output, 'JPEG', quality=85, optimize=True, progressive=True)
+        return self.store.put(self.filename(video_id, variant), output.getvalue())
+
+    def path(self, video_id: str, variant: str = 'original') -> str:
+        """Local path of a thumbnail variant, fetching or rendering it if needed
+
+        Raises ValueError for an invalid id or variant and LookupError when
+        the video has no thumbnail.
+        """
+        if not VIDEO_ID_PATTERN.match(video_id):
+            raise ValueError(f"Invalid video id: {video_id}")
+        if variant not in THUMBNAIL_VARIANTS:
+            raise ValueError(f"Unknown thumbnail size, use one of: {', '.join(THUMBNAIL_VARIANTS)}")
+
+        filename = self.filename(video_id, variant)
+        path = self.store.get(filename)
+        if path is not None:
+            return path
+        if variant == 'original':
+            return self.flights.do(filename, lambda: self._fetch_original(video_id))
+        return self.flights.do(filename, lambda: self._render_variant(video_id, variant))
+
+    def read(self, video_id: str, variant: str = 'original') -> bytes:
+        with open(self.path(video_id, variant), 'rb') as f:
+            return f.read()
+
+    def stats(self) -> Dict[str, Any]:
+        return self.store.stats()
+
+
+thumbnail_cache = ThumbnailCache(DiskStore(THUMB_CACHE_DIR, THUMB_CACHE_MAX_BYTES))
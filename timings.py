@@ -0,0 +1,44 @@
+import os
+import threading
+from collections import deque
+from typing import Dict, Any
+
+# How many recent measurements each window keeps
+TIMING_WINDOW_SIZE = int(os.environ.get('TIMING_WINDOW_SIZE', 500))
+
+
+class TimingWindow:
+    """Recent durations (in milliseconds) of a few named phases, for percentile summaries"""
+
+    def __init__(self, size: int = TIMING_WINDOW_SIZE):
+        self.size = size
+        self._samples = {}  # phase -> deque of durations
+        self._counts = {}  # phase -> measurements ever recorded
+        self._lock = threading.Lock()
+
+    def record(self, **durations_ms: float):
+        with self._lock:
+            for phase, duration in durations_ms.items():
+                if phase not in self._samples:
+                    self._samples[phase] = deque(maxlen=self.size)
+                    self._counts[phase] = 0
+                self._samples[phase].append(duration)
+                self._counts[phase] += 1
+
+    def summary(self) -> Dict[str, Any]:
+        """count plus p50/p95/max over the window, per phase"""
+        with self._lock:
+            samples = {phase: sorted(values) for phase, values in self._samples.items()}
+            counts = dict(self._counts)
+        return {
+            phase: {
+                'count': counts[phase],
+                'p50_ms': round(values[len(values) // 2], 1),
+                'p95_ms': round(values[min(len(values) - 1, int(len(values) * 0.95))], 1),
+                'max_ms': round(values[-1], 1),
+            }
+            for phase, values in samples.items()
+        }
+
+
+search_stream_timings = TimingWindow()
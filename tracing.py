@@ -0,0 +1,175 @@
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+import contextlib
+import contextvars
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+# Opt-in: with TRACE_REQUESTS=1 every request records a span tree
+TRACE_REQUESTS = os.environ.get('TRACE_REQUESTS', '0') == '1'
+
+# Traced requests slower than this are written to the slow request log
+TRACE_SLOW_MS = float(os.environ.get('TRACE_SLOW_MS', 2000))
+
+# How many finished traces /api/debug/traces keeps
+TRACE_RECENT = int(os.environ.get('TRACE_RECENT', 100))
+
+slow_request_log = logging.getLogger('neontube.slow_requests')
+
+
+class Span:
+    """One timed step of a request; children are the steps it started"""
+    __slots__ = ('name', 'attrs', 'start', 'end', 'error', 'children')
+
+    def __init__(self, name: str, attrs: Dict[str, Any]):
+        self.name = name
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.end = None
+        self.error = None
+        self.children = []
+
+    def set(self, **attrs: Any):
+        self.attrs.update(attrs)
+
+    def to_dict(self, origin: float) -> Dict[str, Any]:
+        data = {
+            'name': self.name,
+            'start_ms': round((self.start - origin) * 1000, 1),
+            # Spans still running (e.g. a cancelled hedge attempt) have no duration yet
+            'duration_ms': round((self.end - self.start) * 1000, 1) if self.end is not None else None,
+        }
+        if self.attrs:
+            data['attrs'] = self.attrs
+        if self.error:
+            data['error'] = self.error
+        if self.children:
+            data['children'] = [child.to_dict(origin) for child in list(self.children)]
+        return data
+
+
+class Trace:
+    """The span tree of one request"""
+
+    def __init__(self, name: str, attrs: Dict[str, Any]):
+        self.id = uuid.uuid4().hex[:16]
+        self.started_at = time.time()
+        self.root = Span(name, attrs)
+        self.lock = threading.Lock()  # spans are added from hedge and pool threads too
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.root.end if self.root.end is not None else time.perf_counter()
+        return (end - self.root.start) * 1000
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'name': self.root.name,
+            'started_at': self.started_at,
+            'duration_ms': round(self.duration_ms, 1),
+            'status': self.root.attrs.get('status'),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self.lock:
+            return dict(self.summary(), root=self.root.to_dict(self.root.start))
+
+
+# (trace, span new spans are attached to) for the request being handled in this context
+_current = contextvars.ContextVar('trace_current', default=None)
+
+_recent = deque(maxlen=TRACE_RECENT)
+_recent_lock = threading.Lock()
+
+
+def start_trace(name: str, **attrs: Any) -> Optional[Trace]:
+    """Start tracing the current request, if tracing is enabled"""
+    if not TRACE_REQUESTS:
+        return None
+    trace = Trace(name, attrs)
+    _current.set((trace, trace.root))
+    return trace
+
+
+def finish_trace(trace: Optional[Trace], error: Optional[BaseException] = None, **attrs: Any):
+    """Close a request's trace, keep it for the debug endpoint and log it if it was slow"""
+    if trace is None:
+        return
+    _current.set(None)
+    trace.root.set(**attrs)
+    close_span(trace.root, error)
+    with _recent_lock:
+        _recent.append(trace)
+    if trace.duration_ms >= TRACE_SLOW_MS:
+        slow_request_log.warning(f"Slow request {trace.root.name} took {trace.duration_ms:.0f} ms: "
+                                 f"{json.dumps(trace.to_dict(), default=str)}")
+
+
+def open_span(name: str, **attrs: Any) -> Optional[Span]:
+    """Attach a span to the current trace without making it the parent of later spans"""
+    current = _current.get()
+    if current is None:
+        return None
+    trace, parent = current
+    span = Span(name, attrs)
+    with trace.lock:
+        parent.children.append(span)
+    return span
+
+
+def close_span(span: Optional[Span], error: Optional[BaseException] = None):
+    if span is None:
+        return
+    if error is not None:
+        span.error = f"{type(error).__name__}: {error}"
+    span.end = time.perf_counter()
+
+
+@contextlib.contextmanager
+def span(name: str, leaf: bool = False, **attrs: Any):
+    """Time the block as a span of the current trace; a no-op when the request isn't traced
+
+    Spans opened inside the block become its children unless leaf is set,
+    which generators should use since they yield with the span open.
+    """
+    current = open_span(name, **attrs)
+    if current is None:
+        yield None
+        return
+    token = None if leaf else _current.set((_current.get()[0], current))
+    try:
+        yield current
+    except BaseException as e:
+        close_span(current, e)
+        raise
+    else:
+        close_span(current)
+    finally:
+        if token is not None:
+            _current.reset(token)
+
+
+def current_trace() -> Optional[Trace]:
+    current = _current.get()
+    return current[0] if current else None
+
+
+def recent_traces(min_ms: float = 0) -> List[Dict[str, Any]]:
+    """Summaries of the finished traces still kept, newest first"""
+    with _recent_lock:
+        traces = list(_recent)
+    return [trace.summary() for trace in reversed(traces) if trace.duration_ms >= min_ms]
+
+
+def get_trace(trace_id: str) -> Optional[Dict[str, Any]]:
+    with _recent_lock:
+        traces = list(_recent)
+    for trace in traces:
+        if trace.id == trace_id:
+            return trace.to_dict()
+    return None
@@ -0,0 +1,175 @@
+import os
+import json
+import time
+import logging
+import threading
+from typing import List, Dict, Any, Optional, Callable
+
+try:
+    import fcntl
+except ImportError:  # Not on Windows: every process refreshes on its own there
+    fcntl = None
+
+from youtube_api import get_trending_videos
+from scheduler import extraction_priority, PRIORITY_BACKGROUND
+
+# Countries whose trending feed is kept warm in the background
+TRENDING_COUNTRIES = [c.strip().upper() for c in os.environ.get('TRENDING_PREFETCH_COUNTRIES', 'TR,US').split(',') if c.strip()]
+
+# Seconds between two refreshes of every prefetched country
+TRENDING_REFRESH_INTERVAL = int(os.environ.get('TRENDING_REFRESH_INTERVAL', 600))
+
+# Directory shared by the worker processes: one of them refreshes and writes the
+# snapshots there, the others read them. Empty makes every process refresh on its own
+TRENDING_PREFETCH_DIR = os.environ.get('TRENDING_PREFETCH_DIR', 'trending_snapshots')
+
+
+class TrendingPrefetcher:
+    """Refreshes trending feeds for a fixed set of countries on an interval
+
+    The home page is served from the latest snapshot. A failed or empty refresh
+    keeps the previous snapshot, and countries outside the set are extracted on
+    demand as before.
+
+    With a shared `directory`, only the process holding its lock file refreshes;
+    the other workers serve the snapshots it writes there and take over the
+    lock if that process exits.
+    """
+
+    def __init__(self, countries: List[str], interval: int,
+                 fetch: Optional[Callable[[str], List[Dict[str, Any]]]] = None,
+                 directory: Optional[str] = None):
+        self.countries = countries
+        self.interval = interval
+        # Bypass the metadata cache, a refresh has to hit yt-dlp
+        self.fetch = fetch or (lambda country: get_trending_videos.uncached(country_code=country))
+        self.directory = directory if fcntl is not None else None
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+        self._snapshots = {}  # country -> (videos, fetched_at)
+        self._loaded_mtimes = {}  # country -> mtime of the shared snapshot file last read
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock_file = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='trending-prefetch', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        # Prefetching yields to extractions somebody is actually waiting for
+        with extraction_priority(PRIORITY_BACKGROUND):
+            while not self._stop.is_set():
+                if self._is_leader():
+                    for country in self.countries:
+                        if self._stop.is_set():
+                            break
+                        self.refresh(country)
+                self._stop.wait(self.interval)
+
+    def _is_leader(self) -> bool:
+        """Whether this process refreshes, taking the lock file when nobody holds it"""
+        if not self.directory or self._lock_file is not None:
+            return True
+        lock_file = open(os.path.join(self.directory, 'refresh.lock'), 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        # Held until the process exits, then another worker's next attempt gets it
+        self._lock_file = lock_file
+        logging.info(f"Trending prefetch: process {os.getpid()} refreshes the shared snapshots")
+        return True
+
+    def _snapshot_path(self, country: str) -> str:
+        return os.path.join(self.directory, f"{country}.json")
+
+    def _write_shared(self, country: str, videos: List[Dict[str, Any]], fetched_at: float):
+        path = self._snapshot_path(country)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump({'videos': videos, 'fetched_at': fetched_at}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.error(f"Could not write trending snapshot for {country}: {e}")
+
+    def _read_shared(self, country: str):
+        """Pick up the snapshot the refreshing process wrote, if it changed since the last read"""
+        path = self._snapshot_path(country)
+        try:
+            mtime = os.stat(path).st_mtime
+            if self._loaded_mtimes.get(country) == mtime:
+                return
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        with self._lock:
+            self._snapshots[country] = (data['videos'], data['fetched_at'])
+            self._loaded_mtimes[country] = mtime
+
+    def refresh(self, country: str) -> bool:
+        """Fetch a new snapshot for a country, keeping the old one if that fails"""
+        try:
+            videos = self.fetch(country)
+        except Exception as e:
+            logging.error(f"Trending refresh failed for {country}, keeping previous snapshot: {e}")
+            return False
+        if not videos:
+            logging.warning(f"Trending refresh for {country} returned nothing, keeping previous snapshot")
+            return False
+        fetched_at = time.time()
+        with self._lock:
+            self._snapshots[country] = (videos, fetched_at)
+        if self.directory:
+            self._write_shared(country, videos, fetched_at)
+        return True
+
+    def get_snapshot(self, country: str) -> Optional[List[Dict[str, Any]]]:
+        if self.directory and self._lock_file is None and country in self.countries:
+            self._read_shared(country)
+        with self._lock:
+            snapshot = self._snapshots.get(country)
+        return snapshot[0] if snapshot else None
+
+    def get_trending(self, country: str) -> List[Dict[str, Any]]:
+        """Latest snapshot for prefetched countries, on-demand extraction for the rest"""
+        videos = self.get_snapshot(country)
+        if videos is not None:
+            return videos
+        return get_trending_videos(country_code=country)
+
+    def status(self) -> Dict[str, Any]:
+        """Age in seconds of each country's snapshot (None until the first refresh succeeds)"""
+        if self.directory and self._lock_file is None:
+            for country in self.countries:
+                self._read_shared(country)
+        now = time.time()
+        with self._lock:
+            snapshots = dict(self._snapshots)
+        return {
+            'interval': self.interval,
+            'running': self._thread is not None and self._thread.is_alive(),
+            'refreshing': self._thread is not None and self._thread.is_alive() and (
+                not self.directory or self._lock_file is not None),
+            'countries': {
+                country: {
+                    'age_seconds': round(now - snapshots[country][1], 1) if country in snapshots else None,
+                    'videos': len(snapshots[country][0]) if country in snapshots else 0
+                }
+                for country in self.countries
+            }
+        }
+
+
+trending_prefetcher = TrendingPrefetcher(TRENDING_COUNTRIES, TRENDING_REFRESH_INTERVAL,
+                                         directory=TRENDING_PREFETCH_DIR if TRENDING_COUNTRIES else None)
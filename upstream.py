@@ -0,0 +1,195 @@
+import os
+import time
+import random
+import logging
+import threading
+from urllib.parse import urlsplit
+from typing import Dict, Any, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import upstream_request_seconds, upstream_short_circuited, status_class
+from tracing import span
+
+# Seconds to wait for a connection and for each read from the upstream
+UPSTREAM_CONNECT_TIMEOUT = float(os.environ.get('UPSTREAM_CONNECT_TIMEOUT', 3.05))
+UPSTREAM_READ_TIMEOUT = float(os.environ.get('UPSTREAM_READ_TIMEOUT', 15))
+
+# Extra attempts for idempotent requests that fail with a connection error, timeout or 502/503/504
+UPSTREAM_RETRIES = int(os.environ.get('UPSTREAM_RETRIES', 2))
+UPSTREAM_BACKOFF = float(os.environ.get('UPSTREAM_BACKOFF', 0.3))
+
+# Kept-alive connections per host, and how many hosts keep a pool
+UPSTREAM_POOL_SIZE = int(os.environ.get('UPSTREAM_POOL_SIZE', 20))
+UPSTREAM_POOL_HOSTS = int(os.environ.get('UPSTREAM_POOL_HOSTS', 10))
+
+# Consecutive failures that open a host's circuit, and seconds before a trial request is let through
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get('UPSTREAM_BREAKER_THRESHOLD', 5))
+BREAKER_RESET_TIMEOUT = float(os.environ.get('UPSTREAM_BREAKER_RESET', 30))
+
+RETRY_STATUSES = {502, 503, 504}
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+
+class CircuitOpen(Exception):
+    """Raised without contacting the upstream while its circuit is open"""
+
+    def __init__(self, host: str, retry_after: float):
+        super().__init__(f"Upstream {host} is unavailable, retry in {retry_after:.0f} seconds")
+        self.host = host
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Closed until `failure_threshold` consecutive failures, then open for `reset_timeout` seconds
+
+    After the timeout a single trial request is allowed (half-open); its
+    outcome closes the circuit again or re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> Optional[float]:
+        """None if a request may go out, otherwise seconds until the next trial"""
+        with self._lock:
+            if self.state == 'closed':
+                return None
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if self.state == 'open' and remaining <= 0:
+                self.state = 'half_open'
+                return None
+            return max(remaining, 1.0)
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    logging.warning(f"Opening upstream circuit after {self.failures} consecutive failures")
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+
+class UpstreamClient:
+    """Shared HTTP client for every outbound call the app makes
+
+    One requests.Session keeps a pool of kept-alive connections per host.
+    Each host gets its own circuit breaker and latency/error counters.
+    """
+
+    def __init__(self, connect_timeout: float = UPSTREAM_CONNECT_TIMEOUT,
+                 read_timeout: float = UPSTREAM_READ_TIMEOUT,
+                 retries: int = UPSTREAM_RETRIES, backoff: float = UPSTREAM_BACKOFF):
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=UPSTREAM_POOL_HOSTS, pool_maxsize=UPSTREAM_POOL_SIZE)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._breakers = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _host_state(self, host: str):
+        with self._lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT)
+                self._stats[host] = {'requests': 0, 'errors': 0, 'retries': 0, 'short_circuited': 0,
+                                     'total_latency': 0.0, 'max_latency': 0.0}
+            return self._breakers[host], self._stats[host]
+
+    def _record(self, stats: Dict[str, Any], host: str, method: str, status: str, latency: float, error: bool):
+        upstream_request_seconds.observe(latency, host, method, status)
+        with self._lock:
+            stats['requests'] += 1
+            stats['total_latency'] += latency
+            stats['max_latency'] = max(stats['max_latency'], latency)
+            if error:
+                stats['errors'] += 1
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Send a request through the pool; raises CircuitOpen or requests.RequestException
+
+        Responses are returned whatever their status, like requests itself.
+        """
+        method = method.upper()
+        host = urlsplit(url).netloc
+        breaker, stats = self._host_state(host)
+        kwargs.setdefault('timeout', self.timeout)
+        attempts = 1 + (self.retries if method in IDEMPOTENT_METHODS else 0)
+
+        for attempt in range(attempts):
+            retry_after = breaker.allow()
+            if retry_after is not None:
+                with self._lock:
+                    stats['short_circuited'] += 1
+                upstream_short_circuited.inc(host)
+                raise CircuitOpen(host, retry_after)
+
+            if attempt:
+                with self._lock:
+                    stats['retries'] += 1
+                # Exponential backoff with jitter so retries from many threads don't line up
+                time.sleep(self.backoff * (2 ** (attempt - 1)) * (0.5 + random.random()))
+
+            start = time.monotonic()
+            try:
+                with span('http', method=method, url=url, attempt=attempt + 1) as http_span:
+                    response = self.session.request(method, url, **kwargs)
+                    if http_span is not None:
+                        http_span.set(status=response.status_code)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._record(stats, host, method, 'error', time.monotonic() - start, error=True)
+                breaker.record_failure()
+                if attempt == attempts - 1:
+                    raise
+                logging.warning(f"Upstream {method} {url} failed ({e}), retrying")
+                continue
+            except BaseException:
+                # Any other failure (ChunkedEncodingError, InvalidURL, ...) isn't retried, but it
+                # still has to be counted, or a half-open circuit would never leave that state
+                self._record(stats, host, method, 'error', time.monotonic() - start, error=True)
+                breaker.record_failure()
+                raise
+
+            failed = response.status_code >= 500
+            self._record(stats, host, method, status_class(response.status_code), time.monotonic() - start, error=failed)
+            if not failed:
+                breaker.record_success()
+                return response
+            breaker.record_failure()
+            if response.status_code not in RETRY_STATUSES or attempt == attempts - 1:
+                return response
+            response.close()
+            logging.warning(f"Upstream {method} {url} returned {response.status_code}, retrying")
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-host request, error and latency counters plus circuit state"""
+        with self._lock:
+            hosts = {host: dict(stats) for host, stats in self._stats.items()}
+            breakers = dict(self._breakers)
+        for host, stats in hosts.items():
+            stats['avg_latency'] = round(stats['total_latency'] / stats['requests'], 4) if stats['requests'] else 0.0
+            stats['total_latency'] = round(stats['total_latency'], 3)
+            stats['max_latency'] = round(stats['max_latency'], 4)
+            stats['circuit'] = breakers[host].state
+        return hosts
+
+
+upstream = UpstreamClient()
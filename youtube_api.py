@@ -1,31 +1,197 @@
+import os
+import time
+import contextlib
 import subprocess
 import json
 import logging
-import re
 import urllib.parse
-import requests
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator
+
+from extractor import get_backend, ExtractionCancelled
+from metrics import ytdlp_command_seconds
+from tracing import span
+from cache import cached
+from stream_cache import stream_cache, earliest_expiry
+from singleflight import extraction_flights
+from scheduler import extraction_scheduler, SchedulerBusy, PRIORITY_PLAYBACK
+from hedge import hedger
+from channel_resolver import channel_resolver, ChannelIdentity
+from normalizer import normalize_listing, normalize_entries, iter_records, format_records, format_duration, format_view_count, format_upload_date
+
+# Description used by get_channel_info when yt-dlp couldn't resolve the channel
+BASIC_CHANNEL_DESCRIPTION = 'Channel information is currently unavailable'
+
+# Videos extracted together with a channel's info; covers the first page plus the pagination prefetch
+CHANNEL_OVERVIEW_VIDEOS = int(os.environ.get('CHANNEL_OVERVIEW_VIDEOS', 30))
+
+# Seconds each channel URL form gets to produce the channel's overview
+CHANNEL_OVERVIEW_TIMEOUT = int(os.environ.get('CHANNEL_OVERVIEW_TIMEOUT', 15))
+
+@contextlib.contextmanager
+def _yt_dlp_call(command: List[str], kind: str, timeout: int):
+    """Translate backend errors for the caller and record the call's latency, outcome and trace span"""
+    start = time.perf_counter()
+    outcome = 'error'
+    exit_status = None
+    with span('yt-dlp', leaf=True, kind=kind, argv=command, timeout=timeout) as call_span:
+        try:
+            yield
+            outcome = 'ok'
+            exit_status = 0
+        except SchedulerBusy as e:
+            outcome = exit_status = 'rejected'
+            logging.warning(f"yt-dlp command rejected by scheduler: {e}")
+            raise
+        except ExtractionCancelled:
+            outcome = exit_status = 'cancelled'
+            raise
+        except GeneratorExit:
+            # The caller stopped reading streamed output
+            outcome = exit_status = 'abandoned'
+            raise
+        except subprocess.TimeoutExpired:
+            outcome = exit_status = 'timeout'
+            logging.error(f"yt-dlp command timed out after {timeout} seconds")
+            raise Exception(f"Command timed out after {timeout} seconds")
+        except subprocess.CalledProcessError as e:
+            exit_status = e.returncode
+            logging.error(f"yt-dlp command error: {e}")
+            logging.error(f"stderr: {e.stderr}")
+            raise Exception("Failed to execute yt-dlp command")
+        except Exception:
+            exit_status = 'error'
+            raise
+        finally:
+            ytdlp_command_seconds.observe(time.perf_counter() - start, kind, outcome)
+            if call_span is not None:
+                call_span.set(outcome=outcome, exit_status=exit_status)
+
+def run_yt_dlp_command(command: List[str], timeout: int = 30, priority: Optional[int] = None,
+                       kind: str = 'other') -> str:
+    """Execute a yt-dlp command on the active extraction backend and return the output with timeout
+
+    Every command goes through the extraction scheduler; priority defaults to
+    the one set by the caller's context (interactive unless stated otherwise).
+    kind labels the call in the metrics (search, trending, video_info, channel, stream).
+    """
+    with _yt_dlp_call(command, kind, timeout):
+        return extraction_scheduler.run(lambda: get_backend().run(command, timeout), priority, max_wait=timeout)
 
-def run_yt_dlp_command(command: List[str], timeout: int = 30) -> str:
-    """Execute a yt-dlp command and return the output with timeout"""
-    try:
-        result = subprocess.run(command, capture_output=True, text=True, check=True, timeout=timeout)
-        return result.stdout.strip()
-    except subprocess.TimeoutExpired:
-        logging.error(f"yt-dlp command timed out after {timeout} seconds")
-        raise Exception(f"Command timed out after {timeout} seconds")
-    except subprocess.CalledProcessError as e:
-        logging.error(f"yt-dlp command error: {e}")
-        logging.error(f"stderr: {e.stderr}")
-        raise Exception("Failed to execute yt-dlp command")
+def iter_yt_dlp_lines(command: List[str], timeout: int = 30, priority: Optional[int] = None,
+                      kind: str = 'other') -> Iterator[str]:
+    """Like run_yt_dlp_command, but yield the output lines as yt-dlp prints them
+
+    The extraction slot is held until the output has been read or the caller
+    stops iterating.
+    """
+    with _yt_dlp_call(command, kind, timeout):
+        with extraction_scheduler.slot(priority, max_wait=timeout):
+            yield from get_backend().iter_lines(command, timeout)
+
+# Qualities the player can ask for; a single extraction resolves all of them
+STREAM_QUALITIES = ['144', '240', '360', '480', '720', '1080', '1440', '2160', 'best', 'bestvideo', 'bestaudio']
+
+def build_stream_manifest(video_id: str, video_info: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduce a yt-dlp --dump-json result to the playable stream formats
+
+    Formats keep yt-dlp's ordering (worst to best), so the last match for a
+    selector is the one yt-dlp itself would pick.
+    """
+    formats = []
+    for f in video_info.get('formats') or []:
+        url = f.get('url')
+        has_video = f.get('vcodec') != 'none'
+        has_audio = f.get('acodec') != 'none'
+        if not url or not (has_video or has_audio):
+            continue
+        formats.append({
+            'format_id': f.get('format_id'),
+            'kind': 'combined' if has_video and has_audio else ('video' if has_video else 'audio'),
+            'height': f.get('height'),
+            'ext': f.get('ext'),
+            'url': url
+        })
+
+    return {
+        'video_id': video_id,
+        'formats': formats,
+        'expires_at': earliest_expiry((f['url'] for f in formats), stream_cache.default_ttl)
+    }
+
+def select_stream_url(manifest: Dict[str, Any], quality: str) -> str:
+    """Pick a URL from a stream manifest the way yt-dlp's format selectors would
+
+    'bestaudio' and 'bestvideo' pick the best single-track formats, 'best' the
+    best combined format, and a number behaves like best[height<=N].
+    """
+    formats = manifest.get('formats', [])
+    if quality == 'bestaudio':
+        candidates = [f for f in formats if f['kind'] == 'audio']
+    elif quality == 'bestvideo':
+        candidates = [f for f in formats if f['kind'] == 'video']
+    elif quality == 'best':
+        candidates = [f for f in formats if f['kind'] == 'combined']
+    else:
+        try:
+            max_height = int(quality)
+        except (TypeError, ValueError):
+            raise Exception(f"Unsupported quality '{quality}'")
+        candidates = [f for f in formats
+                      if f['kind'] == 'combined' and f.get('height') and f['height'] <= max_height]
+
+    if not candidates:
+        raise Exception(f"Requested format is not available for quality '{quality}'")
+    return candidates[-1]['url']
+
+def cache_stream_manifest(video_id: str, video_info: Dict[str, Any]) -> Dict[str, Any]:
+    """Build a stream manifest and cache it together with the URL for every standard quality"""
+    manifest = build_stream_manifest(video_id, video_info)
+    if not manifest['formats']:
+        return manifest
+
+    expires_at = manifest['expires_at']
+    stream_cache.set((video_id, 'manifest', 'all'), manifest, expires_at)
+    for quality, stream_url in get_stream_qualities(manifest).items():
+        stream_cache.set((video_id, quality, 'normal'), stream_url, expires_at)
+    return manifest
+
+def get_stream_manifest(video_id: str) -> Dict[str, Any]:
+    """Get every playable format of a video from one (cached) yt-dlp extraction"""
+    manifest = stream_cache.get((video_id, 'manifest', 'all'))
+    if manifest:
+        return manifest
+
+    def extract():
+        youtube_url = f"https://www.youtube.com/watch?v={video_id}"
+        command = ["yt-dlp", "--dump-json", "--no-playlist", youtube_url]
+        # A player is waiting on this, let it jump ahead of searches and prefetching
+        video_info = json.loads(run_yt_dlp_command(command, priority=PRIORITY_PLAYBACK, kind='stream'))
+        return cache_stream_manifest(video_id, video_info)
+
+    # Concurrent players of the same video share one extraction
+    return extraction_flights.do(f"stream_manifest:{video_id}", extract)
+
+def get_stream_qualities(manifest: Dict[str, Any]) -> Dict[str, str]:
+    """Map every standard quality available in a manifest to its stream URL"""
+    qualities = {}
+    for quality in STREAM_QUALITIES:
+        try:
+            qualities[quality] = select_stream_url(manifest, quality)
+        except Exception:
+            continue
+    return qualities
 
 def get_video_stream_url(video_id: str, quality: str = "720") -> str:
-    """Get direct stream URL for a YouTube video using yt-dlp"""
-    youtube_url = f"https://www.youtube.com/watch?v={video_id}"
-    command = ["yt-dlp", "-f", f"best[height<={quality}]", "-g", youtube_url]
+    """Get direct stream URL for a YouTube video, served from the stream URL cache when possible"""
+    cached_url = stream_cache.get((video_id, quality, 'normal'))
+    if cached_url:
+        return cached_url
 
     try:
-        return run_yt_dlp_command(command)
+        manifest = get_stream_manifest(video_id)
+        stream_url = select_stream_url(manifest, quality)
+        stream_cache.set((video_id, quality, 'normal'), stream_url, manifest['expires_at'])
+        return stream_url
     except Exception as e:
         logging.error(f"Error getting stream URL for {video_id}: {e}")
         raise Exception(f"Failed to get video stream URL: {str(e)}")
@@ -50,9 +216,15 @@ def get_video_info_from_yt_dlp(video_id: str) -> Dict[str, Any]:
     command = ["yt-dlp", "--dump-json", "--no-playlist", youtube_url]
 
     try:
-        output = run_yt_dlp_command(command)
+        output = run_yt_dlp_command(command, kind='video_info')
         video_info = json.loads(output)
 
+        # The same dump carries the stream formats, so warm the stream URL cache for the player
+        try:
+            cache_stream_manifest(video_id, video_info)
+        except Exception as e:
+            logging.error(f"Error caching stream formats for {video_id}: {e}")
+
         # Format the duration safely
         duration_seconds = video_info.get('duration', 0)
         formatted_duration = "00:00"
@@ -64,14 +236,7 @@ def get_video_info_from_yt_dlp(video_id: str) -> Dict[str, Any]:
 
         # Format the date (YYYYMMDD to readable format)
         upload_date = video_info.get('upload_date', '')
-        formatted_date = upload_date
-        try:
-            if upload_date and isinstance(upload_date, str) and len(upload_date) == 8:
-                from datetime import datetime
-                date_obj = datetime.strptime(upload_date, '%Y%m%d')
-                formatted_date = date_obj.strftime('%B %d, %Y')
-        except Exception as e:
-            logging.error(f"Error formatting date {upload_date}: {e}")
+        formatted_date = format_upload_date(upload_date) if isinstance(upload_date, str) else upload_date
 
         # Format view count safely
         view_count = video_info.get('view_count', 0)
@@ -124,165 +289,92 @@ def get_video_info_from_yt_dlp(video_id: str) -> Dict[str, Any]:
         logging.error(f"Error getting video info for {video_id}: {e}")
         raise Exception(f"Failed to get video information: {str(e)}")
 
-def format_duration(seconds: int) -> str:
-    """Format duration in seconds to MM:SS or HH:MM:SS format"""
-    if not seconds:
-        return "00:00"
-
-    minutes, seconds = divmod(seconds, 60)
-    hours, minutes = divmod(minutes, 60)
-
-    if hours:
-        return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
-    else:
-        return f"{minutes:02d}:{seconds:02d}"
-
-def format_view_count(count: int) -> str:
-    """Format large numbers to human-readable form (e.g., 1.5M, 4.3K)"""
-    if not count:
-        return "0"
-
-    try:    
-        if count >= 1000000:
-            return f"{count/1000000:.1f}M"
-        elif count >= 1000:
-            return f"{count/1000:.1f}K"
-        else:
-            return str(count)
-    except Exception as e:
-        logging.error(f"Error formatting view count {count}: {e}")
-        return str(count)
-
-def search_videos(query: str, max_results: int = 20, country_code: str = "TR") -> List[Dict[str, Any]]:
+def build_search_command(query: str, max_results: int, country_code: Optional[str], skip: int = 0) -> List[str]:
+    """yt-dlp command for a window of search results; country_code None searches globally"""
+    search_query = urllib.parse.quote(query)
+    # Only ask yt-dlp for the requested window of the result list
+    search_spec = f"ytsearch{skip + max_results}:{search_query}"
+    items_range = f"{skip + 1}:{skip + max_results}"
+
+    command = ["yt-dlp", "--flat-playlist", "--dump-json"]
+    if country_code:
+        # Region-specific results
+        command += ["--extractor-args", f"youtube:lang=tr,region={country_code}"]
+    return command + ["-I", items_range, search_spec]
+
+@cached('search', cache_if=bool)
+def search_window(query: str, max_results: int, country_code: Optional[str], skip: int = 0) -> List[Dict[str, Any]]:
+    """One window of search results from a single source: country-specific, or global when country_code is None"""
+    command = build_search_command(query, max_results, country_code, skip)
+    output = run_yt_dlp_command(command, timeout=10, kind='search')
+    return normalize_listing(output, country=country_code or 'GLOBAL')
+
+def search_videos(query: str, max_results: int = 20, country_code: str = "TR", skip: int = 0) -> List[Dict[str, Any]]:
     """Search for videos using yt-dlp with country-specific results
     
     Args:
         query: The search query
         max_results: Maximum number of results to return
         country_code: ISO country code (e.g., 'TR' for Turkey, 'US' for United States)
+        skip: Number of results to skip (for pagination); skipped results are not emitted by yt-dlp
     """
-    search_query = urllib.parse.quote(query)
-    
-    # Add country code parameter to search query for region-specific results
-    region_param = f"&region={country_code}"
-    command = ["yt-dlp", "--flat-playlist", "--dump-json", "--extractor-args", 
-               f"youtube:lang=tr,region={country_code}", 
-               f"ytsearch{max_results}:{search_query}"]
-
+    # The global search is started alongside a slow or failed country-specific one. Each source
+    # is cached under its own key, so a global result never stands in for the regional one later
     try:
-        output = run_yt_dlp_command(command, timeout=10)
-        videos = []
-
-        # Process each line as a separate JSON object
-        for line in output.splitlines():
-            if line.strip():
-                try:
-                    video_info = json.loads(line)
-
-                    # Format duration safely
-                    duration = None
-                    try:
-                        if video_info.get('duration'):
-                            duration = format_duration(int(video_info.get('duration')))
-                    except Exception as e:
-                        logging.error(f"Error formatting duration: {e}")
-
-                    # Format view count safely
-                    view_count = None
-                    try:
-                        if video_info.get('view_count'):
-                            view_count = format_view_count(int(video_info.get('view_count')))
-                    except Exception as e:
-                        logging.error(f"Error formatting view count: {e}")
-
-                    # Format date safely
-                    published_at = video_info.get('upload_date', '')
-                    try:
-                        if published_at and isinstance(published_at, str) and len(published_at) == 8:
-                            from datetime import datetime
-                            date_obj = datetime.strptime(published_at, '%Y%m%d')
-                            published_at = date_obj.strftime('%B %d, %Y')
-                    except Exception as e:
-                        logging.error(f"Error formatting date: {e}")
-
-                    # Ensure thumbnail exists
-                    thumbnail = video_info.get('thumbnail', '')
-                    if not thumbnail:
-                        thumbnail = f"https://i.ytimg.com/vi/{video_info.get('id', '')}/hqdefault.jpg"
-
-                    videos.append({
-                        'id': video_info.get('id', ''),
-                        'title': video_info.get('title', 'Untitled Video'),
-                        'channel': video_info.get('uploader', 'Unknown Channel'),
-                        'channel_id': video_info.get('channel_id', ''),
-                        'thumbnail': thumbnail,
-                        'duration': duration,
-                        'view_count': view_count,
-                        'published_at': published_at,
-                        'country': country_code
-                    })
-                except Exception as e:
-                    logging.error(f"Error processing video info: {e}")
-                    continue
-
-        # If no results found with country-specific search, fall back to global search
-        if not videos:
-            logging.warning(f"No search results found for '{query}' in {country_code}, falling back to global search")
-            fallback_command = ["yt-dlp", "--flat-playlist", "--dump-json", f"ytsearch{max_results}:{search_query}"]
-            output = run_yt_dlp_command(fallback_command, timeout=10)
-            
-            # Process fallback videos (similar to above)
-            for line in output.splitlines():
-                if line.strip():
-                    try:
-                        video_info = json.loads(line)
-                        # Same processing as above (simplified here)
-                        videos.append({
-                            'id': video_info.get('id', ''),
-                            'title': video_info.get('title', 'Untitled Video'),
-                            'channel': video_info.get('uploader', 'Unknown Channel'),
-                            'channel_id': video_info.get('channel_id', ''),
-                            'thumbnail': video_info.get('thumbnail', '') or f"https://i.ytimg.com/vi/{video_info.get('id', '')}/hqdefault.jpg",
-                            'duration': format_duration(int(video_info.get('duration', 0))) if video_info.get('duration') else None,
-                            'view_count': format_view_count(int(video_info.get('view_count', 0))) if video_info.get('view_count') else None,
-                            'published_at': video_info.get('upload_date', ''),
-                            'country': 'GLOBAL'
-                        })
-                    except Exception as e:
-                        logging.error(f"Error processing fallback search result: {e}")
-                        continue
-
-        return videos
+        source, videos = hedger.run('search', [
+            ('regional', lambda: search_window(query, max_results, country_code, skip)),
+            ('global', lambda: search_window(query, max_results, None, skip)),
+        ])
     except Exception as e:
         logging.error(f"Error searching videos for '{query}' in {country_code}: {e}")
-        # Try global search as fallback
-        try:
-            fallback_command = ["yt-dlp", "--flat-playlist", "--dump-json", f"ytsearch{max_results}:{search_query}"]
-            output = run_yt_dlp_command(fallback_command, timeout=10)
-            videos = []
-            
-            for line in output.splitlines():
-                if line.strip():
-                    try:
-                        video_info = json.loads(line)
-                        videos.append({
-                            'id': video_info.get('id', ''),
-                            'title': video_info.get('title', 'Untitled Video'),
-                            'channel': video_info.get('uploader', 'Unknown Channel'),
-                            'channel_id': video_info.get('channel_id', ''),
-                            'thumbnail': video_info.get('thumbnail', '') or f"https://i.ytimg.com/vi/{video_info.get('id', '')}/hqdefault.jpg",
-                            'duration': format_duration(int(video_info.get('duration', 0))) if video_info.get('duration') else None,
-                            'view_count': format_view_count(int(video_info.get('view_count', 0))) if video_info.get('view_count') else None,
-                            'published_at': video_info.get('upload_date', ''),
-                            'country': 'GLOBAL'
-                        })
-                    except:
-                        continue
-            return videos
-        except Exception as e2:
-            logging.error(f"Global search fallback also failed: {e2}")
-            raise Exception(f"Failed to search videos: {str(e)}")
+        raise Exception(f"Failed to search videos: {str(e)}")
 
+    if source != 'regional':
+        logging.warning(f"Search results for '{query}' in {country_code} came from the global search")
+    return videos
+
+def stream_search_videos(query: str, max_results: int = 20, country_code: Optional[str] = "TR", skip: int = 0,
+                         fallback: bool = True) -> Iterator[Dict[str, Any]]:
+    """Yield the same results as search_videos, each one as soon as yt-dlp prints it
+
+    Falls back to a global search when the country-specific one fails or
+    finds nothing before its first result; after that, errors are raised.
+    With fallback off (or country_code None, a global search) only the one
+    source is searched.
+    """
+    command = build_search_command(query, max_results, country_code, skip)
+    found = False
+    try:
+        for record in iter_records(iter_yt_dlp_lines(command, timeout=10, kind='search')):
+            found = True
+            yield format_records((record,), country=country_code or 'GLOBAL')[0]
+    except Exception as e:
+        if found or not fallback or country_code is None:
+            raise
+        logging.error(f"Error streaming search results for '{query}' in {country_code}: {e}")
+    if found or not fallback or country_code is None:
+        return
+
+    logging.warning(f"No search results streamed for '{query}' in {country_code}, falling back to global search")
+    fallback_command = build_search_command(query, max_results, None, skip)
+    try:
+        for record in iter_records(iter_yt_dlp_lines(fallback_command, timeout=10, kind='search')):
+            yield format_records((record,), country='GLOBAL')[0]
+    except Exception as e:
+        logging.error(f"Global search fallback also failed: {e}")
+        raise Exception(f"Failed to search videos: {str(e)}")
+
+def _from_trending_feed(videos: List[Dict[str, Any]]) -> bool:
+    # Results of the general trending search are cached under their own key, not the country's
+    return bool(videos) and videos[0].get('country') != 'GLOBAL'
+
+@cached('trending', cache_if=bool)
+def get_general_trending(max_results: int = 20) -> List[Dict[str, Any]]:
+    """Newest results for a 'YouTube trending' search, the fallback for every country's feed"""
+    command = ["yt-dlp", "--flat-playlist", "--dump-json", f"ytsearchdate{max_results}:YouTube trending"]
+    return normalize_listing(run_yt_dlp_command(command, timeout=10, kind='trending'), country='GLOBAL')
+
+@cached('trending', cache_if=_from_trending_feed)
 def get_trending_videos(max_results: int = 20, country_code: str = "TR") -> List[Dict[str, Any]]:
     """Get trending videos for specific country using yt-dlp
     
@@ -294,137 +386,21 @@ def get_trending_videos(max_results: int = 20, country_code: str = "TR") -> List
     trending_url = f"https://www.youtube.com/feed/trending?gl={country_code}"
     command = ["yt-dlp", "--flat-playlist", "--dump-json", "--extractor-args", "youtube:skip=dash,hls", "-I", f"1:{max_results}", trending_url]
 
+    # General trending is started when the country feed is slow, empty or broken
     try:
-        output = run_yt_dlp_command(command, timeout=10)  # Increased timeout for trending
-        videos = []
-
-        # Process each line as a separate JSON object
-        for line in output.splitlines():
-            if line.strip():
-                try:
-                    video_info = json.loads(line)
-
-                    # Format duration safely
-                    duration = None
-                    try:
-                        if video_info.get('duration'):
-                            duration = format_duration(int(video_info.get('duration')))
-                    except Exception as e:
-                        logging.error(f"Error formatting duration: {e}")
-
-                    # Format view count safely
-                    view_count = None
-                    try:
-                        if video_info.get('view_count'):
-                            view_count = format_view_count(int(video_info.get('view_count')))
-                    except Exception as e:
-                        logging.error(f"Error formatting view count: {e}")
-
-                    # Format date safely
-                    published_at = video_info.get('upload_date', '')
-                    try:
-                        if published_at and isinstance(published_at, str) and len(published_at) == 8:
-                            from datetime import datetime
-                            date_obj = datetime.strptime(published_at, '%Y%m%d')
-                            published_at = date_obj.strftime('%B %d, %Y')
-                    except Exception as e:
-                        logging.error(f"Error formatting date: {e}")
-
-                    # Ensure thumbnail exists
-                    thumbnail = video_info.get('thumbnail', '')
-                    if not thumbnail:
-                        thumbnail = f"https://i.ytimg.com/vi/{video_info.get('id', '')}/hqdefault.jpg"
-
-                    videos.append({
-                        'id': video_info.get('id', ''),
-                        'title': video_info.get('title', 'Untitled Video'),
-                        'channel': video_info.get('uploader', 'Unknown Channel'),
-                        'channel_id': video_info.get('channel_id', ''),
-                        'thumbnail': thumbnail,
-                        'duration': duration,
-                        'view_count': view_count,
-                        'published_at': published_at,
-                        'country': country_code
-                    })
-                except Exception as e:
-                    logging.error(f"Error processing trending video info: {e}")
-                    continue
-                    
-        # If no results from country-specific trending, fall back to general trending
-        if not videos:
-            logging.warning(f"No trending videos found for country {country_code}, falling back to general trending")
-            fallback_command = ["yt-dlp", "--flat-playlist", "--dump-json", f"ytsearchdate{max_results}:YouTube trending"]
-            output = run_yt_dlp_command(fallback_command, timeout=10)
-            
-            # Process fallback videos similar to above
-            for line in output.splitlines():
-                if line.strip():
-                    try:
-                        video_info = json.loads(line)
-                        
-                        # Same processing as above (simplified here for brevity)
-                        duration = format_duration(int(video_info.get('duration', 0))) if video_info.get('duration') else None
-                        view_count = format_view_count(int(video_info.get('view_count', 0))) if video_info.get('view_count') else None
-                        
-                        # Format date
-                        published_at = video_info.get('upload_date', '')
-                        if published_at and len(published_at) == 8:
-                            from datetime import datetime
-                            try:
-                                date_obj = datetime.strptime(published_at, '%Y%m%d')
-                                published_at = date_obj.strftime('%B %d, %Y')
-                            except:
-                                pass
-                                
-                        # Ensure thumbnail
-                        thumbnail = video_info.get('thumbnail', '') or f"https://i.ytimg.com/vi/{video_info.get('id', '')}/hqdefault.jpg"
-                        
-                        videos.append({
-                            'id': video_info.get('id', ''),
-                            'title': video_info.get('title', 'Untitled Video'),
-                            'channel': video_info.get('uploader', 'Unknown Channel'),
-                            'channel_id': video_info.get('channel_id', ''),
-                            'thumbnail': thumbnail,
-                            'duration': duration,
-                            'view_count': view_count,
-                            'published_at': published_at,
-                            'country': 'GLOBAL'
-                        })
-                    except Exception as e:
-                        logging.error(f"Error processing fallback trending video: {e}")
-                        continue
-
-        return videos
+        source, videos = hedger.run('trending', [
+            ('regional', lambda: normalize_listing(run_yt_dlp_command(command, timeout=10, kind='trending'), country=country_code)),
+            ('search', lambda: get_general_trending(max_results)),
+        ])
     except Exception as e:
         logging.error(f"Error getting trending videos for {country_code}: {e}")
-        # Try fallback if country-specific trending fails
-        try:
-            fallback_command = ["yt-dlp", "--flat-playlist", "--dump-json", f"ytsearchdate{max_results}:YouTube trending"]
-            output = run_yt_dlp_command(fallback_command, timeout=10)
-            # Process results (shortened here)
-            videos = []
-            for line in output.splitlines():
-                if line.strip():
-                    try:
-                        video_info = json.loads(line)
-                        videos.append({
-                            'id': video_info.get('id', ''),
-                            'title': video_info.get('title', 'Untitled Video'),
-                            'channel': video_info.get('uploader', 'Unknown Channel'),
-                            'channel_id': video_info.get('channel_id', ''),
-                            'thumbnail': video_info.get('thumbnail', '') or f"https://i.ytimg.com/vi/{video_info.get('id', '')}/hqdefault.jpg",
-                            'duration': format_duration(int(video_info.get('duration', 0))) if video_info.get('duration') else None,
-                            'view_count': format_view_count(int(video_info.get('view_count', 0))) if video_info.get('view_count') else None,
-                            'published_at': video_info.get('upload_date', ''),
-                            'country': 'GLOBAL'
-                        })
-                    except:
-                        continue
-            return videos
-        except Exception as e2:
-            logging.error(f"Error with fallback trending: {e2}")
-            raise Exception(f"Failed to get trending videos: {str(e)}")
+        raise Exception(f"Failed to get trending videos: {str(e)}")
+
+    if source != 'regional':
+        logging.warning(f"Trending videos for {country_code} came from the general trending search")
+    return videos
 
+@cached('video')
 def get_video_details(video_id: str) -> Dict[str, Any]:
     """Get detailed information about a specific video"""
     try:
@@ -433,163 +409,99 @@ def get_video_details(video_id: str) -> Dict[str, Any]:
         logging.error(f"Error getting video details for {video_id}: {e}")
         raise Exception(f"Failed to get video details: {str(e)}")
 
-def get_channel_info(channel_id: str) -> Dict[str, Any]:
-    """Get channel information using yt-dlp with a fast timeout and fallback"""
-    # Basic info fallback function to avoid breaking the page
-    def get_basic_channel_info():
-        """Return basic channel info without making network requests"""
-        logging.warning(f"Using basic channel info for {channel_id}")
-        channel_name = channel_id
-        if channel_id.startswith('@'):
-            channel_name = channel_id[1:]  # Remove @ symbol for display
+def basic_channel_info(channel_id: str) -> Dict[str, Any]:
+    """Channel info built without any extraction, to avoid breaking the page"""
+    logging.warning(f"Using basic channel info for {channel_id}")
+    channel_name = channel_id
+    if channel_id.startswith('@'):
+        channel_name = channel_id[1:]  # Remove @ symbol for display
+    return {
+        'name': f"Channel: {channel_name}",
+        'description': BASIC_CHANNEL_DESCRIPTION,
+        'channel_id': channel_id,
+        'subscriber_count': 'N/A',
+        'channel_url': f'https://www.youtube.com/{channel_id}'
+    }
+
+@cached('channel', cache_if=lambda overview: bool(overview['videos']))
+def get_channel_overview(channel_id: str) -> Dict[str, Any]:
+    """Channel info and its latest videos from a single extraction of the channel's /videos tab
+
+    channel_id may be a UC id, a handle (with or without @) or a legacy name.
+    Unknown channels try the likely URL forms hedged; the form that works
+    teaches the channel resolver the canonical id, so later calls go straight
+    to it.
+    """
+    def fetch(url: str) -> Dict[str, Any]:
+        command = ["yt-dlp", "--flat-playlist", "--dump-single-json", "--extractor-args", "youtube:skip=dash,hls",
+                   "-I", f"1:{CHANNEL_OVERVIEW_VIDEOS}", url]
+        data = json.loads(run_yt_dlp_command(command, timeout=CHANNEL_OVERVIEW_TIMEOUT, kind='channel'))
+        handle = data.get('uploader_id') if str(data.get('uploader_id') or '').startswith('@') else None
         return {
-            'name': f"Channel: {channel_name}",
-            'description': 'Channel information is currently unavailable',
-            'channel_id': channel_id,
-            'subscriber_count': 'N/A',
-            'channel_url': f'https://www.youtube.com/{channel_id}'
+            'info': {
+                'name': data.get('channel') or data.get('uploader') or 'Unknown Channel',
+                'description': data.get('description') or '',
+                'channel_id': data.get('channel_id') or '',
+                'handle': handle,
+                'subscriber_count': data.get('channel_follower_count') or '0',
+                'channel_url': data.get('channel_url') or url[:-len('/videos')]
+            },
+            'videos': normalize_entries(data.get('entries') or [])
         }
-    
-    # Try with username format with a short timeout
+
+    attempts = [(form, lambda url=url: fetch(url)) for form, url in channel_resolver.candidate_urls(channel_id, '/videos')]
+    form, overview = hedger.run('channel', attempts, accept=lambda overview: bool(overview['info']['channel_id']))
+    if not overview['info']['channel_id']:
+        raise Exception(f"Channel {channel_id} could not be resolved")
+    if form != 'resolved':
+        channel_resolver.learn(channel_id, ChannelIdentity(overview['info']['channel_id'], overview['info']['handle']))
+    return overview
+
+def resolve_channel(channel_id: str) -> ChannelIdentity:
+    """Canonical identity of a channel, extracting its overview if the reference is new"""
+    identity = channel_resolver.lookup(channel_id)
+    if identity is None:
+        info = get_channel_overview(channel_id)['info']
+        identity = ChannelIdentity(info['channel_id'], info['handle'])
+    return identity
+
+def get_channel_info(channel_id: str) -> Dict[str, Any]:
+    """Get channel information using yt-dlp, falling back to basic info if the channel can't be resolved"""
     try:
-        channel_url = f"https://www.youtube.com/{('@' + channel_id) if not channel_id.startswith('@') else channel_id}"
-        command = ["yt-dlp", "--dump-single-json", "--extractor-args", "youtube:skip=dash,hls", channel_url]
-        
-        # Use a short timeout of 3 seconds to avoid hanging
-        output = run_yt_dlp_command(command, timeout=3)
-        channel_info = json.loads(output)
-        
-        return {
-            'name': channel_info.get('channel', channel_info.get('uploader', 'Unknown Channel')),
-            'description': channel_info.get('description', ''),
-            'channel_id': channel_info.get('channel_id', channel_id),
-            'subscriber_count': channel_info.get('subscriber_count', '0'),
-            'channel_url': channel_info.get('channel_url', channel_url)
-        }
+        return get_channel_overview(channel_id)['info']
     except Exception as e:
         logging.error(f"Error getting channel info for {channel_id}: {e}")
-        
-        # Try alternative method with channel ID format
-        try:
-            alt_url = f"https://www.youtube.com/channel/{channel_id}"
-            command = ["yt-dlp", "--dump-single-json", "--extractor-args", "youtube:skip=dash,hls", alt_url]
-            
-            # Even shorter timeout for the fallback
-            output = run_yt_dlp_command(command, timeout=2)
-            channel_info = json.loads(output)
-            
-            return {
-                'name': channel_info.get('channel', channel_info.get('uploader', 'Unknown Channel')),
-                'description': channel_info.get('description', ''),
-                'channel_id': channel_info.get('channel_id', channel_id),
-                'subscriber_count': channel_info.get('subscriber_count', '0'),
-                'channel_url': channel_info.get('channel_url', alt_url)
-            }
-        except Exception as e2:
-            logging.error(f"Error in alternative method for {channel_id}: {e2}")
-            # Return basic information to avoid breaking the page
-            return get_basic_channel_info()
+        return basic_channel_info(channel_id)
 
+@cached('channel', cache_if=bool)
 def get_channel_videos(channel_id: str, max_results: int = 10, skip: int = 0) -> List[Dict[str, Any]]:
     """Get videos from a specific channel using yt-dlp with pagination
     
     Args:
-        channel_id: The YouTube channel ID to fetch videos from
+        channel_id: The YouTube channel ID (or handle) to fetch videos from
         max_results: Maximum number of videos to return
         skip: Number of videos to skip (for pagination)
     """
-    from datetime import datetime
-    
-    # Try different channel URL formats
-    urls_to_try = [
-        f"https://www.youtube.com/@{channel_id}/videos",
-        f"https://www.youtube.com/channel/{channel_id}/videos"
-    ]
-    
-    videos = []
-    
-    for url in urls_to_try:
-        try:
-            # If skip is 0, we're just getting the first page
-            # Otherwise, we need to fetch (skip + max_results) videos and then slice
-            fetch_count = skip + max_results
-            
-            command = ["yt-dlp", "--flat-playlist", "--dump-json", "--extractor-args", "youtube:skip=dash,hls", "-I", f"1:{fetch_count}", url]
-            output = run_yt_dlp_command(command)
-            
-            # Process each video
-            all_videos = []
-            for line in output.splitlines():
-                if not line.strip():
-                    continue
-                
-                try:
-                    video_info = json.loads(line)
-                    
-                    # Get duration
-                    duration = None
-                    if video_info.get('duration'):
-                        try:
-                            duration = format_duration(int(video_info.get('duration')))
-                        except:
-                            pass
-                    
-                    # Get view count
-                    view_count = None
-                    raw_view_count = "0"
-                    if video_info.get('view_count'):
-                        try:
-                            view_count = format_view_count(int(video_info.get('view_count')))
-                            raw_view_count = str(video_info.get('view_count'))
-                        except:
-                            pass
-                    
-                    # Format date
-                    published_at = video_info.get('upload_date', '')
-                    if published_at and len(published_at) == 8:
-                        try:
-                            date_obj = datetime.strptime(published_at, '%Y%m%d')
-                            published_at = date_obj.strftime('%B %d, %Y')
-                        except:
-                            pass
-                    
-                    # Get thumbnail
-                    thumbnail = video_info.get('thumbnail', '')
-                    if not thumbnail:
-                        thumbnail = f"https://i.ytimg.com/vi/{video_info.get('id', '')}/hqdefault.jpg"
-                    
-                    all_videos.append({
-                        'id': video_info.get('id', ''),
-                        'title': video_info.get('title', 'Untitled Video'),
-                        'channel': video_info.get('uploader', 'Unknown Channel'),
-                        'channel_id': video_info.get('channel_id', ''),
-                        'thumbnail': thumbnail,
-                        'duration': duration,
-                        'view_count': view_count,
-                        'raw_view_count': raw_view_count,
-                        'published_at': published_at
-                    })
-                except Exception as e:
-                    logging.error(f"Error processing video: {e}")
-                    continue
-            
-            # Apply pagination - if skip is 0, we take the first batch
-            # If skip is provided, we slice only the required videos
-            if skip > 0:
-                # We add all to videos list (not overwriting it) in case we tried multiple URLs
-                videos.extend(all_videos[skip:skip + max_results])
-            else:
-                # For first page, just take the requested number
-                videos.extend(all_videos[:max_results])
-            
-            # If we got videos, no need to try other URLs
-            if videos:
-                return videos
-                
-        except Exception as e:
-            logging.error(f"Error with URL {url}: {e}")
-            continue
-    
+    try:
+        if skip == 0 and max_results <= CHANNEL_OVERVIEW_VIDEOS:
+            # The first page comes with the channel's info, usually already extracted for the page header
+            videos = get_channel_overview(channel_id)['videos'][:max_results]
+        else:
+            # -I limits the output to the requested window; yt-dlp still walks the channel's
+            # continuation pages up to it, so later windows take longer to extract
+            items_range = f"{skip + 1}:{skip + max_results}"
+            url = f"{resolve_channel(channel_id).url}/videos"
+            command = ["yt-dlp", "--flat-playlist", "--dump-json", "--extractor-args", "youtube:skip=dash,hls", "-I", items_range, url]
+            videos = normalize_listing(run_yt_dlp_command(command, kind='channel'))[:max_results]
+        if videos or skip:
+            # An empty later window is the end of the channel, not a reason to search
+            return videos
+    except Exception as e:
+        logging.error(f"Error getting videos for channel {channel_id}: {e}")
+        if skip:
+            # Search hits would end up appended to the channel's listing and stats
+            raise Exception(f"Failed to get channel videos: {str(e)}")
+
     # If we reach here, fall back to search
     logging.info(f"Channel {channel_id} not found, falling back to search")
-    return search_videos(channel_id, max_results)
\ No newline at end of file
+    return search_videos(channel_id, max_results)